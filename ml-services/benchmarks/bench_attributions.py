@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Feature attribution overhead (PurrPalTabularModel.predict(..., explain=True)).
+
+Times load-test questionnaires through predict() and predict_batch() with
+and without tree-path attributions, and the forest alone
+(FlatForest.predict_proba against FlatForest.contributions), and reports
+the latency ratio of each pair. Handler calls run once with the prediction
+cache and lookup table disabled (every row walks the forest) and once with
+the service defaults, where repeated questionnaires hit the cache and
+explained rows are served with their cached attributions.
+
+Exits with an error if any ratio is above --max-ratio.
+
+Usage:
+    python benchmarks/bench_attributions.py
+    python benchmarks/bench_attributions.py --requests 5000 --batch-sizes 1,32,256 --json attributions.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+TABULAR_DIR = BENCH_DIR.parent / "tabular-services"
+SEED = 42
+
+
+def questionnaire_items(count, distinct):
+    """Load-test questionnaires as (cat_data, questionnaire_data), cycling over `distinct` of them"""
+    sys.path.insert(0, str(BENCH_DIR))
+    from load_test import _questionnaire_request
+
+    rng = random.Random(SEED)
+    unique = []
+    for _ in range(distinct):
+        request = _questionnaire_request(rng, (1, 6))
+        cat = dict(request["cat_info"], age=float(request["cat_info"]["age"].split()[0]))
+        unique.append((cat, request["questionnaire"]))
+    return [unique[i % distinct] for i in range(count)]
+
+
+def median_seconds(fn, calls, min_timings=20):
+    """Median wall time of fn(call), cycling over the calls until there are enough timings"""
+    timings = []
+    while len(timings) < max(len(calls), min_timings):
+        call = calls[len(timings) % len(calls)]
+        started = time.perf_counter()
+        fn(call)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def compare(report, name, config, size, plain, explained):
+    ratio = explained / plain
+    report.append({"name": name, "config": config, "size": size, "plain_us": plain * 1e6,
+                   "explain_us": explained * 1e6, "ratio": ratio})
+    print(f"{name:>10}{config:>10}{size:>7}{plain * 1e6:>12.1f}{explained * 1e6:>12.1f}{ratio:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of predictions with and without feature attributions")
+    parser.add_argument("--requests", type=int, default=3000, help="Single predictions timed per configuration")
+    parser.add_argument("--distinct", type=int, default=500, help="Distinct questionnaires in the traffic")
+    parser.add_argument("--batch-sizes", default="1,32,256,1024", help="Comma-separated rows per batch or block")
+    parser.add_argument("--max-ratio", type=float, default=2.0, help="Largest acceptable explain/plain latency ratio")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    os.chdir(TABULAR_DIR)
+    sys.path.insert(0, str(TABULAR_DIR))
+    logging.disable(logging.CRITICAL)
+    from model_handler import PurrPalTabularModel
+
+    items = questionnaire_items(args.requests, args.distinct)
+    sizes = [int(value) for value in args.batch_sizes.split(",")]
+    configs = {"uncached": dict(cache_size=0, lookup_table_path=""), "default": {}}
+    print(f"📋 {args.requests:,} requests over {args.distinct:,} distinct questionnaires")
+
+    report = []
+    print(f"{'call':>10}{'config':>10}{'rows':>7}{'plain µs':>12}{'explain µs':>12}{'ratio':>9}")
+    for config, kwargs in configs.items():
+        model = PurrPalTabularModel(**kwargs)
+        for explain in (False, True):  # Warm up (and fill the cache of the default configuration)
+            model.predict_batch(items[:args.distinct], explain=explain)
+        plain = median_seconds(lambda item: model.predict(*item), items)
+        explained = median_seconds(lambda item: model.predict(*item, explain=True), items)
+        compare(report, "predict", config, 1, plain, explained)
+
+        for size in sizes:
+            batches = [items[start:start + size] for start in range(0, len(items) - size + 1, size)][:200] or [items[:size]]
+            plain = median_seconds(model.predict_batch, batches)
+            explained = median_seconds(lambda batch: model.predict_batch(batch, explain=True), batches)
+            compare(report, "batch", config, size, plain, explained)
+
+    forest = model.forest
+    X = model.feature_schema.standardize(model.feature_schema.vectorize_many(items))
+    for size in sizes:
+        blocks = [X[start:start + size] for start in range(0, len(X) - size + 1, size)][:200] or [X[:size]]
+        compare(report, "forest", "-", size, median_seconds(forest.predict_proba, blocks),
+                median_seconds(forest.contributions, blocks))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Results written to {args.json}")
+
+    worst = max(report, key=lambda result: result["ratio"])
+    if worst["ratio"] > args.max_ratio:
+        raise SystemExit(f"❌ {worst['name']} ({worst['config']}, {worst['size']} rows) is {worst['ratio']:.2f}x "
+                         f"plain latency, above {args.max_ratio}x")
+    print(f"✅ Attributions stay within {args.max_ratio}x of plain latency (worst {worst['ratio']:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Offline batch scoring scalability (tabular-services/batch_score.py).
+
+Builds a dataset of --rows rows by repeating the cat rows of
+cleaned_animal_disease_prediction.csv, then scores it once per worker
+count and reports rows per second and the scaling efficiency against one
+worker (speedup / workers). Efficiency stays close to 1 as long as there
+are free cores, since workers read, score and write their chunks on their
+own; past the CPU count it drops as workers share cores.
+
+Usage:
+    python benchmarks/bench_batch_score.py --rows 2000000 --workers 1,2,4,8
+    python benchmarks/bench_batch_score.py --format parquet --output-format csv
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TABULAR_DIR = Path(__file__).resolve().parent.parent / "tabular-services"
+DATASET = TABULAR_DIR.parent.parent / "ml-research" / "tabular-analytics-engine" / "cleaned_animal_disease_prediction.csv"
+
+
+def build_dataset(path, rows, dataset_format):
+    import pandas as pd
+
+    source = pd.read_csv(DATASET)
+    source = source[source["Animal_Type"] == "Cat"]
+    frame = source.sample(rows, replace=True, random_state=42, ignore_index=True)
+    frame.insert(0, "record_id", range(rows))
+    if dataset_format == "parquet":
+        frame.to_parquet(path, index=False, row_group_size=65536)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline batch scoring throughput per worker count")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts, one run each")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Input dataset format")
+    parser.add_argument("--output-format", choices=["csv", "parquet"], default="parquet")
+    parser.add_argument("--chunk-mb", type=float, default=8.0, help="CSV chunk size in MB")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    os.chdir(TABULAR_DIR)
+    sys.path.insert(0, str(TABULAR_DIR))
+    logging.disable(logging.CRITICAL)
+    import batch_score
+    from purrpal_common.worker_sizing import available_cpus
+
+    report = []
+    with tempfile.TemporaryDirectory(prefix="purrpal-batch-") as tmp:
+        dataset = Path(tmp) / f"dataset.{args.format}"
+        started = time.perf_counter()
+        build_dataset(dataset, args.rows, args.format)
+        print(f"📂 {args.rows:,} rows, {dataset.stat().st_size / 1e6:.1f} MB {args.format} "
+              f"({time.perf_counter() - started:.1f}s to build, {available_cpus()} CPUs available)")
+
+        print(f"{'workers':>8}{'seconds':>10}{'rows/s':>12}{'per worker':>12}{'speedup':>9}{'efficiency':>12}")
+        for workers in (int(value) for value in args.workers.split(",")):
+            output = Path(tmp) / f"predictions.{args.output_format}"
+            cli = [str(dataset), "--output", str(output), "--workers", str(workers),
+                   "--chunk-mb", str(args.chunk_mb), "--id-column", "record_id", "--restart"]
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = batch_score.run(batch_score.build_parser().parse_args(cli))
+            output.unlink()
+
+            base = report[0]["rows_per_second"] / report[0]["workers"] if report else summary["rows_per_second"] / workers
+            speedup = summary["rows_per_second"] / base
+            report.append({**summary, "speedup": round(speedup, 2), "efficiency": round(speedup / workers, 2)})
+            print(f"{workers:>8}{summary['seconds']:>10.2f}{summary['rows_per_second']:>12,.0f}"
+                  f"{summary['rows_per_worker_second']:>12,.0f}{speedup:>8.2f}x{speedup / workers:>12.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Vision forward-pass latency: Keras model.predict against the handler's
+compiled inference function (ModelHandler._forward).
+
+model.predict builds a data adapter and runs a full predict loop on every
+call. The handler instead calls a tf.function traced once for
+(None, 128, 128, 3) inputs and warmed up at load time. Optionally that
+function is also compiled with XLA (VISION_XLA=1). Reports the median
+latency per call for each batch size and for ModelHandler.predict on one
+image (dynamic batching off), with the speedup over model.predict.
+
+Needs TensorFlow. Without --vision-model the seeded stand-in model of
+bench_predict.py is used.
+
+Usage:
+    python benchmarks/bench_compiled_inference.py
+    python benchmarks/bench_compiled_inference.py --batch-sizes 1,8,32 --repeats 200 --json compiled.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+VISION_DIR = BENCH_DIR.parent / "vision-service"
+
+
+def median_ms(fn, repeats, warmup=5):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of model.predict against the compiled inference function")
+    parser.add_argument("--batch-sizes", default="1,8,16", help="Comma-separated images per forward pass")
+    parser.add_argument("--repeats", type=int, default=100, help="Timed calls per configuration (median is kept)")
+    parser.add_argument("--image-size", default="640x480", help="Synthetic JPEG size (WxH) for the end-to-end row")
+    parser.add_argument("--no-xla", action="store_true", help="Skip the XLA-compiled variant")
+    parser.add_argument("--vision-model", default=None, help="Real .h5 model (stand-in built if omitted)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BENCH_DIR))
+    sys.path.insert(1, str(VISION_DIR))
+    logging.disable(logging.CRITICAL)
+    from bench_predict import build_stand_in_model, synthetic_image_data_url
+    import model_handler
+
+    class_map_path = VISION_DIR / "models" / "class_map.json"
+    model_path = args.vision_model
+    if model_path is None:
+        num_classes = len(json.loads(class_map_path.read_text()))
+        model_path = build_stand_in_model(
+            os.path.join(tempfile.mkdtemp(prefix="purrpal-bench-"), "stand_in.h5"), num_classes
+        )
+
+    handlers = {}
+    for name, xla in (("compiled", False), ("xla", True)):
+        if xla and args.no_xla:
+            continue
+        model_handler.XLA_JIT = xla
+        started = time.perf_counter()
+        handlers[name] = model_handler.ModelHandler(str(model_path), str(class_map_path))
+        handlers[name].scheduler = None
+        print(f"⏱️  {name}: loaded and warmed up in {time.perf_counter() - started:.2f}s "
+              f"(warm-up {handlers[name].warmup_seconds:.2f}s)")
+
+    # The per-call model.predict path the handler used before
+    keras = model_handler.ModelHandler(str(model_path), str(class_map_path))
+    keras.scheduler = None
+    keras._forward = lambda batch: keras.model.predict(batch, batch_size=len(batch), verbose=0)[0]
+    handlers = {"model.predict": keras, **handlers}
+
+    width, height = (int(value) for value in args.image_size.lower().split("x"))
+    data_url = synthetic_image_data_url(width, height)
+    rng = np.random.default_rng(42)
+
+    report = []
+    print(f"{'call':>10}{'images':>8}" + "".join(f"{name + ' ms':>18}" for name in handlers)
+          + "".join(f"{name + ' x':>12}" for name in list(handlers)[1:]))
+    rows = [("forward", size) for size in (int(value) for value in args.batch_sizes.split(","))]
+    rows.append(("predict", 1))
+    for call, size in rows:
+        if call == "forward":
+            batch = rng.random((size, 128, 128, 3), dtype=np.float32)
+            expected = keras._forward(batch)
+            for handler in handlers.values():
+                np.testing.assert_allclose(handler._forward(batch), expected, atol=1e-4)
+            timings = {name: median_ms(lambda: handler._forward(batch), args.repeats)
+                       for name, handler in handlers.items()}
+        else:
+            timings = {name: median_ms(lambda: handler.predict(data_url), args.repeats)
+                       for name, handler in handlers.items()}
+        baseline = timings["model.predict"]
+        report.append({"call": call, "images": size, "ms": timings,
+                       "speedup": {name: baseline / ms for name, ms in timings.items()}})
+        print(f"{call:>10}{size:>8}" + "".join(f"{ms:>18.2f}" for ms in timings.values())
+              + "".join(f"{baseline / ms:>11.2f}x" for ms in list(timings.values())[1:]))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
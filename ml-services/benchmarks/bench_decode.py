@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Vision preprocessing latency and peak memory by input resolution
+(vision-service/image_decoder.py).
+
+Encodes a seeded photo-like image (gradient plus noise) at every
+resolution and format, then decodes its data URL into the 128x128 model
+input with the full-resolution path (VISION_SCALED_DECODE=0, the original
+pipeline) and the scaled path (DCT-scaled JPEG decode, early box reduction,
+reused buffers). Each configuration runs in a fresh process, which reports
+the median latency and its peak RSS above the RSS before the first decode.
+Only PIL, OpenCV and NumPy are needed, not TensorFlow.
+
+Usage:
+    python benchmarks/bench_decode.py --resolutions 640x480,1920x1440,4032x3024
+    python benchmarks/bench_decode.py --formats jpeg --repeats 50 --json decode.json
+"""
+
+import argparse
+import base64
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+VISION_DIR = Path(__file__).resolve().parent.parent / "vision-service"
+SEED = 42
+
+
+def synthetic_image(width, height, image_format):
+    """Seeded encoded image: a smooth gradient with noise, like a photo rather than pure noise"""
+    from PIL import Image
+
+    rng = np.random.default_rng(SEED)
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None, None]
+    base = np.concatenate([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape).astype(np.float32), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    if image_format == "jpeg":
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    else:
+        Image.fromarray(pixels).save(buffer, format="PNG", compress_level=1)
+    return f"data:image/{image_format};base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def _memory_kb(field):
+    for line in Path("/proc/self/status").read_text().splitlines():
+        if line.startswith(field + ":"):
+            return int(line.split()[1])
+    return 0
+
+
+def run_child(args):
+    """Decode one data URL file repeatedly in this process and print the results as JSON"""
+    sys.path.insert(0, str(VISION_DIR))
+    from image_decoder import ImageDecoder
+
+    decoder = ImageDecoder(128, 128, scaled=args.mode == "scaled")
+    data_url = Path(args.child).read_text()
+    baseline_kb = _memory_kb("VmRSS")
+    try:
+        Path("/proc/self/clear_refs").write_text("5")  # Reset the peak (VmHWM) to the current RSS
+    except OSError:
+        pass
+
+    timings = []
+    for _ in range(args.repeats):
+        started = time.perf_counter()
+        decoder.decode_data_url(data_url)
+        timings.append(time.perf_counter() - started)
+    print(json.dumps({"ms": float(np.median(timings)) * 1000,
+                      "peak_rss_mb": max(_memory_kb("VmHWM") - baseline_kb, 0) / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and peak RSS of vision preprocessing per resolution")
+    parser.add_argument("--resolutions", default="640x480,1280x960,1920x1440,4032x3024",
+                        help="Comma-separated WIDTHxHEIGHT input sizes")
+    parser.add_argument("--formats", default="jpeg,png", help="Comma-separated input formats (jpeg, png)")
+    parser.add_argument("--repeats", type=int, default=20, help="Decodes per configuration (median is kept)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=["full", "scaled"], default="scaled", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args)
+
+    report = []
+    print(f"{'format':>7}{'input':>11}{'payload':>10}{'full ms':>9}{'scaled ms':>11}{'speedup':>9}"
+          f"{'full MB':>9}{'scaled MB':>11}")
+    with tempfile.TemporaryDirectory(prefix="purrpal-decode-") as tmp:
+        for image_format in args.formats.split(","):
+            for resolution in args.resolutions.split(","):
+                width, height = (int(value) for value in resolution.lower().split("x"))
+                path = Path(tmp) / f"{resolution}.{image_format}.txt"
+                data_url = synthetic_image(width, height, image_format)
+                path.write_text(data_url)
+
+                results = {}
+                for mode in ("full", "scaled"):
+                    output = subprocess.run(
+                        [sys.executable, __file__, "--child", str(path), "--mode", mode, "--repeats", str(args.repeats)],
+                        check=True, capture_output=True, text=True
+                    ).stdout
+                    results[mode] = json.loads(output.strip().splitlines()[-1])
+
+                full, scaled = results["full"], results["scaled"]
+                report.append({"format": image_format, "width": width, "height": height,
+                               "payload_bytes": len(data_url), "full": full, "scaled": scaled,
+                               "speedup": full["ms"] / scaled["ms"]})
+                print(f"{image_format:>7}{resolution:>11}{len(data_url) / 1e6:>8.2f}MB{full['ms']:>9.1f}"
+                      f"{scaled['ms']:>11.1f}{full['ms'] / scaled['ms']:>8.2f}x"
+                      f"{full['peak_rss_mb']:>9.1f}{scaled['peak_rss_mb']:>11.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
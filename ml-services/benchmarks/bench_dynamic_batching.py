@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Vision dynamic batching (vision-service/batch_scheduler.py) under concurrency.
+
+Runs ModelHandler.predict from 1 to N request threads at once, each one
+predicting seeded JPEG data URLs back to back, with the scheduler off
+(VISION_BATCH_MAX_WAIT_MS=0, one forward pass per request) and on. Reports
+throughput, median and p95 latency, and for the scheduler the average batch
+size and queue wait. The one-thread row shows what batching costs a lone
+request.
+
+Needs TensorFlow. Without --vision-model the seeded stand-in model of
+bench_predict.py is used.
+
+Usage:
+    python benchmarks/bench_dynamic_batching.py
+    python benchmarks/bench_dynamic_batching.py --concurrency 1,4,16 --max-wait-ms 5 --json batching.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+VISION_DIR = BENCH_DIR.parent / "vision-service"
+
+
+def run_clients(handler, images, clients, requests_per_client):
+    """(wall seconds, per-request latencies) of `clients` threads predicting back to back"""
+    latencies = [[] for _ in range(clients)]
+    start = threading.Barrier(clients + 1)
+
+    def client(index):
+        start.wait()
+        for i in range(requests_per_client):
+            started = time.perf_counter()
+            handler.predict(images[(index + i) % len(images)], confidence_threshold=0.0)
+            latencies[index].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, [latency for client_latencies in latencies for latency in client_latencies]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and latency of vision predictions with dynamic batching")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated request thread counts")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per thread")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Scheduler VISION_BATCH_MAX_WAIT_MS")
+    parser.add_argument("--max-batch", type=int, default=16, help="Scheduler VISION_BATCH_MAX_SIZE")
+    parser.add_argument("--image-size", default="640x480", help="Synthetic JPEG size (WxH)")
+    parser.add_argument("--vision-model", default=None, help="Real .h5 model (stand-in built if omitted)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BENCH_DIR))
+    sys.path.insert(1, str(VISION_DIR))
+    logging.disable(logging.CRITICAL)
+    from bench_predict import build_stand_in_model, synthetic_image_data_url
+    from batch_scheduler import BatchScheduler
+    import model_handler
+
+    class_map_path = VISION_DIR / "models" / "class_map.json"
+    model_path = args.vision_model
+    if model_path is None:
+        num_classes = len(json.loads(class_map_path.read_text()))
+        model_path = build_stand_in_model(
+            os.path.join(tempfile.mkdtemp(prefix="purrpal-bench-"), "stand_in.h5"), num_classes
+        )
+    handler = model_handler.ModelHandler(str(model_path), str(class_map_path))
+    width, height = (int(value) for value in args.image_size.lower().split("x"))
+    images = [synthetic_image_data_url(width, height, seed=seed) for seed in range(16)]
+    counts = [int(value) for value in args.concurrency.split(",")]
+
+    schedulers = {"off": None, "on": BatchScheduler(handler._forward, args.max_wait_ms, args.max_batch)}
+    for size in range(1, args.max_batch + 1):  # Warm up every batch shape
+        handler._forward(np.zeros((size, handler.IMG_HEIGHT, handler.IMG_WIDTH, 3), dtype=np.float32))
+
+    report = []
+    print(f"📷 {width}x{height} JPEGs, max wait {args.max_wait_ms} ms, max batch {args.max_batch}")
+    print(f"{'threads':>8}{'batching':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'avg batch':>11}{'avg wait ms':>13}")
+    for clients in counts:
+        for mode, scheduler in schedulers.items():
+            handler.scheduler = scheduler
+            before = scheduler.stats() if scheduler else None
+            seconds, latencies = run_clients(handler, images, clients, args.requests)
+            result = {"threads": clients, "batching": mode, "requests_per_s": len(latencies) / seconds,
+                      "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+                      "p95_ms": float(np.percentile(latencies, 95)) * 1000}
+            if scheduler:
+                after = scheduler.stats()
+                batches, items = after["batches"] - before["batches"], after["items"] - before["items"]
+                result["avg_batch_size"] = items / batches
+                result["avg_queue_wait_ms"] = (scheduler.queue_wait_total * 1000 - before["avg_queue_wait_ms"]
+                                               * before["items"]) / items
+            report.append(result)
+            print(f"{clients:>8}{mode:>9}{result['requests_per_s']:>9.1f}{result['p50_ms']:>9.1f}"
+                  f"{result['p95_ms']:>9.1f}{result.get('avg_batch_size', 1.0):>11.2f}"
+                  f"{result.get('avg_queue_wait_ms', 0.0):>13.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Early-exit forest voting benchmark (FOREST_EARLY_EXIT, forest_engine.py).
+
+Scores blocks of realistic traffic with the full forest and with every
+early-exit mode and tree order, and reports the average number of trees
+evaluated, the time per block, the speedup over the full forest and how
+often the predicted class matches the full forest's (always in exact mode).
+
+Traffic is either the load test's questionnaires (1-6 symptoms, vitals in
+their usual ranges) or the cat rows of the training dataset (--traffic
+dataset). Blocks smaller than FOREST_EARLY_EXIT_MIN_ROWS are scored in one
+full pass by the service, because every early-exit check costs about as
+much as a full pass over a single row; the block sizes show the crossover.
+
+Usage:
+    python benchmarks/bench_early_exit.py --block-sizes 1,64,256,4096
+    python benchmarks/bench_early_exit.py --traffic dataset --step 8 --json early_exit.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+TABULAR_DIR = BENCH_DIR.parent / "tabular-services"
+DATASET = TABULAR_DIR.parent.parent / "ml-research" / "tabular-analytics-engine" / "cleaned_animal_disease_prediction.csv"
+SEED = 42
+
+
+def questionnaire_block(model, rows):
+    """Unscaled block of load-test questionnaires"""
+    sys.path.insert(0, str(BENCH_DIR))
+    from load_test import _questionnaire_request
+
+    rng = random.Random(SEED)
+    items = []
+    for _ in range(rows):
+        request = _questionnaire_request(rng, (1, 6))
+        cat = dict(request["cat_info"], age=float(request["cat_info"]["age"].split()[0]))
+        items.append((cat, request["questionnaire"]))
+    return model.feature_schema.vectorize_many(items)
+
+
+def dataset_block(model, rows):
+    """Unscaled block of the training dataset's cat rows, sampled with replacement"""
+    import pandas as pd
+    import batch_score
+
+    frame = pd.read_csv(DATASET)
+    frame = frame[frame["Animal_Type"] == "Cat"].sample(rows, replace=True, random_state=SEED, ignore_index=True)
+    block, errors = batch_score.map_dataset(frame, model.feature_schema)
+    return block[[error is None for error in errors]]
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trees evaluated and speedup of early-exit forest voting")
+    parser.add_argument("--traffic", choices=["questionnaire", "dataset"], default="questionnaire")
+    parser.add_argument("--rows", type=int, default=16384, help="Rows of traffic scored per configuration")
+    parser.add_argument("--block-sizes", default="1,64,256,1024,4096", help="Comma-separated rows per call")
+    parser.add_argument("--step", type=int, default=16, help="Trees evaluated between checks")
+    parser.add_argument("--delta", type=float, default=0.01, help="Error probability of the bound mode")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing runs per configuration (best is kept)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    os.chdir(TABULAR_DIR)
+    sys.path.insert(0, str(TABULAR_DIR))
+    logging.disable(logging.CRITICAL)
+    from model_handler import PurrPalTabularModel
+
+    model = PurrPalTabularModel(cache_size=0, lookup_table_path="", early_exit="exact")
+    forest = model.forest
+    block = (dataset_block if args.traffic == "dataset" else questionnaire_block)(model, args.rows)
+    X = model.feature_schema.standardize(block)
+    expected = np.argmax(forest.predict_proba(X), axis=1)
+    orders = {"fixed": None, "importance": model.tree_order}
+    print(f"🌲 {forest.n_trees} trees, {len(X):,} rows of {args.traffic} traffic, checks every {args.step} trees")
+
+    report = []
+    print(f"{'mode':>7}{'order':>12}{'block':>7}{'trees':>8}{'ms/block':>10}{'rows/s':>11}{'speedup':>9}{'agree':>9}")
+    for size in (int(value) for value in args.block_sizes.split(",")):
+        blocks = [X[start:start + size] for start in range(0, len(X), size)]
+        if size < 64:
+            blocks = blocks[:max(1, 2048 // size)]  # Tiny blocks: time a sample
+        rows = sum(len(part) for part in blocks)
+        full_seconds = best_of(lambda: [forest.predict_proba(part) for part in blocks], args.repeats)
+        report.append({"mode": "full", "order": None, "block": size, "avg_trees": float(forest.n_trees),
+                       "seconds": full_seconds, "rows_per_second": rows / full_seconds, "speedup": 1.0,
+                       "agreement": 1.0})
+
+        for mode in ("exact", "bound"):
+            for order_name, order in orders.items():
+                def run():
+                    return [forest.predict_proba_early(part, mode, order, args.step, args.delta) for part in blocks]
+
+                seconds = best_of(run, args.repeats)
+                outputs = run()
+                trees = np.concatenate([used for _, used in outputs])
+                labels = np.concatenate([np.argmax(proba, axis=1) for proba, _ in outputs])
+                report.append({"mode": mode, "order": order_name, "block": size, "avg_trees": float(trees.mean()),
+                               "seconds": seconds, "rows_per_second": rows / seconds,
+                               "speedup": full_seconds / seconds,
+                               "agreement": float((labels == expected[:rows]).mean())})
+
+        for result in report[-5:]:
+            print(f"{result['mode']:>7}{result['order'] or '-':>12}{size:>7}{result['avg_trees']:>8.1f}"
+                  f"{result['seconds'] / len(blocks) * 1000:>10.3f}{result['rows_per_second']:>11,.0f}"
+                  f"{result['speedup']:>8.2f}x{result['agreement']:>9.4f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
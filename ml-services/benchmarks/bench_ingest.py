@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Bulk ingestion benchmark for the tabular service.
+
+Posts the same random rows through the ASGI app (no network) as:
+
+  batch-json        POST /predict/batch with nested CatInfo/QuestionnaireData items
+  features-json     POST /predict/features with a JSON column map
+  features-msgpack  the same columns as raw float64 MessagePack bins
+  features-arrow    an Arrow IPC stream
+  features-npy      a (rows, n_features) .npy matrix
+
+and reports request/response sizes, latency per request and per row. The
+prediction cache is disabled so every format pays for the same forest
+work; the difference is parsing, validation and serialization.
+
+Usage:
+    python benchmarks/bench_ingest.py --rows 64,1024 --requests 30
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+TABULAR_DIR = Path(__file__).resolve().parent.parent / "tabular-services"
+SEED = 42
+
+# Vitals the questionnaire API accepts, with the feature columns they fill
+VITALS = [("age", "Age"), ("weight", "Weight"), ("body_temperature", "Body_Temperature"),
+          ("duration_days", "Duration_days"), ("heart_rate", "Heart_Rate")]
+
+
+def synthetic_rows(count, seed=SEED):
+    """Random (batch item, feature row dict) pairs describing the same cats"""
+    from feature_schema import QUESTIONNAIRE_MAPPING
+
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        vitals = {
+            "age": rng.randint(1, 15), "weight": round(rng.uniform(2.0, 7.0), 1),
+            "body_temperature": round(rng.uniform(37.5, 40.5), 1),
+            "duration_days": rng.randint(1, 14), "heart_rate": rng.randint(100, 200),
+        }
+        gender = rng.choice(["male", "female"])
+        answers = {question: rng.random() < 0.3 for question in QUESTIONNAIRE_MAPPING}
+        item = {"cat_info": {"name": "Bench", "age": f"{vitals['age']} tahun", "gender": gender, **{
+            key: value for key, value in vitals.items() if key != "age"}}, "questionnaire": answers}
+
+        features = {column: float(vitals[key]) for key, column in VITALS}
+        features["Gender_Male"] = 1.0 if gender == "male" else 0.0
+        for question, answer in answers.items():
+            column = QUESTIONNAIRE_MAPPING[question]
+            features[column] = max(features.get(column, 0.0), 1.0 if answer else 0.0)
+        rows.append((item, features))
+    return rows
+
+
+def payloads(rows, feature_names):
+    """(name, path, content type, body) for every format"""
+    import numpy as np
+    import msgpack
+    import pyarrow as pa
+
+    items = [item for item, _ in rows]
+    block = np.zeros((len(rows), len(feature_names)))
+    index = {name: i for i, name in enumerate(feature_names)}
+    for row, (_, features) in zip(block, rows):
+        for name, value in features.items():
+            row[index[name]] = value
+    columns = {name: block[:, i] for i, name in enumerate(feature_names)}
+
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    npy = io.BytesIO()
+    np.save(npy, block)
+
+    return [
+        ("batch-json", "/predict/batch", "application/json", json.dumps({"items": items}).encode()),
+        ("features-json", "/predict/features", "application/json",
+         json.dumps({name: values.tolist() for name, values in columns.items()}).encode()),
+        ("features-msgpack", "/predict/features", "application/msgpack",
+         msgpack.packb({name: values.astype("<f8").tobytes() for name, values in columns.items()})),
+        ("features-arrow", "/predict/features", "application/vnd.apache.arrow.stream",
+         sink.getvalue().to_pybytes()),
+        ("features-npy", "/predict/features", "application/x-npy", npy.getvalue()),
+    ]
+
+
+async def measure(service, cases, requests):
+    import httpx
+
+    transport = httpx.ASGITransport(app=service.app)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, path, content_type, body in cases:
+            headers = {"content-type": content_type}
+            for _ in range(3):
+                response = await client.post(path, content=body, headers=headers)
+                assert response.status_code == 200, (name, response.status_code, response.text[:200])
+            samples = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = await client.post(path, content=body, headers=headers)
+                samples.append(time.perf_counter() - started)
+            results[name] = {
+                "request_bytes": len(body),
+                "response_bytes": len(response.content),
+                "p50_ms": statistics.median(samples) * 1e3,
+                "best_ms": min(samples) * 1e3,
+            }
+    return results
+
+
+async def run(args):
+    import app as service
+
+    await service.startup_event()
+    feature_names = service.model_handler.feature_schema.feature_names
+    report = {}
+    for count in args.rows:
+        cases = payloads(synthetic_rows(count), feature_names)
+        report[count] = await measure(service, cases, args.requests)
+    await service.shutdown_event()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingestion formats of the tabular service")
+    parser.add_argument("--rows", default="64,1024", help="Comma-separated rows per request")
+    parser.add_argument("--requests", type=int, default=30, help="Timed requests per format")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+    args.rows = [int(value) for value in args.rows.split(",")]
+
+    # Same forest work for every format; /predict/batch must accept the largest size
+    os.environ["PREDICTION_CACHE_SIZE"] = "0"
+    os.environ["LOG_SAMPLE_RATE"] = "0"
+    os.environ["MAX_BATCH_SIZE"] = str(max(args.rows))
+    os.chdir(TABULAR_DIR)
+    sys.path.insert(0, str(TABULAR_DIR))
+    logging.disable(logging.CRITICAL)
+
+    report = asyncio.run(run(args))
+
+    print(f"\n📦 Bulk ingestion ({args.requests} requests per format)")
+    print(f"{'rows':>6}  {'format':<18}{'req KB':>9}{'resp KB':>9}{'p50 ms':>9}{'us/row':>9}{'speedup':>9}")
+    for count, results in report.items():
+        reference = results["batch-json"]["p50_ms"]
+        for name, result in results.items():
+            print(
+                f"{count:>6}  {name:<18}{result['request_bytes'] / 1024:>9.1f}{result['response_bytes'] / 1024:>9.1f}"
+                f"{result['p50_ms']:>9.2f}{result['p50_ms'] * 1e3 / count:>9.1f}{reference / result['p50_ms']:>8.1f}x"
+            )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
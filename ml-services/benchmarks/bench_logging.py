@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Per-request logging overhead benchmark.
+
+Replays the log calls of one /predict request many times and reports the
+time spent in the request thread, plus the time until the output is fully
+written:
+
+  sync-fstring   logging.basicConfig handler, eager f-strings (original behaviour)
+  queued-json    structured_logging queue writer, every request sampled
+  queued-json-10 structured_logging queue writer, LOG_SAMPLE_RATE=0.1
+
+Output goes to a temporary file so terminal speed does not skew results.
+On a single CPU the writer thread shares the core (and the GIL) with the
+caller, so part of its formatting work still shows up in the caller column.
+
+Usage:
+    python benchmarks/bench_logging.py --requests 20000
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from purrpal_common import structured_logging
+
+PREDICTION = "Feline Herpesvirus"
+CONFIDENCE = 83.4
+
+
+def request_sync_fstring(model_logger, access_logger):
+    model_logger.info(f"Prediction completed: {PREDICTION} ({CONFIDENCE:.2f}% confidence)")
+    access_logger.info(f"POST /predict 200 {1.234:.3f}ms")
+
+
+def request_queued(model_logger, access_logger):
+    context, token = structured_logging.begin_request()
+    with structured_logging.stage("score"):
+        pass
+    if structured_logging.sampled():
+        model_logger.info("Prediction completed: %s (%.2f%% confidence)", PREDICTION, CONFIDENCE)
+        access_logger.info(
+            "%s %s %d", "POST", "/predict", 200,
+            extra={"status": 200, "duration_ms": context.elapsed_ms(), "stages": context.stages}
+        )
+    structured_logging.end_request(token)
+
+
+def run_mode(mode, requests, repeats):
+    model_logger = logging.getLogger("model_handler")
+    access_logger = logging.getLogger("purrpal.access")
+    caller_us = []
+    drained_us = []
+    lines = 0
+
+    for _ in range(repeats):
+        with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as sink:
+            path = sink.name
+        with open(path, "w", buffering=1) as stream:
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+
+            if mode == "sync-fstring":
+                logging.basicConfig(level=logging.INFO, stream=stream, force=True)
+                call = request_sync_fstring
+            else:
+                os.environ["LOG_SAMPLE_RATE"] = "0.1" if mode == "queued-json-10" else "1.0"
+                os.environ["LOG_QUEUE_SIZE"] = str(requests * 2 + 1)
+                structured_logging.setup_logging("bench", stream=stream)
+                call = request_queued
+
+            started = time.perf_counter()
+            for _ in range(requests):
+                call(model_logger, access_logger)
+            called = time.perf_counter()
+            structured_logging.shutdown_logging()
+            stream.flush()
+            drained = time.perf_counter()
+
+        caller_us.append((called - started) / requests * 1e6)
+        drained_us.append((drained - started) / requests * 1e6)
+        with open(path) as f:
+            lines = sum(1 for _ in f)
+        os.unlink(path)
+
+    return {
+        "caller_us_per_request": round(statistics.median(caller_us), 2),
+        "total_us_per_request": round(statistics.median(drained_us), 2),
+        "lines_per_request": round(lines / requests, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging overhead per request")
+    parser.add_argument("--requests", type=int, default=20000, help="Simulated requests per run")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per mode (median reported)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    report = {}
+    print(f"{'mode':<16}{'caller us/req':>15}{'total us/req':>14}{'lines/req':>11}")
+    for mode in ["sync-fstring", "queued-json", "queued-json-10"]:
+        result = run_mode(mode, args.requests, args.repeats)
+        report[mode] = result
+        print(
+            f"{mode:<16}{result['caller_us_per_request']:>15.2f}"
+            f"{result['total_us_per_request']:>14.2f}{result['lines_per_request']:>11.3f}"
+        )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Metrics instrumentation overhead benchmark for the tabular service.
+
+Compares the per-request cost of the /metrics instrumentation (request
+counter, request and stage histograms, prediction counter, in-flight gauge)
+with the cost of an uncached prediction:
+
+  model       PurrPalTabularModel.predict with the cache and lookup table off
+  end-to-end  POST /predict through the ASGI app (no network), in a fresh
+              process with METRICS_ENABLED=1 and with METRICS_ENABLED=0
+
+Usage:
+    python benchmarks/bench_metrics.py --requests 3000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+TABULAR_DIR = Path(__file__).resolve().parent.parent / "tabular-services"
+
+CAT = {"name": "Bench", "age": 2.0, "gender": "male", "weight": 4.2, "body_temperature": 39.1,
+       "duration_days": 3, "heart_rate": 130}
+QUESTIONNAIRE = {"cough": True, "fever": True, "nasalDischarge": True}
+
+# Runs in a child interpreter so METRICS_ENABLED is read fresh at import
+END_TO_END_SCRIPT = r"""
+import asyncio, json, logging, os, sys, time
+import httpx
+import app as service
+logging.disable(logging.CRITICAL)
+requests = int(sys.argv[1])
+payload = {"cat_info": {"name": "Bench", "age": "2 tahun", "gender": "male", "weight": 4.2,
+                        "body_temperature": 39.1, "duration_days": 3, "heart_rate": 130},
+           "questionnaire": {"cough": True, "fever": True, "nasalDischarge": True}}
+
+async def main():
+    await service.startup_event()
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(200):
+            await client.post("/predict", json=payload)
+        samples = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.post("/predict", json=payload)
+            samples.append(time.perf_counter() - started)
+            assert response.status_code == 200
+    samples.sort()
+    print(json.dumps({"mean_us": sum(samples) / len(samples) * 1e6,
+                      "p50_us": samples[len(samples) // 2] * 1e6}))
+
+asyncio.run(main())
+"""
+
+
+def instrumentation_us(repeats: int) -> float:
+    """Cost of everything the middleware and /predict record for one request"""
+    sys.path.insert(0, str(TABULAR_DIR))
+    from purrpal_common import service_metrics
+    from purrpal_common.service_metrics import IN_FLIGHT, PREDICTIONS
+
+    stages = {"parse": 0.12, "vectorize": 0.02, "score": 0.15, "inference": 0.4, "render": 0.05}
+
+    def one_request():
+        IN_FLIGHT.inc()
+        PREDICTIONS.labels("Feline Herpesvirus").inc()
+        IN_FLIGHT.dec()
+        service_metrics.observe_request("/predict", "POST", 200, 0.0012, stages)
+
+    runs = [timeit.timeit(one_request, number=repeats) / repeats * 1e6 for _ in range(5)]
+    return statistics.median(runs)
+
+
+def model_predict_us(repeats: int) -> float:
+    import logging
+    logging.disable(logging.CRITICAL)
+    os.environ["LOOKUP_TABLE_PATH"] = ""
+    cwd = os.getcwd()
+    os.chdir(TABULAR_DIR)
+    try:
+        from model_handler import PurrPalTabularModel
+        model = PurrPalTabularModel(cache_size=0, lookup_table_path="")
+    finally:
+        os.chdir(cwd)
+    for _ in range(100):
+        model.predict(CAT, QUESTIONNAIRE)
+    runs = [
+        timeit.timeit(lambda: model.predict(CAT, QUESTIONNAIRE), number=repeats) / repeats * 1e6
+        for _ in range(5)
+    ]
+    return statistics.median(runs)
+
+
+def end_to_end_us(requests: int, metrics_enabled: bool) -> dict:
+    env = dict(os.environ, METRICS_ENABLED="1" if metrics_enabled else "0",
+               PREDICTION_CACHE_SIZE="0", LOOKUP_TABLE_PATH="", LOG_SAMPLE_RATE="0")
+    output = subprocess.run(
+        [sys.executable, "-c", END_TO_END_SCRIPT, str(requests)], cwd=TABULAR_DIR, env=env,
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrics instrumentation overhead")
+    parser.add_argument("--requests", type=int, default=3000, help="Requests per end-to-end run")
+    parser.add_argument("--runs", type=int, default=3, help="End-to-end runs per mode (median reported)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    instrumentation = instrumentation_us(20000)
+    model = model_predict_us(2000)
+
+    # Interleaved so drift on the machine affects both modes alike
+    on, off = [], []
+    for _ in range(args.runs):
+        on.append(end_to_end_us(args.requests, True)["mean_us"])
+        off.append(end_to_end_us(args.requests, False)["mean_us"])
+    on_us, off_us = statistics.median(on), statistics.median(off)
+
+    report = {
+        "instrumentation_us_per_request": round(instrumentation, 2),
+        "model_predict_us": round(model, 2),
+        "end_to_end_metrics_on_us": round(on_us, 2),
+        "end_to_end_metrics_off_us": round(off_us, 2),
+        "overhead_vs_end_to_end_pct": round(instrumentation / off_us * 100, 3),
+        "measured_end_to_end_delta_pct": round((on_us - off_us) / off_us * 100, 3),
+    }
+    print(f"Instrumentation per request:   {instrumentation:8.2f} us")
+    print(f"Uncached model.predict:        {model:8.2f} us")
+    print(f"POST /predict, metrics on:     {on_us:8.2f} us")
+    print(f"POST /predict, metrics off:    {off_us:8.2f} us")
+    print(f"Overhead (instrumentation / request): {report['overhead_vs_end_to_end_pct']:.3f}%")
+    print(f"Measured end-to-end delta:            {report['measured_end_to_end_delta_pct']:+.3f}% (includes noise)")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark suite for the prediction hot paths of both services.
+
+Every stage is timed in isolation on synthetic, seeded inputs, plus the
+whole predict call end to end:
+
+  tabular.dataframe_build   preprocess_input (pandas DataFrame, legacy path)
+  tabular.transform         preprocessor.transform of that DataFrame
+  tabular.vectorize         FeatureSchema vectorize + standardize (serving path)
+  tabular.forest_predict    predict_proba of the active backend
+  tabular.response          diagnosis texts + PredictionResponse JSON
+  tabular.end_to_end        PurrPalTabularModel.predict (uncached) + response
+
+  vision.data_url_parse     data-URL split + base64 decode
+  vision.pil_decode         PIL decode to an RGB array
+  vision.resize_normalize   cv2.resize + float32 scaling
+  vision.keras_predict      model.predict on one 128x128 image (before compiled inference)
+  vision.forward            compiled inference function on one 128x128 image (serving path)
+  vision.response           result dict + JSON body
+  vision.end_to_end         ModelHandler.predict + JSON body
+
+Each benchmark reports p50/p95/p99 latency, throughput and the peak Python
+heap allocated by one call (tracemalloc, measured in a separate pass so it
+does not slow the timed runs). The timed calls are split over interleaved
+rounds, and the best round median (best_p50_us) is what --baseline compares
+by default: on shared machines it moves far less than the pooled p50.
+Results go to --json; --baseline exits 1 when a benchmark is slower than the
+stored result by more than --tolerance. Compare runs of the same benchmark
+selection, since earlier benchmarks affect later ones.
+
+The vision benchmarks need TensorFlow and are skipped without it. Without
+--vision-model a small seeded stand-in Keras model with the production
+input and output shapes is built, so Keras numbers measure the serving
+overhead rather than the real network.
+
+Usage:
+    python benchmarks/bench_predict.py --json results.json
+    python benchmarks/bench_predict.py --baseline benchmarks/baselines/predict.json
+    python benchmarks/bench_predict.py --service tabular --save-baseline benchmarks/baselines/predict.json
+"""
+
+import argparse
+import base64
+import importlib.util
+import io
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+TABULAR_DIR = ROOT / "tabular-services"
+VISION_DIR = ROOT / "vision-service"
+
+SEED = 1234
+INPUT_VARIANTS = 256
+MEMORY_CALLS = 20
+
+
+def synthetic_tabular_inputs(count, seed=SEED):
+    """Seeded (cat_data, questionnaire_data) pairs covering the questionnaire and vitals"""
+    sys.path.insert(0, str(TABULAR_DIR))
+    from feature_schema import QUESTIONNAIRE_MAPPING
+
+    rng = random.Random(seed)
+    questions = sorted(QUESTIONNAIRE_MAPPING)
+    inputs = []
+    for i in range(count):
+        cat_data = {
+            "name": f"Bench{i}",
+            "age": float(rng.randint(1, 15)),
+            "gender": rng.choice(["male", "female"]),
+            "weight": round(rng.uniform(2.0, 7.5), 1),
+            "body_temperature": round(rng.uniform(37.5, 40.5), 1),
+            "duration_days": rng.randint(1, 14),
+            "heart_rate": rng.randint(100, 200),
+        }
+        questionnaire_data = {question: rng.random() < 0.3 for question in questions}
+        inputs.append((cat_data, questionnaire_data))
+    return inputs
+
+
+def synthetic_image_data_url(width, height, seed=SEED):
+    """Seeded JPEG data URL: a smooth gradient with noise, like a photo rather than pure noise"""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width)[None, :, None]
+    y = np.linspace(0, 255, height)[:, None, None]
+    base = np.concatenate([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def build_stand_in_model(path, num_classes, seed=SEED):
+    """Small CNN with the production model's input (128x128x3) and outputs (class softmax, box)"""
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(seed)
+    inputs = tf.keras.Input(shape=(128, 128, 3))
+    x = tf.keras.layers.Conv2D(16, 3, strides=2, activation="relu")(inputs)
+    x = tf.keras.layers.Conv2D(32, 3, strides=2, activation="relu")(x)
+    x = tf.keras.layers.Conv2D(64, 3, strides=2, activation="relu")(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    classes = tf.keras.layers.Dense(num_classes, activation="softmax", name="class_output")(x)
+    box = tf.keras.layers.Dense(4, activation="sigmoid", name="bbox_output")(x)
+    tf.keras.Model(inputs, [classes, box]).save(path)
+    return path
+
+
+def _load_module(name, path):
+    """Import a module from a file under an alias (both services have a model_handler.py)"""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def tabular_benchmarks(args):
+    """(name, callable, iterations) for the tabular service"""
+    sys.path.insert(0, str(TABULAR_DIR))
+    cwd = os.getcwd()
+    os.chdir(TABULAR_DIR)
+    try:
+        from model_handler import PurrPalTabularModel
+        import app as service
+
+        # Loaded from the joblib files, so the DataFrame path and preprocessor are available too
+        model = PurrPalTabularModel(cache_size=0, lookup_table_path="", bundle_path="")
+        catalog = service.DiagnosisCatalog(list(model.class_names))
+    finally:
+        os.chdir(cwd)
+
+    inputs = synthetic_tabular_inputs(INPUT_VARIANTS)
+    frames = [model.preprocess_input(cat, answers) for cat, answers in inputs]
+    processed = [model.transform_input(cat, answers) for cat, answers in inputs]
+    results = [model.predict(cat, answers) for cat, answers in inputs]
+    cycle = _cycler(len(inputs))
+
+    def dataframe_build():
+        cat, answers = inputs[next(cycle)]
+        model.preprocess_input(cat, answers)
+
+    def transform():
+        model.preprocessor.transform(frames[next(cycle)])
+
+    def vectorize():
+        cat, answers = inputs[next(cycle)]
+        schema = model.feature_schema
+        block = schema.new_block(1)
+        schema.vectorize(cat, answers, out=block[0])
+        schema.standardize(block)
+
+    def forest_predict():
+        model.predict_proba(processed[next(cycle)])
+
+    def response():
+        i = next(cycle)
+        service._build_prediction_response(results[i], inputs[i][0], catalog).model_dump_json()
+
+    def end_to_end():
+        cat, answers = inputs[next(cycle)]
+        service._build_prediction_response(model.predict(cat, answers), cat, catalog).model_dump_json()
+
+    n = args.iterations
+    return [
+        ("tabular.dataframe_build", dataframe_build, n or 2000),
+        ("tabular.transform", transform, n or 2000),
+        ("tabular.vectorize", vectorize, n or 5000),
+        ("tabular.forest_predict", forest_predict, n or 2000),
+        ("tabular.response", response, n or 5000),
+        ("tabular.end_to_end", end_to_end, n or 2000),
+    ]
+
+
+def vision_benchmarks(args):
+    """(name, callable, iterations) for the vision service, or [] without TensorFlow"""
+    try:
+        import tensorflow as tf  # noqa: F401
+        import cv2
+        from PIL import Image
+    except ImportError as e:
+        print(f"⚠️  Skipping vision benchmarks: {e}")
+        return []
+
+    sys.path.insert(1, str(VISION_DIR))
+    class_map_path = VISION_DIR / "models" / "class_map.json"
+    model_path = args.vision_model
+    if model_path is None:
+        with open(class_map_path) as f:
+            num_classes = len(json.load(f))
+        model_path = build_stand_in_model(
+            os.path.join(tempfile.mkdtemp(prefix="purrpal-bench-"), "stand_in.h5"), num_classes
+        )
+    handler_module = _load_module("vision_model_handler", VISION_DIR / "model_handler.py")
+    handler = handler_module.ModelHandler(str(model_path), str(class_map_path))
+
+    width, height = (int(value) for value in args.image_size.lower().split("x"))
+    data_url = synthetic_image_data_url(width, height)
+    encoded = data_url.split(",")[1]
+    image_bytes = base64.b64decode(encoded)
+    pixels = np.array(Image.open(io.BytesIO(image_bytes)))
+    batch = handler._preprocess_image(pixels)
+    class_probs = handler.model.predict(batch, verbose=0)[0][0]
+
+    def data_url_parse():
+        base64.b64decode(data_url.split(",")[1])
+
+    def pil_decode():
+        image = np.array(Image.open(io.BytesIO(image_bytes)))
+        if len(image.shape) == 2:
+            cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+
+    def resize_normalize():
+        handler._preprocess_image(pixels)
+
+    def keras_predict():
+        handler.model.predict(batch, verbose=0)
+
+    def forward():
+        handler._forward(batch)
+
+    def response():
+        result = handler._build_result(class_probs, 0.0)
+        json.dumps({"success": True, "data": result})
+
+    def end_to_end():
+        result = handler.predict(data_url, confidence_threshold=0.0)
+        json.dumps({"success": True, "data": result})
+
+    n = args.iterations
+    return [
+        ("vision.data_url_parse", data_url_parse, n or 1000),
+        ("vision.pil_decode", pil_decode, n or 300),
+        ("vision.resize_normalize", resize_normalize, n or 1000),
+        ("vision.keras_predict", keras_predict, n or 100),
+        ("vision.forward", forward, n or 1000),
+        ("vision.response", response, n or 5000),
+        ("vision.end_to_end", end_to_end, n or 100),
+    ]
+
+
+def _cycler(count):
+    i = 0
+    while True:
+        yield i
+        i = (i + 1) % count
+
+
+def time_calls(func, iterations):
+    """Per-call durations in seconds and the total elapsed time"""
+    samples = np.empty(iterations)
+    clock = time.perf_counter
+    started = clock()
+    for i in range(iterations):
+        call_started = clock()
+        func()
+        samples[i] = clock() - call_started
+    return samples, clock() - started
+
+
+def peak_allocation(func):
+    """Median peak of Python heap allocations (bytes) made by one call"""
+    tracemalloc.start()
+    peaks = []
+    for _ in range(MEMORY_CALLS):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        func()
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return float(np.median(peaks))
+
+
+def summarize(rounds, peak_bytes):
+    """
+    Combine the (samples, elapsed) of every round of one benchmark.
+
+    Percentiles are taken over all samples. best_p50_us is the lowest round
+    median: the least noise-sensitive figure, used for baseline comparison.
+    """
+    samples = np.concatenate([round_samples for round_samples, _ in rounds])
+    elapsed = sum(round_elapsed for _, round_elapsed in rounds)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1e6
+    return {
+        "iterations": len(samples),
+        "mean_us": round(float(samples.mean() * 1e6), 2),
+        "best_p50_us": round(min(float(np.median(round_samples)) for round_samples, _ in rounds) * 1e6, 2),
+        "p50_us": round(float(p50), 2),
+        "p95_us": round(float(p95), 2),
+        "p99_us": round(float(p99), 2),
+        "throughput_per_s": round(len(samples) / elapsed, 1),
+        "peak_alloc_kb": round(peak_bytes / 1024, 1),
+    }
+
+
+def environment_info():
+    import numpy
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+    }
+    for module in ["sklearn", "pandas", "tensorflow", "cv2", "PIL"]:
+        if module in sys.modules:
+            info[module] = getattr(sys.modules[module], "__version__", "unknown")
+    return info
+
+
+def compare(results, baseline, metric, tolerance):
+    """
+    Compare results with a baseline file's benchmarks.
+
+    Returns:
+        List of (name, baseline value, current value, ratio, regressed) for shared benchmarks
+    """
+    rows = []
+    for name, result in results.items():
+        reference = baseline.get("benchmarks", {}).get(name)
+        if reference is None:
+            continue
+        ratio = result[metric] / reference[metric] if reference[metric] else float("inf")
+        rows.append((name, reference[metric], result[metric], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prediction hot-path micro-benchmarks")
+    parser.add_argument("--service", choices=["all", "tabular", "vision"], default="all")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--iterations", type=int, default=None, help="Timed calls per benchmark")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed calls before timing")
+    parser.add_argument("--rounds", type=int, default=5, help="Interleaved rounds the iterations are split over")
+    parser.add_argument("--image-size", default="640x480", help="Synthetic image size (WxH)")
+    parser.add_argument("--vision-model", default=None, help="Real .h5 model (stand-in built if omitted)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Fail if slower than this result file")
+    parser.add_argument("--metric", choices=["best_p50_us", "p50_us", "p95_us", "p99_us", "mean_us"],
+                        default="best_p50_us",
+                        help="Latency compared with the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", default=None,
+                        help="Merge these results into a baseline file (other benchmarks are kept)")
+    args = parser.parse_args()
+
+    # Model loading logs would interleave with the table
+    logging.disable(logging.CRITICAL)
+    random.seed(SEED)
+    np.random.seed(SEED)
+
+    benchmarks = []
+    if args.service in ("all", "tabular"):
+        benchmarks += tabular_benchmarks(args)
+    if args.service in ("all", "vision"):
+        benchmarks += vision_benchmarks(args)
+    if args.filter:
+        benchmarks = [item for item in benchmarks if args.filter in item[0]]
+
+    for _, func, _ in benchmarks:
+        for _ in range(args.warmup):
+            func()
+
+    # Rounds interleave the benchmarks so slow phases of the machine hit all of them alike
+    timings = {name: [] for name, _, _ in benchmarks}
+    for _ in range(args.rounds):
+        for name, func, iterations in benchmarks:
+            timings[name].append(time_calls(func, max(1, iterations // args.rounds)))
+
+    results = {}
+    print(f"{'benchmark':<26}{'p50 us':>11}{'p95 us':>11}{'p99 us':>11}{'ops/s':>11}{'peak KB':>10}")
+    for name, func, _ in benchmarks:
+        result = summarize(timings[name], peak_allocation(func))
+        results[name] = result
+        print(
+            f"{name:<26}{result['p50_us']:>11.1f}{result['p95_us']:>11.1f}{result['p99_us']:>11.1f}"
+            f"{result['throughput_per_s']:>11.1f}{result['peak_alloc_kb']:>10.1f}"
+        )
+
+    report = {
+        "seed": SEED,
+        "vision_model": args.vision_model or "stand-in",
+        "image_size": args.image_size,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "environment": environment_info(),
+        "benchmarks": results,
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True))
+
+    if args.save_baseline:
+        path = Path(args.save_baseline)
+        stored = json.loads(path.read_text()) if path.exists() else {"benchmarks": {}, "environments": {}}
+        stored["benchmarks"].update(results)
+        stored["environments"][args.service] = report["environment"]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        print(f"💾 Baseline updated: {path}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        rows = compare(results, baseline, args.metric, args.tolerance)
+        print(f"\nComparison with {args.baseline} ({args.metric}, tolerance {args.tolerance:.0%}):")
+        stored_environment = baseline.get("environments", {}).get(args.service)
+        if stored_environment and stored_environment != report["environment"]:
+            print("⚠️  Baseline was recorded in a different environment; regenerate it on this machine")
+        print(f"{'benchmark':<26}{'baseline':>11}{'current':>11}{'change':>10}")
+        for name, before, after, ratio, regressed in rows:
+            marker = "❌ REGRESSION" if regressed else "✅"
+            print(f"{name:<26}{before:>11.1f}{after:>11.1f}{ratio - 1:>+10.1%}  {marker}")
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions:
+            print(f"\n❌ {len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the tabular service.
+
+Starts a fresh interpreter per run and reports time-to-first-prediction and
+RSS for each serving mode:
+
+  joblib-sklearn  joblib files + sklearn predict_proba (original behaviour)
+  joblib-native   joblib files + flattened forest
+  bundle          precompiled bundle, NumPy only (no pandas/sklearn import)
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TABULAR_DIR = Path(__file__).resolve().parent.parent / "tabular-services"
+
+# Runs inside the child interpreter; everything is timed from interpreter start
+CHILD_SCRIPT = r"""
+import time
+started = time.perf_counter()
+import json, logging, sys
+logging.disable(logging.CRITICAL)
+from model_handler import PurrPalTabularModel
+imported = time.perf_counter()
+model = PurrPalTabularModel(cache_size=0)
+loaded = time.perf_counter()
+model.predict({"name": "Bench", "age": 2.0, "gender": "male"}, {"cough": True, "fever": True})
+first = time.perf_counter()
+
+status = {}
+with open("/proc/self/status") as f:
+    for line in f:
+        key, _, value = line.partition(":")
+        status[key] = value.strip()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "load_ms": (loaded - imported) * 1000,
+    "first_prediction_ms": (first - loaded) * 1000,
+    "in_process_ms": (first - started) * 1000,
+    "rss_mb": int(status["VmRSS"].split()[0]) / 1024,
+    "peak_rss_mb": int(status["VmHWM"].split()[0]) / 1024,
+    "pandas_imported": "pandas" in sys.modules,
+    "sklearn_imported": "sklearn" in sys.modules,
+}))
+"""
+
+
+def run_once(env_overrides):
+    env = dict(os.environ, **env_overrides)
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT], cwd=TABULAR_DIR, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    # Wall time includes interpreter startup and process exit
+    result["wall_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabular service cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode")
+    parser.add_argument("--bundle", default=None, help="Existing bundle (compiled to a temp file if omitted)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    bundle = args.bundle
+    if bundle is None:
+        bundle = str(Path(tempfile.mkdtemp()) / "purrpal_symptoms_rf.bundle")
+        subprocess.run(
+            [sys.executable, "model_bundle.py", "--output", bundle], cwd=TABULAR_DIR,
+            check=True, capture_output=True
+        )
+
+    modes = {
+        "joblib-sklearn": {"MODEL_BUNDLE": "", "TABULAR_BACKEND": "sklearn"},
+        "joblib-native": {"MODEL_BUNDLE": "", "TABULAR_BACKEND": "native"},
+        "bundle": {"MODEL_BUNDLE": bundle, "TABULAR_BACKEND": "native"},
+    }
+
+    report = {}
+    print(f"{'mode':<16}{'wall ms':>10}{'import ms':>11}{'load ms':>10}{'1st pred ms':>13}{'RSS MB':>9}  pandas/sklearn")
+    for mode, env in modes.items():
+        runs = [run_once(env) for _ in range(args.runs)]
+        summary = {
+            key: round(statistics.median(run[key] for run in runs), 2)
+            for key in ["wall_ms", "import_ms", "load_ms", "first_prediction_ms", "in_process_ms", "rss_mb", "peak_rss_mb"]
+        }
+        summary["pandas_imported"] = runs[0]["pandas_imported"]
+        summary["sklearn_imported"] = runs[0]["sklearn_imported"]
+        report[mode] = summary
+        print(
+            f"{mode:<16}{summary['wall_ms']:>10.1f}{summary['import_ms']:>11.1f}{summary['load_ms']:>10.1f}"
+            f"{summary['first_prediction_ms']:>13.2f}{summary['rss_mb']:>9.1f}  "
+            f"{summary['pandas_imported']}/{summary['sklearn_imported']}"
+        )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
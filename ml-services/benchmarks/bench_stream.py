@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Streaming bulk scoring benchmark for the tabular service (/predict/stream).
+
+Uploads --rows synthetic submissions per run as NDJSON or CSV, generated on
+the fly, while reading the results as they come back, and reports rows per
+second, time to the first result and the server's peak RSS. Memory should
+stay flat as the row count grows.
+
+The upload is sent with chunked transfer encoding and the response read
+concurrently. Clients that send the whole body before reading (requests,
+httpx) stall on large uploads once the server's send buffers fill up.
+
+Usage:
+    python benchmarks/bench_stream.py --rows 10000,100000,1000000
+    python benchmarks/bench_stream.py --format csv --url http://127.0.0.1:8001 --server-pid 1234
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from load_test import (  # noqa: E402
+    QUESTIONS, RssSampler, _free_port, _questionnaire_request, start_server, stop_server, wait_ready
+)
+
+CAT_FIELDS = ["name", "age", "gender", "weight", "body_temperature", "duration_days", "heart_rate"]
+CONTENT_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def upload_chunks(rows, upload_format, seed, rows_per_chunk=1000):
+    """Encoded upload in chunks of ``rows_per_chunk`` lines"""
+    rng = random.Random(seed)
+    lines = []
+    if upload_format == "csv":
+        lines.append(",".join(["id"] + CAT_FIELDS + QUESTIONS))
+    for index in range(rows):
+        item = _questionnaire_request(rng, (1, 6))
+        if upload_format == "csv":
+            cells = [str(index)] + [str(item["cat_info"][field]) for field in CAT_FIELDS]
+            cells += ["1" if item["questionnaire"][question] else "0" for question in QUESTIONS]
+            lines.append(",".join(cells))
+        else:
+            lines.append(json.dumps({"id": index, **item}))
+        if len(lines) >= rows_per_chunk:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def send_upload(writer, host, rows, upload_format, seed):
+    writer.write(
+        f"POST /predict/stream HTTP/1.1\r\nHost: {host}\r\nContent-Type: {CONTENT_TYPES[upload_format]}\r\n"
+        f"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n".encode()
+    )
+    for chunk in upload_chunks(rows, upload_format, seed):
+        writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+async def read_results(reader, started):
+    """(result lines, seconds to the first result, summary) of a chunked NDJSON response"""
+    status = await reader.readline()
+    if b" 200 " not in status:
+        raise RuntimeError(f"Unexpected response: {status!r}")
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+
+    results = 0
+    first = None
+    pending = b""
+    last = b""
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        if size == 0:
+            break
+        data = pending + await reader.readexactly(size)
+        await reader.readexactly(2)
+        lines = data.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.startswith(b'{"line"'):
+                results += 1
+                if first is None:
+                    first = time.perf_counter() - started
+            last = line
+    return results, first, json.loads(last)["summary"]
+
+
+async def run_upload(host, port, rows, upload_format, seed, server_pid):
+    sampler = RssSampler(server_pid, 0.2)
+    sampler.start()
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port, limit=2 ** 20)
+    try:
+        sending = asyncio.ensure_future(send_upload(writer, host, rows, upload_format, seed))
+        results, first, summary = await read_results(reader, started)
+        await sending
+    finally:
+        writer.close()
+        await sampler.stop()
+    seconds = time.perf_counter() - started
+    samples = sampler.window(0)
+    return {
+        "rows": rows,
+        "results": results,
+        "failed": summary["failed"],
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1),
+        "server_rows_per_second": summary["rows_per_second"],
+        "first_result_s": round(first, 3) if first is not None else None,
+        "server_rss_mb": max((rss for rss, _ in samples), default=None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming bulk scoring of the tabular service")
+    parser.add_argument("--rows", default="10000,100000", help="Comma-separated rows per upload, one run each")
+    parser.add_argument("--format", choices=sorted(CONTENT_TYPES), default="ndjson")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--url", default=None, help="Target an already running service instead of starting one")
+    parser.add_argument("--server-pid", type=int, default=None, help="Pid to sample RSS from with --url")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the started service (repeatable)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    process = None
+    server_pid = args.server_pid
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        env = dict(item.split("=", 1) for item in ["LOG_SAMPLE_RATE=0"] + args.env)
+        log_path = tempfile.mkstemp(prefix="purrpal-stream-", suffix=".log")[1]
+        process = start_server("tabular", sys.executable, None, port, env, log_path)
+        server_pid = process.pid
+        print(f"🚀 Started tabular service (log: {log_path})")
+
+    report = []
+    try:
+        asyncio.run(wait_ready(host, port, 120, process))
+        print(f"{'rows':>10}{'failed':>8}{'seconds':>10}{'rows/s':>10}{'first s':>9}{'rss MB':>9}")
+        for rows in (int(value) for value in args.rows.split(",")):
+            result = asyncio.run(run_upload(host, port, rows, args.format, args.seed, server_pid))
+            report.append(result)
+            print(f"{result['rows']:>10}{result['failed']:>8}{result['seconds']:>10.2f}"
+                  f"{result['rows_per_second']:>10.0f}{result['first_result_s'] or float('nan'):>9.3f}"
+                  f"{result['server_rss_mb'] or float('nan'):>9.1f}")
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
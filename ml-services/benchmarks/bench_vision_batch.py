@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Vision batch prediction throughput (ModelHandler.predict_batch, POST /predict/batch).
+
+For every batch size, predicts the same set of seeded JPEG data URLs one
+request at a time (ModelHandler.predict per image, as separate /predict
+calls do) and as one batch (parallel decode on the decode pool, one forward
+pass), and reports images per second for both. The decode stage alone
+(sequential against the decode pool) and the forward pass alone (batches of
+one against one batch) are reported too, to show where the gain comes from.
+
+Needs TensorFlow. Without --vision-model the seeded stand-in model of
+bench_predict.py is used.
+
+Usage:
+    python benchmarks/bench_vision_batch.py
+    python benchmarks/bench_vision_batch.py --batch-sizes 1,8,32 --image-size 1920x1440 --json vision_batch.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+VISION_DIR = BENCH_DIR.parent / "vision-service"
+
+
+def median_seconds(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Images per second of batched against per-image vision predictions")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="Comma-separated images per batch")
+    parser.add_argument("--image-size", default="1280x960", help="Synthetic JPEG size (WxH)")
+    parser.add_argument("--repeats", type=int, default=10, help="Timed runs per configuration (median is kept)")
+    parser.add_argument("--vision-model", default=None, help="Real .h5 model (stand-in built if omitted)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BENCH_DIR))
+    sys.path.insert(1, str(VISION_DIR))
+    logging.disable(logging.CRITICAL)
+    from bench_predict import build_stand_in_model, synthetic_image_data_url
+    import model_handler
+
+    class_map_path = VISION_DIR / "models" / "class_map.json"
+    model_path = args.vision_model
+    if model_path is None:
+        num_classes = len(json.loads(class_map_path.read_text()))
+        model_path = build_stand_in_model(
+            os.path.join(tempfile.mkdtemp(prefix="purrpal-bench-"), "stand_in.h5"), num_classes
+        )
+    handler = model_handler.ModelHandler(str(model_path), str(class_map_path))
+
+    width, height = (int(value) for value in args.image_size.lower().split("x"))
+    sizes = [int(value) for value in args.batch_sizes.split(",")]
+    # Distinct photos (different noise seeds), as a user uploading several shots would send
+    images = [synthetic_image_data_url(width, height, seed=seed) for seed in range(max(sizes))]
+    print(f"📷 {width}x{height} JPEGs, {model_handler.DECODE_THREADS} decode threads")
+
+    handler.predict_batch(images)  # Warm up the pool and every batch shape
+    for size in sizes:
+        handler.predict_batch(images[:size])
+        handler.predict(images[0])
+
+    report = []
+    print(f"{'images':>7}{'stage':>10}{'single img/s':>14}{'batch img/s':>13}{'speedup':>9}")
+    for size in sizes:
+        batch_images = images[:size]
+        inputs = handler._preprocess_batch(batch_images)
+        single_inputs = [inputs[i:i + 1] for i in range(size)]
+        stages = {
+            "end2end": (lambda: [handler.predict(image) for image in batch_images],
+                        lambda: handler.predict_batch(batch_images)),
+            "decode": (lambda: [handler._preprocess_image(image) for image in batch_images],
+                       lambda: handler._preprocess_batch(batch_images)),
+            "forward": (lambda: [handler._forward(one) for one in single_inputs],
+                        lambda: handler._forward(inputs)),
+        }
+        for stage, (single, batched) in stages.items():
+            single_rate = size / median_seconds(single, args.repeats)
+            batch_rate = size / median_seconds(batched, args.repeats)
+            report.append({"images": size, "stage": stage, "single_images_per_s": single_rate,
+                           "batch_images_per_s": batch_rate, "speedup": batch_rate / single_rate})
+            print(f"{size:>7}{stage:>10}{single_rate:>14.1f}{batch_rate:>13.1f}{batch_rate / single_rate:>8.2f}x")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
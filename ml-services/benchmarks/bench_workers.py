@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Single-process vs multi-worker serving comparison.
+
+Runs benchmarks/load_test.py against each serving mode of one service and
+prints throughput, p95 latency and the memory of the whole server process
+tree side by side:
+
+  single           python app.py (the previous Docker entry point)
+  gunicorn-1       gunicorn.conf.py with one worker
+  gunicorn-N       gunicorn.conf.py with --workers workers, preloaded
+  gunicorn-N-copy  the same with PRELOAD_APP=0 (every worker loads its own copy)
+
+PSS splits shared pages between the processes sharing them, so the
+gunicorn-N vs gunicorn-N-copy PSS gap is the memory saved by copy-on-write.
+
+Usage:
+    python benchmarks/bench_workers.py --service tabular --workers 4
+    /path/to/vision/venv/bin/python benchmarks/bench_workers.py --service vision --workers 2 \\
+        --env MODEL_PATH=/path/to/cat_disease.h5 --concurrency 8,32
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+LOAD_TEST = Path(__file__).resolve().parent / "load_test.py"
+GUNICORN = "{python} -m gunicorn -c gunicorn.conf.py app:app"
+
+
+def run_mode(args, command, env):
+    with tempfile.NamedTemporaryFile(suffix=".json") as output:
+        cli = [
+            sys.executable, str(LOAD_TEST), "--service", args.service, "--server-cmd", command,
+            "--concurrency", args.concurrency, "--stage-seconds", str(args.stage_seconds),
+            "--output", output.name, "--env", "LOG_SAMPLE_RATE=0",
+        ]
+        for item in env + args.env:
+            cli += ["--env", item]
+        subprocess.run(cli, check=True, stdout=subprocess.DEVNULL)
+        return json.loads(Path(output.name).read_text())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-process vs multi-worker serving")
+    parser.add_argument("--service", choices=["tabular", "vision"], required=True)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", default="50,200")
+    parser.add_argument("--stage-seconds", type=float, default=15.0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for every mode (repeatable)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    workers = f"WEB_CONCURRENCY={args.workers}"
+    modes = [
+        ("single", "{python} app.py", []),
+        ("gunicorn-1", GUNICORN, ["WEB_CONCURRENCY=1"]),
+        (f"gunicorn-{args.workers}", GUNICORN, [workers]),
+        (f"gunicorn-{args.workers}-copy", GUNICORN, [workers, "PRELOAD_APP=0"]),
+    ]
+
+    report = {}
+    print(f"{'mode':<20}{'conc':>6}{'rps':>10}{'p95 ms':>10}{'rss MB':>10}{'pss MB':>10}")
+    for name, command, env in modes:
+        stages = run_mode(args, command, env)["stages"]
+        report[name] = stages
+        for stage in stages:
+            print(
+                f"{name:<20}{stage['concurrency']:>6}{stage['throughput_rps']:>10.1f}"
+                f"{stage['latency_ms'].get('p95', float('nan')):>10.1f}"
+                f"{stage['server_rss_mb']['peak']:>10.1f}{stage['server_pss_mb']['peak']:>10.1f}"
+            )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+
+if __name__ == "__main__":
+    main()
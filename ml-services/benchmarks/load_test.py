@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Local HTTP load test for the PurrPal services.
+
+Starts a service on a free local port (or targets --url), replays a weighted
+mix of payloads from a fixed number of closed-loop clients, and steps the
+concurrency through --concurrency. Every stage reports throughput, latency
+percentiles overall and per payload, errors by kind, and the RSS and PSS of
+the server's whole process tree (sampled in the background, so forked
+workers are included).
+
+Payloads are generated up front from a seed:
+
+  tabular  questionnaires with few or many symptoms and /predict/batch bodies
+  vision   base64 JPEG data URLs of several sizes, full and compact responses
+
+--mix replaces the built-in mix with a JSON list of entries like
+{"name": "large", "weight": 1, "kind": "image", "width": 1600, "height": 1200}
+(kinds: questionnaire, questionnaire_batch, image).
+
+The client is a minimal asyncio HTTP/1.1 keep-alive client, so a single core
+can drive hundreds of connections; its CPU time is reported per stage to show
+when the generator, not the server, was the limit. The JSON report (--output)
+has sorted keys, rounded values and no timestamps or pids, so two runs can be
+compared with diff.
+
+Usage:
+    python benchmarks/load_test.py --service tabular --concurrency 50,100,200,500 --output tabular.json
+    python benchmarks/load_test.py --service vision --python /path/to/venv/bin/python --concurrency 8,32
+    python benchmarks/load_test.py --service tabular --url http://127.0.0.1:8001 --server-pid 1234
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVICE_DIRS = {"tabular": ROOT / "tabular-services", "vision": ROOT / "vision-service"}
+
+QUESTIONS = [
+    "cough", "breathingDifficulty", "fever", "discomfort", "appetiteLoss", "weightLoss",
+    "vomiting", "diarrhea", "coughDuration", "phlegmGreen", "phlegmBlood", "nightSweats",
+    "yellowPhlegm", "breathingSound", "skinLesions", "nasalDischarge", "eyeDischarge",
+]
+
+DEFAULT_MIXES = {
+    "tabular": [
+        {"name": "sparse", "weight": 6, "kind": "questionnaire", "symptoms": [1, 3]},
+        {"name": "dense", "weight": 3, "kind": "questionnaire", "symptoms": [5, 12]},
+        {"name": "batch-16", "weight": 1, "kind": "questionnaire_batch", "items": 16},
+    ],
+    "vision": [
+        {"name": "small", "weight": 5, "kind": "image", "width": 320, "height": 240},
+        {"name": "medium", "weight": 4, "kind": "image", "width": 800, "height": 600},
+        {"name": "large", "weight": 1, "kind": "image", "width": 1600, "height": 1200},
+        {"name": "medium-compact", "weight": 2, "kind": "image", "width": 800, "height": 600,
+         "compact": True},
+    ],
+}
+
+VARIANTS_PER_ENTRY = 32
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _questionnaire_request(rng: random.Random, symptoms) -> Dict:
+    low, high = symptoms
+    active = set(rng.sample(QUESTIONS, rng.randint(low, high)))
+    return {
+        "cat_info": {
+            "name": f"Load{rng.randint(0, 9999)}",
+            "age": f"{rng.randint(1, 15)} tahun",
+            "gender": rng.choice(["male", "female"]),
+            "weight": round(rng.uniform(2.0, 7.5), 1),
+            "body_temperature": round(rng.uniform(37.5, 40.5), 1),
+            "duration_days": rng.randint(1, 14),
+            "heart_rate": rng.randint(100, 200),
+        },
+        "questionnaire": {question: question in active for question in QUESTIONS},
+    }
+
+
+def _image_data_url(rng: random.Random, width: int, height: int) -> str:
+    from PIL import Image
+
+    noise = np.random.default_rng(rng.getrandbits(32))
+    x = np.linspace(0, 255, width)[None, :, None]
+    y = np.linspace(0, 255, height)[:, None, None]
+    base = np.concatenate([x + 0 * y, y + 0 * x, (x + y) / 2], axis=2)
+    pixels = np.clip(base + noise.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class PayloadMix:
+    """Pre-encoded request bodies per mix entry and a weighted picker"""
+
+    def __init__(self, entries: List[Dict], seed: int):
+        rng = random.Random(seed)
+        self.entries = []
+        for entry in entries:
+            kind = entry["kind"]
+            bodies = []
+            for _ in range(entry.get("variants", VARIANTS_PER_ENTRY)):
+                if kind == "questionnaire":
+                    body = _questionnaire_request(rng, entry.get("symptoms", [1, 5]))
+                    path = "/predict"
+                elif kind == "questionnaire_batch":
+                    body = {"items": [_questionnaire_request(rng, entry.get("symptoms", [1, 5]))
+                                      for _ in range(entry.get("items", 16))]}
+                    path = "/predict/batch"
+                elif kind == "image":
+                    body = {"image": _image_data_url(rng, entry["width"], entry["height"]),
+                            "cat_info": {"name": "Load"}}
+                    path = "/predict"
+                else:
+                    raise ValueError(f"Unknown payload kind '{kind}' in mix entry {entry['name']}")
+                bodies.append(json.dumps(body).encode("utf-8"))
+            if entry.get("compact"):
+                path += "?format=compact"
+            self.entries.append({
+                "name": entry["name"], "weight": entry.get("weight", 1), "path": entry.get("path", path),
+                "bodies": bodies, "mean_kb": round(sum(map(len, bodies)) / len(bodies) / 1024, 1),
+            })
+        self.names = [entry["name"] for entry in self.entries]
+        self.weights = [entry["weight"] for entry in self.entries]
+
+    def pick(self, rng: random.Random):
+        entry = rng.choices(self.entries, weights=self.weights)[0]
+        return entry["name"], entry["path"], entry["bodies"][rng.randrange(len(entry["bodies"]))]
+
+    def describe(self) -> List[Dict]:
+        return [{key: entry[key] for key in ("name", "weight", "path", "mean_kb")} for entry in self.entries]
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection (reconnects after the server closes it)"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: bytes = b"") -> int:
+        reused = self.writer is not None
+        try:
+            return await self._exchange(method, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            # An idle keep-alive connection the server closed (e.g. a recycled worker)
+            # fails before any response byte; retry once on a new one, like HTTP clients do
+            if not reused or getattr(e, "partial", b""):
+                raise
+            self.close()
+            return await self._exchange(method, path, body)
+
+    async def _exchange(self, method: str, path: str, body: bytes) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        self.writer.write(head.encode("ascii") + body)
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        if "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.read()
+            headers["connection"] = "close"
+
+        if headers.get("connection") == "close" or version == b"HTTP/1.0":
+            self.close()
+        return int(status)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def tree_usage(pid: int):
+    """
+    (RSS MB, PSS MB, CPU seconds) summed over a process and its descendants.
+
+    RSS counts pages shared between forked workers once per worker; PSS
+    splits them between the sharers, so it is the tree's real footprint.
+    """
+    rss_kb = 0
+    pss_kb = 0
+    ticks = 0
+    for current in _process_tree(pid):
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss_kb += int(line.split()[1])
+                        break
+            with open(f"/proc/{current}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+                # utime + stime, plus cutime + cstime of exited children (recycled workers)
+                ticks += sum(int(value) for value in fields[11:15])
+            with open(f"/proc/{current}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        pss_kb += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+    return rss_kb / 1024, pss_kb / 1024, ticks / os.sysconf("SC_CLK_TCK")
+
+
+class RssSampler:
+    """Background task recording the server tree's RSS and PSS every ``interval`` seconds"""
+
+    def __init__(self, pid: Optional[int], interval: float):
+        self.pid = pid
+        self.interval = interval
+        self.timeline: List[List[float]] = []
+        self.started = time.perf_counter()
+        self._task = None
+
+    def start(self):
+        if self.pid is not None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            rss, pss, _ = tree_usage(self.pid)
+            self.timeline.append([round(time.perf_counter() - self.started, 1), round(rss, 1), round(pss, 1)])
+            await asyncio.sleep(self.interval)
+
+    def window(self, since: float) -> List[List[float]]:
+        """[rss, pss] samples taken since ``since``"""
+        return [sample[1:] for sample in self.timeline if sample[0] >= since]
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def _latency_summary(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    values = np.percentile(np.array(latencies) * 1000, PERCENTILES)
+    summary = {f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, values)}
+    summary["max"] = round(max(latencies) * 1000, 1)
+    return summary
+
+
+async def run_stage(host, port, mix: PayloadMix, concurrency: int, seconds: float, timeout: float,
+                    seed: int, sampler: RssSampler, server_pid: Optional[int]) -> Dict:
+    """Run ``concurrency`` closed-loop clients for ``seconds`` and summarize the stage"""
+    loop = asyncio.get_running_loop()
+    records = []  # (payload name, outcome, latency seconds)
+
+    async def client(index: int, deadline: float):
+        rng = random.Random(seed * 100003 + index)
+        connection = Connection(host, port)
+        while loop.time() < deadline:
+            name, path, body = mix.pick(rng)
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(connection.request("POST", path, body), timeout)
+                outcome = "ok" if 200 <= status < 300 else str(status)
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                connection.close()
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                outcome = "connection"
+                connection.close()
+                await asyncio.sleep(0.01)
+            records.append((name, outcome, time.perf_counter() - started))
+        connection.close()
+
+    stage_started = sampler.elapsed()
+    cpu_started = time.process_time()
+    server_cpu_started = tree_usage(server_pid)[2] if server_pid else None
+    wall_started = time.perf_counter()
+    deadline = loop.time() + seconds
+    await asyncio.gather(*(client(i, deadline) for i in range(concurrency)))
+    wall = time.perf_counter() - wall_started
+
+    ok = [latency for _, outcome, latency in records if outcome == "ok"]
+    errors: Dict[str, int] = {}
+    for _, outcome, _ in records:
+        if outcome != "ok":
+            errors[outcome] = errors.get(outcome, 0) + 1
+
+    by_payload = {}
+    for name in mix.names:
+        latencies = [latency for payload, outcome, latency in records if payload == name and outcome == "ok"]
+        total = sum(1 for payload, _, _ in records if payload == name)
+        by_payload[name] = {
+            "requests": total,
+            "errors": total - len(latencies),
+            "latency_ms": _latency_summary(latencies),
+        }
+
+    memory = sampler.window(stage_started)
+    result = {
+        "concurrency": concurrency,
+        "duration_s": round(wall, 1),
+        "requests": len(records),
+        "throughput_rps": round(len(ok) / wall, 1),
+        "error_rate": round((len(records) - len(ok)) / len(records), 4) if records else 0.0,
+        "errors": dict(sorted(errors.items())),
+        "latency_ms": _latency_summary(ok),
+        "by_payload": by_payload,
+        "client_cpu_s": round(time.process_time() - cpu_started, 1),
+    }
+    if server_pid:
+        result["server_cpu_s"] = round(tree_usage(server_pid)[2] - server_cpu_started, 1)
+        for column, key in ((0, "server_rss_mb"), (1, "server_pss_mb")):
+            values = [sample[column] for sample in memory]
+            result[key] = {
+                "start": values[0] if values else None,
+                "end": values[-1] if values else None,
+                "peak": max(values) if values else None,
+            }
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(service: str, python: str, command: Optional[str], port: int, env_overrides: Dict[str, str],
+                 log_path: str) -> subprocess.Popen:
+    """Start the service in its directory; ``command`` may use {python} and {port}"""
+    if command:
+        args = shlex.split(command.format(python=python, port=port))
+    else:
+        args = [python, "app.py"]  # Same entry point as the Dockerfiles
+    env = dict(os.environ, PORT=str(port), **env_overrides)
+    log = open(log_path, "w")
+    # Own process group, so forked workers are stopped with the server
+    return subprocess.Popen(args, cwd=SERVICE_DIRS[service], env=env, stdout=log, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+
+
+def stop_server(process: subprocess.Popen):
+    if process.poll() is not None:
+        return
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+async def wait_ready(host: str, port: int, timeout: float, process: Optional[subprocess.Popen]):
+    """Poll GET /health until it returns 200"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before becoming ready")
+        connection = Connection(host, port)
+        try:
+            if await asyncio.wait_for(connection.request("GET", "/health"), 5) == 200:
+                return
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            pass
+        finally:
+            connection.close()
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {timeout:.0f}s")
+
+
+async def run(args, mix: PayloadMix, host: str, port: int, server_pid: Optional[int]) -> Dict:
+    sampler = RssSampler(server_pid, args.rss_interval)
+    sampler.start()
+    try:
+        if args.warmup_seconds > 0:
+            await run_stage(host, port, mix, min(args.concurrency), args.warmup_seconds, args.timeout,
+                            args.seed, sampler, server_pid)
+        stages = []
+        for concurrency in args.concurrency:
+            result = await run_stage(host, port, mix, concurrency, args.stage_seconds, args.timeout,
+                                     args.seed, sampler, server_pid)
+            stages.append(result)
+            print_stage(result)
+    finally:
+        await sampler.stop()
+    return {"stages": stages, "memory_timeline_mb": sampler.timeline}
+
+
+def print_stage(result: Dict):
+    latency = result["latency_ms"]
+    rss = result.get("server_rss_mb", {})
+    pss = result.get("server_pss_mb", {})
+    print(
+        f"{result['concurrency']:>6}{result['requests']:>9}{result['throughput_rps']:>10.1f}"
+        f"{latency.get('p50', float('nan')):>10.1f}{latency.get('p95', float('nan')):>10.1f}"
+        f"{latency.get('p99', float('nan')):>10.1f}{result['error_rate'] * 100:>8.2f}%"
+        f"{rss.get('peak') or float('nan'):>10.1f}{pss.get('peak') or float('nan'):>10.1f}"
+        f"{result['client_cpu_s']:>8.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP load test for the PurrPal services")
+    parser.add_argument("--service", choices=sorted(SERVICE_DIRS), required=True)
+    parser.add_argument("--concurrency", default="50,100,200,500",
+                        help="Comma-separated client counts, one stage each")
+    parser.add_argument("--stage-seconds", type=float, default=20.0, help="Duration of each stage")
+    parser.add_argument("--warmup-seconds", type=float, default=3.0, help="Unreported warmup at the lowest concurrency")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--mix", default=None, help="JSON file with the payload mix")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--url", default=None, help="Target an already running service instead of starting one")
+    parser.add_argument("--server-pid", type=int, default=None, help="Pid to sample RSS from with --url")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter that runs the service")
+    parser.add_argument("--server-cmd", default=None,
+                        help="Command starting the service, with {python} and {port} placeholders "
+                             "(default: {python} app.py)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the started service (repeatable)")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--rss-interval", type=float, default=0.5, help="Seconds between RSS samples")
+    parser.add_argument("--server-log", default=None, help="Where the started service's output goes")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    args.concurrency = [int(value) for value in args.concurrency.split(",")]
+
+    entries = json.loads(Path(args.mix).read_text()) if args.mix else DEFAULT_MIXES[args.service]
+    mix = PayloadMix(entries, args.seed)
+
+    process = None
+    server_pid = args.server_pid
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        env_overrides = dict(item.split("=", 1) for item in args.env)
+        log_path = args.server_log or tempfile.mkstemp(prefix=f"purrpal-{args.service}-", suffix=".log")[1]
+        process = start_server(args.service, args.python, args.server_cmd, port, env_overrides, log_path)
+        server_pid = process.pid
+        print(f"🚀 Started {args.service} service (log: {log_path})")
+
+    try:
+        loop_started = time.perf_counter()
+        asyncio.run(wait_ready(host, port, args.startup_timeout, process))
+        print(f"✅ Ready after {time.perf_counter() - loop_started:.1f}s")
+        print(f"{'conc':>6}{'requests':>9}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'errors':>9}{'rss MB':>10}{'pss MB':>10}{'cli s':>8}")
+        results = asyncio.run(run(args, mix, host, port, server_pid))
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    report = {
+        "config": {
+            "service": args.service,
+            "concurrency": args.concurrency,
+            "stage_seconds": args.stage_seconds,
+            "seed": args.seed,
+            "server_cmd": args.server_cmd or ("external" if args.url else "{python} app.py"),
+            "env": sorted(args.env),
+            "mix": mix.describe(),
+        },
+        **results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"💾 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""
+Modules shared by the PurrPal ML services (tabular-services and vision-service).
+
+    structured_logging  Queued, sampled JSON logging with per-request stage timings
+    service_metrics     Dependency-free Prometheus metrics and the /metrics exposition
+    worker_sizing       Gunicorn workers and native thread pools sized from the CPU quota
+    model_registry      Versioned models, loaded lazily and evicted under a memory budget
+
+Install it next to a service with ``pip install -e common`` (the Dockerfiles
+install it into the image). Submodules are imported explicitly: gunicorn.conf.py
+imports worker_sizing before numpy or TensorFlow are loaded.
+"""
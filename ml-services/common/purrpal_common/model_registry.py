@@ -0,0 +1,444 @@
+"""
+Versioned models loaded on demand and kept within a memory budget.
+
+The registry maps version names to specs (dicts with at least "path",
+passed to the service's loader) and loads each version the first time it
+is asked for. Requests pick a version with the X-Model-Version header or
+the ?model= query parameter; without one they get the default version.
+
+Configuration (environment variables, first match wins):
+    MODEL_REGISTRY          JSON file {"default": "v2", "versions": {"v1": {"path": ...}, "v2": "path"}}
+    MODEL_VERSIONS          "v1=path,v2=path", default MODEL_DEFAULT_VERSION (or the first)
+    (neither)               the service's own model as the single version "default"
+    MODEL_MEMORY_BUDGET_MB  Resident size allowed for loaded versions (default: unlimited)
+    MODEL_REGISTRY_WATCH_SECONDS  Poll MODEL_REGISTRY for changes this often and reload (default: off)
+
+Loaded versions are kept in least-recently-used order. When their resident
+sizes add up to more than the budget, the coldest versions other than the
+default are dropped; requests still running on a dropped model finish with
+it, and the next request for it loads it again. A version is loaded once
+however many requests ask for it at the same time, and loading one version
+does not hold up requests to the others.
+
+``swap`` (and ``reload``, which also re-reads MODEL_REGISTRY) loads the new
+model completely before replacing the old one in a single assignment, so
+every request runs on either the old or the new model and none fails
+during the swap. ``watch`` reloads whenever the registry file changes,
+which is how every worker process picks up an edit.
+
+Load time and resident size per version (``size_of``, or the RSS growth
+during the load) are reported by ``stats()`` and exported as metrics. Each
+process keeps its own registry, so the budget applies per worker.
+"""
+
+import gc
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from .service_metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERSION = "default"
+
+# Where requests name the version they want
+MODEL_HEADER = "X-Model-Version"
+MODEL_QUERY_PARAM = "model"
+
+MODEL_RESIDENT_BYTES = Gauge(
+    "purrpal_model_resident_bytes", "Resident size of each loaded model version (0 when unloaded)", ["version"]
+)
+MODEL_VERSION_LOAD_SECONDS = Gauge(
+    "purrpal_model_version_load_seconds", "Duration of the latest load of each model version", ["version"]
+)
+MODEL_EVENTS = Counter(
+    "purrpal_model_events_total", "Model version loads, swaps and evictions", ["version", "event"]
+)
+
+
+class UnknownModelVersion(LookupError):
+    """Requested model version is not in the registry"""
+
+
+def resident_bytes() -> Optional[int]:
+    """Resident set size of this process, or None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def parse_versions(text: str) -> Dict[str, Dict[str, Any]]:
+    """Specs of a "name=path,name=path" list"""
+    versions = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, separator, path = item.partition("=")
+        if not separator or not name.strip() or not path.strip():
+            raise ValueError(f"Model versions are name=path pairs, got '{item}'")
+        versions[name.strip()] = {"path": path.strip()}
+    if not versions:
+        raise ValueError("No model versions given")
+    return versions
+
+
+def read_registry_file(path: str) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+    """(default version, specs) of a registry file; a spec may be just its path"""
+    try:
+        with open(path) as f:
+            content = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read model registry {path}: {e}")
+
+    versions = content.get("versions") if isinstance(content, dict) else None
+    if not isinstance(versions, dict) or not versions:
+        raise ValueError(f"Model registry {path} has no versions")
+    specs = {}
+    for name, spec in versions.items():
+        spec = {"path": spec} if isinstance(spec, str) else spec
+        if not isinstance(spec, dict):
+            raise ValueError(f"Model version '{name}' must be a path or an object")
+        specs[str(name)] = dict(spec)
+    return str(content.get("default") or next(iter(specs))), specs
+
+
+class _Version:
+    """Registry entry: spec, loaded model (or None) and load statistics"""
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        self.name = name
+        self.spec = spec
+        self.model = None
+        self.load_lock = threading.Lock()  # One load at a time per version
+        self.load_seconds: Optional[float] = None
+        self.size_bytes: Optional[int] = None
+        self.rss_delta_bytes: Optional[int] = None
+        self.loaded_at: Optional[float] = None
+        self.last_used: Optional[float] = None
+        self.loads = 0
+        self.swaps = 0
+        self.evictions = 0
+
+
+class ModelRegistry:
+    """Lazily loaded model versions with LRU eviction under a memory budget"""
+
+    def __init__(self, loader: Callable[[str, Dict[str, Any]], Any], versions: Dict[str, Dict[str, Any]],
+                 default: str, memory_budget_bytes: Optional[int] = None,
+                 size_of: Optional[Callable[[Any], int]] = None, source: Optional[str] = None,
+                 watch_seconds: float = 0.0):
+        """
+        Args:
+            loader: Creates the model of a version from (name, spec)
+            versions: Spec per version name
+            default: Version served when a request names none (never evicted)
+            memory_budget_bytes: Resident size allowed for loaded versions (None = unlimited)
+            size_of: Resident size of a loaded model; defaults to the RSS growth during its load
+            source: Registry file the versions came from, re-read by reload()
+            watch_seconds: Interval at which watch() polls the registry file (0 = off)
+        """
+        if default not in versions:
+            raise ValueError(f"Default model version '{default}' is not one of {sorted(versions)}")
+        self.loader = loader
+        self.size_of = size_of
+        self.memory_budget_bytes = memory_budget_bytes
+        self.source = source
+        self.watch_seconds = watch_seconds
+        self.default = default
+
+        self._lock = threading.Lock()
+        self._versions: Dict[str, _Version] = {name: _Version(name, dict(spec)) for name, spec in versions.items()}
+        self._lru: "OrderedDict[str, None]" = OrderedDict()  # Loaded versions, coldest first
+
+    @classmethod
+    def from_env(cls, loader: Callable[[str, Dict[str, Any]], Any], default_spec: Optional[Dict[str, Any]] = None,
+                 size_of: Optional[Callable[[Any], int]] = None) -> "ModelRegistry":
+        """
+        Create a registry configured by the MODEL_* environment variables
+
+        Args:
+            loader: Creates the model of a version from (name, spec)
+            default_spec: Spec of the single "default" version when no versions are configured
+            size_of: Resident size of a loaded model
+        """
+        budget = os.environ.get("MODEL_MEMORY_BUDGET_MB")
+        budget_bytes = int(float(budget) * 2 ** 20) if budget else None
+        source = os.environ.get("MODEL_REGISTRY") or None
+
+        if source:
+            default, versions = read_registry_file(source)
+        elif os.environ.get("MODEL_VERSIONS"):
+            versions = parse_versions(os.environ["MODEL_VERSIONS"])
+            default = os.environ.get("MODEL_DEFAULT_VERSION") or next(iter(versions))
+        else:
+            default, versions = DEFAULT_VERSION, {DEFAULT_VERSION: dict(default_spec or {})}
+        watch_seconds = float(os.environ.get("MODEL_REGISTRY_WATCH_SECONDS", 0))
+        return cls(loader, versions, default, budget_bytes, size_of, source, watch_seconds)
+
+    @property
+    def versions(self) -> List[str]:
+        return list(self._versions)
+
+    def resolve(self, name: Optional[str]) -> str:
+        """
+        Version name for a request (the default when ``name`` is empty)
+
+        Raises:
+            UnknownModelVersion: When the version is not in the registry
+        """
+        if not name:
+            return self.default
+        if name not in self._versions:
+            raise UnknownModelVersion(f"Unknown model version '{name}', available: {sorted(self._versions)}")
+        return name
+
+    def get(self, name: Optional[str] = None, load: bool = True) -> Any:
+        """
+        Model of a version, loading it on first use
+
+        Args:
+            name: Version name (the default when None)
+            load: When False, return None instead of loading a version that is not loaded
+
+        Raises:
+            UnknownModelVersion: When the version is not in the registry
+        """
+        with self._lock:
+            version = self._versions[self.resolve(name)]
+            if version.model is not None:
+                version.last_used = time.time()
+                self._lru.move_to_end(version.name)
+                return version.model
+        return self._load(version) if load else None
+
+    def _load(self, version: _Version) -> Any:
+        with version.load_lock:
+            if version.model is not None:  # Loaded by a concurrent request meanwhile
+                version.last_used = time.time()
+                return version.model
+            model, seconds, size, rss_delta = self._build(version.name, version.spec)
+            with self._lock:
+                self._install(version, model, seconds, size, rss_delta)
+                version.loads += 1
+                evicted = self._enforce_budget(keep=version.name)
+        MODEL_EVENTS.labels(version.name, "load").inc()
+        logger.info("Model version %s loaded in %.2fs (%s)", version.name, seconds, _megabytes(size))
+        self._after_eviction(evicted)
+        return model
+
+    def _build(self, name: str, spec: Dict[str, Any]) -> Tuple[Any, float, Optional[int], Optional[int]]:
+        """Load a model outside the registry lock; returns (model, seconds, size, RSS growth)"""
+        rss_before = resident_bytes()
+        started = time.perf_counter()
+        model = self.loader(name, spec)
+        seconds = time.perf_counter() - started
+        rss_after = resident_bytes()
+        rss_delta = max(0, rss_after - rss_before) if rss_before is not None and rss_after is not None else None
+        size = int(self.size_of(model)) if self.size_of is not None else rss_delta
+        return model, seconds, size, rss_delta
+
+    def _install(self, version: _Version, model: Any, seconds: float, size: Optional[int],
+                 rss_delta: Optional[int]):
+        """Make ``model`` the version's model (registry lock held)"""
+        version.model = model
+        version.load_seconds = round(seconds, 4)
+        version.size_bytes = size
+        version.rss_delta_bytes = rss_delta
+        version.loaded_at = version.last_used = time.time()
+        self._lru[version.name] = None
+        self._lru.move_to_end(version.name)
+        MODEL_RESIDENT_BYTES.labels(version.name).set(size or 0)
+        MODEL_VERSION_LOAD_SECONDS.labels(version.name).set(seconds)
+
+    def resident_size(self) -> int:
+        """Summed resident size of the loaded versions"""
+        return sum(self._versions[name].size_bytes or 0 for name in self._lru)
+
+    def _enforce_budget(self, keep: str) -> List[str]:
+        """Evict the coldest versions until the budget holds (registry lock held)"""
+        if self.memory_budget_bytes is None:
+            return []
+        evicted = []
+        for name in list(self._lru):
+            if self.resident_size() <= self.memory_budget_bytes:
+                break
+            if name not in (keep, self.default):
+                self._unload(name)
+                evicted.append(name)
+        if self.resident_size() > self.memory_budget_bytes:
+            logger.warning("Loaded models use %s, over the %s budget", _megabytes(self.resident_size()),
+                           _megabytes(self.memory_budget_bytes))
+        return evicted
+
+    def _unload(self, name: str):
+        """Drop a version's model (registry lock held); running calls keep their reference"""
+        version = self._versions[name]
+        version.model = None
+        version.evictions += 1
+        self._lru.pop(name, None)
+        MODEL_RESIDENT_BYTES.labels(name).set(0)
+        MODEL_EVENTS.labels(name, "eviction").inc()
+
+    @staticmethod
+    def _after_eviction(evicted: List[str]):
+        if evicted:
+            logger.info("Evicted cold model versions: %s", ", ".join(evicted))
+            gc.collect()  # Model graphs are often cyclic; free them now rather than at the next GC run
+
+    def evict(self, name: str) -> bool:
+        """Unload a version now; False if it was not loaded"""
+        with self._lock:
+            name = self.resolve(name)
+            loaded = name in self._lru
+            if loaded:
+                self._unload(name)
+        self._after_eviction([name] if loaded else [])
+        return loaded
+
+    def swap(self, name: str, spec: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Load a version (new, or from a new spec or changed files) and put it in service
+
+        The old model keeps serving until the new one is completely loaded; a
+        failed load leaves the registry unchanged.
+
+        Returns:
+            The version's stats
+        """
+        with self._lock:
+            version = self._versions.get(name)
+            if version is None:
+                if spec is None:
+                    raise UnknownModelVersion(f"Unknown model version '{name}', available: {sorted(self._versions)}")
+                version = _Version(name, dict(spec))
+        spec = dict(spec if spec is not None else version.spec)
+
+        with version.load_lock:
+            model, seconds, size, rss_delta = self._build(name, spec)
+            with self._lock:
+                self._versions.setdefault(name, version)
+                version.spec = spec
+                self._install(version, model, seconds, size, rss_delta)
+                version.swaps += 1
+                evicted = self._enforce_budget(keep=name)
+        MODEL_EVENTS.labels(name, "swap").inc()
+        logger.info("Model version %s swapped in after %.2fs (%s)", name, seconds, _megabytes(size))
+        self._after_eviction(evicted)
+        return self.stats()["versions"][name]
+
+    def reload(self, name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Pick up model changes without a restart
+
+        Re-reads the registry file (if the versions came from one): added
+        versions become available, removed ones are dropped, and loaded
+        versions whose spec changed are swapped. A named version is swapped
+        in any case, e.g. after its files were replaced in place.
+
+        Returns:
+            Summary with the default version and the added, removed and swapped versions
+        """
+        added, removed, swapped = [], [], []
+        if self.source:
+            default, specs = read_registry_file(self.source)
+            if default not in specs:
+                raise ValueError(f"Default model version '{default}' is not one of {sorted(specs)}")
+            with self._lock:
+                changed = [version for version, spec in specs.items()
+                           if version in self._versions and self._versions[version].spec != spec]
+                added = [version for version in specs if version not in self._versions]
+                removed = [version for version in self._versions if version not in specs]
+                for version in added:
+                    self._versions[version] = _Version(version, specs[version])
+                for version in changed:
+                    if version not in self._lru:
+                        self._versions[version].spec = specs[version]  # Loaded lazily with the new spec
+            for version in changed:
+                if self.get(version, load=False) is not None:
+                    self.swap(version, specs[version])
+                    swapped.append(version)
+            if self.get(default, load=False) is None:
+                self.get(default)  # Ready before it takes the default traffic
+            with self._lock:
+                self.default = default
+                for version in removed:
+                    if version in self._lru:
+                        self._unload(version)
+                    del self._versions[version]
+
+        if name is not None and name not in swapped:
+            self.swap(self.resolve(name))
+            swapped.append(name)
+        return {"default": self.default, "added": added, "removed": removed, "swapped": swapped}
+
+    def watch(self) -> Optional[threading.Thread]:
+        """
+        Reload in a background thread whenever the registry file changes
+
+        Call it in each worker process (threads do not survive a fork).
+        Returns the thread, or None without a registry file or interval.
+        """
+        if not self.source or self.watch_seconds <= 0:
+            return None
+
+        def poll():
+            stamp = _file_stamp(self.source)
+            while True:
+                time.sleep(self.watch_seconds)
+                current = _file_stamp(self.source)
+                if current == stamp:
+                    continue
+                stamp = current
+                try:
+                    logger.info("Model registry %s changed: %s", self.source, self.reload())
+                except Exception as e:
+                    logger.error("Model registry reload failed, keeping the current models: %s", e)
+
+        thread = threading.Thread(target=poll, name="model-registry-watch", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        """Versions with their load time, resident size and usage, for the /models endpoint"""
+        with self._lock:
+            versions = {
+                version.name: {
+                    "loaded": version.model is not None,
+                    "path": version.spec.get("path"),
+                    "load_seconds": version.load_seconds,
+                    "size_bytes": version.size_bytes,
+                    "rss_delta_bytes": version.rss_delta_bytes,
+                    "loaded_at": version.loaded_at,
+                    "last_used": version.last_used,
+                    "loads": version.loads,
+                    "swaps": version.swaps,
+                    "evictions": version.evictions,
+                }
+                for version in self._versions.values()
+            }
+            return {
+                "default": self.default,
+                "source": self.source,
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "resident_bytes": self.resident_size(),
+                "loaded": list(reversed(self._lru)),  # Hottest first
+                "versions": versions,
+            }
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime, size) of a file, None when it is missing"""
+    try:
+        status = os.stat(path)
+    except OSError:
+        return None
+    return status.st_mtime_ns, status.st_size
+
+
+def _megabytes(size: Optional[int]) -> str:
+    return "size unknown" if size is None else f"{size / 2 ** 20:.1f} MB"
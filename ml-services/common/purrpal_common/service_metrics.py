@@ -0,0 +1,262 @@
+"""
+Minimal Prometheus-compatible metrics shared by the PurrPal ML services.
+
+Counters, gauges and fixed-bucket histograms kept in process memory and
+rendered in the Prometheus text exposition format (version 0.0.4) by
+``REGISTRY.exposition()``. All metrics share one lock, and
+``observe_request`` records a whole request (counter, latency and every
+stage) under a single acquisition, so instrumentation stays a few
+microseconds per request. There is no external dependency.
+
+Set METRICS_ENABLED=0 to turn recording and the /metrics endpoint off.
+"""
+
+import bisect
+import math
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Guards every metric value; updates are a few increments, so contention is negligible
+_LOCK = threading.Lock()
+
+# Latency buckets in seconds, from 50 us (cached tabular stages) to 10 s (cold vision batches)
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return f"{int(value)}.0"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        """
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Label names; values are bound with labels()
+            registry: Registry to add the metric to (default REGISTRY, False for none)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        if registry is not False:
+            (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self) -> "_Metric":
+        raise NotImplementedError
+
+    def labels(self, *values) -> "_Metric":
+        """Child metric for one combination of label values (cached)"""
+        child = self._children.get(values)
+        if child is None:
+            key = tuple(str(value) for value in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with _LOCK:
+                child = self._children.setdefault(key, self._new_child())
+                # Also cache under the raw values so the hot path skips the conversion
+                self._children.setdefault(values, child)
+        return child
+
+    def _samples(self, labelnames: Tuple[str, ...], label_values: Tuple[str, ...]) -> List[str]:
+        raise NotImplementedError
+
+    def exposition(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        if self.labelnames:
+            series = {id(child): (label_values, child) for label_values, child in self._children.items()
+                      if all(isinstance(value, str) for value in label_values)}
+            for label_values, child in sorted(series.values(), key=lambda item: item[0]):
+                lines.extend(child._samples(self.labelnames, label_values))
+        else:
+            lines.extend(self._samples((), ()))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.value = 0.0
+
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.documentation, registry=False)
+
+    def inc(self, amount: float = 1.0):
+        if METRICS_ENABLED:
+            with _LOCK:
+                self.value += amount
+
+    def _samples(self, labelnames, label_values):
+        return [f"{self.name}{_label_text(labelnames, label_values)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_child(self) -> "Gauge":
+        return Gauge(self.name, self.documentation, registry=False)
+
+    def set(self, value: float):
+        self.value = float(value)
+
+    def inc(self, amount: float = 1.0):
+        with _LOCK:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with _LOCK:
+            self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from ``function`` on every scrape"""
+        self._function = function
+
+    def _samples(self, labelnames, label_values):
+        value = self.value
+        if self._function is not None:
+            try:
+                value = float(self._function())
+            except Exception:
+                value = math.nan
+        return [f"{self.name}{_label_text(labelnames, label_values)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram (bucket counts are stored per bucket, made cumulative on export)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets, registry=False)
+
+    def observe(self, value: float):
+        if METRICS_ENABLED:
+            with _LOCK:
+                self._record(value)
+
+    def _record(self, value: float):
+        # Caller holds _LOCK
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def _samples(self, labelnames, label_values):
+        with _LOCK:
+            counts, total = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            labels = _label_text(labelnames, label_values, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+        labels = _label_text(labelnames, label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def exposition(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.exposition())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Metrics common to both services
+REQUESTS = Counter(
+    "purrpal_http_requests_total", "HTTP requests by route, method and status class",
+    ["route", "method", "status"]
+)
+REQUEST_SECONDS = Histogram(
+    "purrpal_http_request_duration_seconds", "End-to-end HTTP request latency", ["route"]
+)
+STAGE_SECONDS = Histogram(
+    "purrpal_stage_duration_seconds", "Latency of each request processing stage", ["stage"]
+)
+IN_FLIGHT = Gauge("purrpal_http_requests_in_flight", "HTTP requests currently being handled")
+PREDICTIONS = Counter("purrpal_predictions_total", "Predictions by predicted class", ["disease"])
+MODEL_LOAD_SECONDS = Gauge("purrpal_model_load_seconds", "Time taken to load the model at startup")
+
+
+_STATUS_CLASSES = {1: "1xx", 2: "2xx", 3: "3xx", 4: "4xx", 5: "5xx"}
+
+
+def observe_request(route: str, method: str, status: int, seconds: float, stages: Dict[str, float]):
+    """
+    Record one finished request.
+
+    Args:
+        route: Route template (keep cardinality bounded, e.g. "other" for 404s)
+        method: HTTP method
+        status: Response status code (exported by class, e.g. "2xx")
+        seconds: End-to-end duration
+        stages: Stage durations in milliseconds (RequestContext.stages)
+    """
+    if not METRICS_ENABLED:
+        return
+    # Resolve label children first: labels() may take the lock to create one
+    counter = REQUESTS.labels(route, method, _STATUS_CLASSES.get(status // 100, "other"))
+    latency = REQUEST_SECONDS.labels(route)
+    stage_latencies = [(STAGE_SECONDS.labels(name), milliseconds / 1000.0)
+                       for name, milliseconds in stages.items()]
+    with _LOCK:
+        counter.value += 1
+        latency._record(seconds)
+        for histogram, value in stage_latencies:
+            histogram._record(value)
@@ -0,0 +1,267 @@
+"""
+Non-blocking structured logging shared by the PurrPal ML services.
+
+Request threads only put records on a queue; a background listener formats
+them (JSON by default) and writes them out. When LOG_QUEUE_SIZE records are
+waiting, new ones are dropped and counted instead of blocking the request.
+
+Every request runs inside a RequestContext carrying its id, its per-stage
+durations and a sampling decision. INFO and DEBUG records emitted while a
+request is not sampled are discarded before they are queued; warnings and
+errors are always kept.
+
+Configuration (environment variables):
+    LOG_LEVEL        Root log level (default INFO)
+    LOG_FORMAT       json | text (default json)
+    LOG_SAMPLE_RATE  Fraction of requests whose info logs are kept (default 1.0)
+    LOG_QUEUE_SIZE   Records buffered before dropping (default 10000)
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import traceback
+from typing import Any, Dict, Optional
+
+# Attributes of a plain LogRecord; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_current_request: contextvars.ContextVar[Optional["RequestContext"]] = contextvars.ContextVar(
+    "purrpal_request", default=None
+)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+_sample_rate = float(os.environ.get("LOG_SAMPLE_RATE", 1.0))
+
+
+class RequestContext:
+    """Id, sampling decision and stage timings of one request"""
+
+    __slots__ = ("request_id", "sampled", "stages", "started")
+
+    def __init__(self, request_id: Optional[str] = None, sampled: bool = True):
+        # Random 64-bit id: unique enough for log correlation, far cheaper than uuid4
+        self.request_id = request_id or f"{random.getrandbits(64):016x}"
+        self.sampled = sampled
+        self.stages: Dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 3)
+
+    def add_stage(self, name: str, seconds: float):
+        """Add a duration to a stage (repeated stages accumulate)"""
+        self.stages[name] = round(self.stages.get(name, 0.0) + seconds * 1000, 3)
+
+
+def begin_request(request_id: Optional[str] = None, rate: Optional[float] = None):
+    """
+    Start a request context in the current (async or thread) context.
+
+    Returns:
+        Tuple of (RequestContext, token for end_request)
+    """
+    rate = _sample_rate if rate is None else rate
+    context = RequestContext(request_id, sampled=rate >= 1.0 or random.random() < rate)
+    return context, _current_request.set(context)
+
+
+def end_request(token):
+    _current_request.reset(token)
+
+
+def current_request() -> Optional[RequestContext]:
+    return _current_request.get()
+
+
+def sampled() -> bool:
+    """
+    Whether per-request info logs of the current request are kept.
+
+    Hot paths check this before logging so unsampled requests do not even
+    create a LogRecord. Always True outside a request.
+    """
+    context = _current_request.get()
+    return context is None or context.sampled
+
+
+class stage:
+    """Context manager timing a block as a stage of the current request (no-op outside requests)"""
+
+    __slots__ = ("name", "context", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.context = _current_request.get()
+
+    def __enter__(self):
+        if self.context is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.context is not None:
+            self.context.add_stage(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class RequestSampler(logging.Filter):
+    """Drops INFO/DEBUG records of unsampled requests and tags records with the request id"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _current_request.get()
+        if context is None:
+            return True
+        if record.levelno < logging.WARNING and not context.sampled:
+            return False
+        record.request_id = context.request_id
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks and defers formatting to the listener.
+
+    The stock handler formats the message in the calling thread; here only
+    exception tracebacks are rendered eagerly (the frames would not survive),
+    and everything else is interpolated by the background writer.
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        # SimpleQueue puts are lock-free; the size check makes the bound approximate
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+        else:
+            self.queue.put_nowait(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the request id and any ``extra`` fields"""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+        self._second = None
+        self._second_text = ""
+
+    def format(self, record: logging.LogRecord) -> str:
+        # Records arrive in bursts from the same second; render that part once
+        second = int(record.created)
+        if second != self._second:
+            self._second = second
+            self._second_text = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+
+        entry = {
+            "ts": f"{self._second_text}.{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        attributes = record.__dict__
+        for key in sorted(attributes.keys() - _RECORD_ATTRIBUTES):
+            entry[key] = attributes[key]
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Classic single-line format with the request id appended when present"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{line} [request_id={request_id}]" if request_id else line
+
+
+def setup_logging(service: str, stream=None) -> NonBlockingQueueHandler:
+    """
+    Route all logging through the background queue writer.
+
+    Replaces the root logger's handlers, so it is safe to call after modules
+    have run logging.basicConfig. Calling it again restarts the writer.
+
+    Args:
+        service: Service name included in every JSON record
+        stream: Output stream (defaults to stdout)
+
+    Returns:
+        The queue handler (its ``dropped`` counter reports overflow)
+    """
+    global _listener, _queue_handler, _sample_rate
+
+    shutdown_logging()
+    _sample_rate = float(os.environ.get("LOG_SAMPLE_RATE", 1.0))
+
+    # Skip record attributes neither formatter uses (caller frame lookup is the costly one);
+    # the process id stays, gunicorn's own log format needs it
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logMultiprocessing = False
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if os.environ.get("LOG_FORMAT", "json") == "json":
+        output.setFormatter(JsonFormatter(service))
+    else:
+        output.setFormatter(TextFormatter())
+
+    _queue_handler = NonBlockingQueueHandler(
+        queue.SimpleQueue(), max_size=int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+    )
+    _queue_handler.addFilter(RequestSampler())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    return _queue_handler
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Queue depth and dropped-record count for health endpoints"""
+    if _queue_handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "sample_rate": _sample_rate,
+    }
+
+
+atexit.register(shutdown_logging)
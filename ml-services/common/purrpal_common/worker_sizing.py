@@ -0,0 +1,84 @@
+"""
+CPU-quota based sizing of server workers and native thread pools.
+
+Used by gunicorn.conf.py to pick the number of forked workers and the
+BLAS/OpenMP/TensorFlow threads each one may use, so workers x threads
+matches the CPUs the container may actually use instead of the host's.
+
+Configuration (environment variables):
+    WEB_CONCURRENCY  Worker processes (default: one per available CPU)
+    WORKER_THREADS   Native threads per worker (default: CPUs / workers, min 1)
+"""
+
+import math
+import os
+from typing import Tuple
+
+# Thread pools sized from the environment when a library initializes
+NATIVE_THREAD_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS",
+)
+
+
+def available_cpus() -> int:
+    """
+    CPUs this container may actually use.
+
+    Takes the smaller of the scheduler affinity mask and the cgroup CPU quota
+    (v2 ``cpu.max`` or v1 ``cpu.cfs_quota_us``), rounded up, minimum 1.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def worker_plan() -> Tuple[int, int]:
+    """
+    Worker processes and native threads per worker.
+
+    Returns:
+        Tuple of (workers, threads per worker)
+    """
+    cpus = available_cpus()
+    workers = int(os.environ.get("WEB_CONCURRENCY") or cpus)
+    threads = int(os.environ.get("WORKER_THREADS") or max(1, cpus // max(1, workers)))
+    return max(1, workers), max(1, threads)
+
+
+def limit_native_threads(threads: int):
+    """
+    Cap BLAS, OpenMP and TensorFlow intra-op pools at ``threads``.
+
+    Must run before numpy or tensorflow are imported; variables that are
+    already set are left alone. Inter-op parallelism is kept at 1 or 2,
+    since requests already run concurrently across workers.
+    """
+    for name in NATIVE_THREAD_VARIABLES:
+        os.environ.setdefault(name, str(threads))
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", str(min(2, threads)))
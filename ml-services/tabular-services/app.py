@@ -1,14 +1,81 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, Any, List, Optional, Tuple, Union
+import asyncio
+import functools
 import logging
 import os
-from model_handler import PurrPalTabularModel
+import time
+import numpy as np
+import orjson
+from model_handler import PurrPalTabularModel, create_model_registry
+from purrpal_common.model_registry import ModelRegistry, UnknownModelVersion, MODEL_HEADER, MODEL_QUERY_PARAM
+from inference_executor import InferenceExecutor, ExecutorOverloaded
+from micro_batcher import MicroBatcher
+from diagnosis_catalog import DiagnosisCatalog, SYMPTOM_LABELS
+import feature_codecs
+from feature_codecs import NotAcceptable, UnsupportedMediaType
+from bulk_stream import CSV, CsvDecoder, NdjsonDecoder, UploadError, UploadReader
+from purrpal_common.structured_logging import (
+    setup_logging, begin_request, end_request, current_request, sampled, stage, logging_stats
+)
+from purrpal_common import service_metrics
+from purrpal_common.service_metrics import Counter, Gauge, IN_FLIGHT, MODEL_LOAD_SECONDS, PREDICTIONS
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Setup logging (queued, structured; see purrpal_common/structured_logging.py)
+setup_logging("tabular")
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("purrpal.access")
+
+class RequestTelemetryMiddleware:
+    """
+    Gives every HTTP request a context (X-Request-ID header or a new id),
+    logs one structured line per request with its status, duration and stages,
+    and records the request and stage latencies for /metrics
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request_id = dict(scope["headers"]).get(b"x-request-id")
+        context, token = begin_request(request_id.decode("latin-1")[:64] if request_id else None)
+        status = 500
+        IN_FLIGHT.inc()
+        
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", context.request_id.encode("latin-1"))
+                ]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            IN_FLIGHT.dec()
+            # Route template from FastAPI (bounded label values); unmatched paths share one
+            route = scope.get("route")
+            service_metrics.observe_request(
+                route.path if route is not None else "other", scope["method"], status,
+                time.perf_counter() - context.started, context.stages
+            )
+            if sampled() or status >= 500:
+                access_logger.log(
+                    logging.ERROR if status >= 500 else logging.INFO,
+                    "%s %s %d", scope["method"], scope["path"], status,
+                    extra={"status": status, "duration_ms": context.elapsed_ms(), "stages": context.stages}
+                )
+            end_request(token)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -27,10 +94,41 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(RequestTelemetryMiddleware)
+
+# Model versions, loaded on first use (configured by MODEL_* env variables, see purrpal_common/model_registry.py)
+model_registry: Optional[ModelRegistry] = None
 
-# Global model instance
+# Global model instance (the default version)
 model_handler: Optional[PurrPalTabularModel] = None
 
+# Runs model calls off the event loop (configured by INFERENCE_* env variables)
+inference_executor: Optional[InferenceExecutor] = None
+
+# Coalesces concurrent /predict calls per model version (enabled by MICRO_BATCH_MAX_WAIT_MS > 0)
+micro_batchers: Dict[str, Optional[MicroBatcher]] = {}
+
+# Diagnosis texts compiled once per disease, per class list (served to clients by /catalog)
+diagnosis_catalogs: Dict[Tuple[str, ...], DiagnosisCatalog] = {}
+
+# Service-specific gauges, read from the executor and batcher at scrape time
+INFERENCE_IN_FLIGHT = Gauge("purrpal_inference_in_flight", "Model calls running or waiting on the inference executor")
+INFERENCE_QUEUE_DEPTH = Gauge("purrpal_inference_queue_depth", "Model calls waiting for a free inference worker")
+MICRO_BATCH_PENDING = Gauge("purrpal_micro_batch_pending", "Requests waiting in the open micro-batch")
+LOG_QUEUE_DEPTH = Gauge("purrpal_log_queue_depth", "Log records waiting for the background writer")
+LOG_QUEUE_DEPTH.set_function(lambda: logging_stats().get("queued", 0))
+STREAM_ROWS = Counter("purrpal_stream_rows_total", "Rows read by /predict/stream by outcome", ["outcome"])
+
+# Maximum number of items accepted by /predict/batch
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 1024))
+
+# Maximum number of rows accepted by /predict/features
+MAX_FEATURE_ROWS = int(os.environ.get("MAX_FEATURE_ROWS", 65536))
+
+# /predict/stream scores this many rows per model call; longer lines are rejected
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 512))
+STREAM_MAX_LINE_BYTES = int(os.environ.get("STREAM_MAX_LINE_BYTES", 65536))
+
 # Pydantic models for request/response
 class CatInfo(BaseModel):
     name: str = Field(..., description="Cat's name")
@@ -79,40 +177,172 @@ class PredictionResponse(BaseModel):
     cat_info: Dict[str, Any]
     active_symptoms: list
     all_probabilities: Dict[str, float]
+    trees_used: int  # Trees that voted (fewer than the forest with FOREST_EARLY_EXIT)
+    attributions: Optional[Dict[str, Any]] = None  # Only with ?explain=true
+
+class CompactPredictionResponse(BaseModel):
+    # Codes only; texts and labels come from the /catalog version in catalog_version
+    success: bool
+    disease_id: int
+    confidence: float
+    symptom_ids: List[str]
+    probabilities: List[float]
+    catalog_version: str
+    trees_used: int
+    attributions: Optional[Dict[str, Any]] = None
+
+class BatchPredictionRequest(BaseModel):
+    # Items are validated one by one so a bad item does not fail the whole batch
+    items: List[Dict[str, Any]] = Field(..., description="List of PredictionRequest objects")
+
+class BatchItemResult(BaseModel):
+    index: int
+    success: bool
+    result: Optional[Union[PredictionResponse, CompactPredictionResponse]] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    success: bool
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
 
 class HealthResponse(BaseModel):
     status: str
     model_info: Dict[str, Any]
+    executor: Optional[Dict[str, Any]] = None
+    micro_batching: Optional[Dict[str, Any]] = None
+    logging: Optional[Dict[str, Any]] = None
     service_name: str
     version: str
 
+def load_model_handler() -> PurrPalTabularModel:
+    """
+    Load the default model version once per process.
+    
+    gunicorn.conf.py calls this in the master process, so forked workers
+    share the model's arrays copy-on-write instead of loading their own.
+    Other versions are loaded by each worker when first requested.
+    """
+    global model_handler, model_registry
+    if model_registry is None:
+        logger.info("Loading PurrPal Tabular Model...")
+        model_registry = create_model_registry()
+    if model_handler is None:
+        model_handler = model_registry.get()
+    return model_handler
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
-    """Initialize model on startup"""
-    global model_handler
+    """Initialize model on startup (reusing a model preloaded before the fork)"""
+    global inference_executor
     try:
-        logger.info("Loading PurrPal Tabular Model...")
-        model_handler = PurrPalTabularModel()
+        load_model_handler()
+        # Calls name a model version; process workers hold a registry of their own
+        inference_executor = InferenceExecutor.from_env(
+            model=model_registry,
+            model_factory=functools.partial(create_model_registry, watch=True)
+        )
+        model_registry.watch()
+        MODEL_LOAD_SECONDS.set(model_handler.load_seconds)
+        INFERENCE_IN_FLIGHT.set_function(lambda: inference_executor.stats()["in_flight"])
+        INFERENCE_QUEUE_DEPTH.set_function(lambda: inference_executor.stats()["queue_depth"])
+        _catalog_for(model_handler)
+        if _micro_batcher(model_registry.default) is not None:
+            MICRO_BATCH_PENDING.set_function(
+                lambda: sum(batcher.stats()["pending"] for batcher in micro_batchers.values() if batcher is not None)
+            )
         logger.info("Model loaded successfully!")
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
         raise
 
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the inference workers"""
+    if inference_executor is not None:
+        inference_executor.shutdown()
+
+async def _run_inference(method: str, *args, version: Optional[str] = None):
+    """
+    Run a model handler method of a model version (default: the default version) on the inference executor
+    
+    Raises:
+        HTTPException: 503 when the inference queue is full, 504 on timeout
+    """
+    try:
+        return await inference_executor.call(method, *args, version=version or model_registry.default)
+    except ExecutorOverloaded as e:
+        logger.warning("Rejected %s: %s", method, e)
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        logger.error("%s timed out after %ss", method, inference_executor.timeout)
+        raise HTTPException(status_code=504, detail="Prediction timed out")
+
+async def _request_model(request: Request) -> Tuple[str, PurrPalTabularModel]:
+    """
+    Model version a request asks for (X-Model-Version header or ?model=, else the default) and its model
+    
+    A version that is not loaded yet is loaded off the event loop.
+    
+    Raises:
+        HTTPException: 404 for an unknown version, 503 when it cannot be loaded
+    """
+    if model_registry is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    try:
+        version = model_registry.resolve(
+            request.headers.get(MODEL_HEADER) or request.query_params.get(MODEL_QUERY_PARAM)
+        )
+    except UnknownModelVersion as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    model = model_registry.get(version, load=False)
+    if model is None:
+        try:
+            with stage("model_load"):
+                model = await asyncio.to_thread(model_registry.get, version)
+        except Exception as e:
+            logger.exception("Loading model version %s failed: %s", version, e)
+            raise HTTPException(status_code=503, detail=f"Model version '{version}' is unavailable")
+    return version, model
+
+def _micro_batcher(version: str) -> Optional[MicroBatcher]:
+    """Micro-batcher of a model version, created on its first request (None when micro-batching is off)"""
+    if version not in micro_batchers:
+        micro_batchers[version] = MicroBatcher.from_env(
+            functools.partial(_run_inference, "predict_batch", version=version)
+        )
+    return micro_batchers[version]
+
+def _catalog_for(model: PurrPalTabularModel) -> DiagnosisCatalog:
+    """Diagnosis catalog of a model's class list (compiled once, shared by versions with the same classes)"""
+    key = tuple(model.class_keys)
+    catalog = diagnosis_catalogs.get(key)
+    if catalog is None:
+        catalog = diagnosis_catalogs[key] = DiagnosisCatalog(list(model.class_names))
+    return catalog
+
 # Health check endpoint
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint"""
-    global model_handler
-    
-    if model_handler is None:
+    """Health check endpoint (model info of the default version, see /models for all)"""
+    if model_registry is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
-    model_info = model_handler.get_health_info()
+    model_info = model_registry.get().get_health_info()
+    model_info["model_version_name"] = model_registry.default
+    micro_batcher = micro_batchers.get(model_registry.default)
     
     return HealthResponse(
         status="healthy" if model_info["model_loaded"] else "unhealthy",
         model_info=model_info,
+        executor=inference_executor.stats() if inference_executor is not None else None,
+        micro_batching=micro_batcher.stats() if micro_batcher is not None else None,
+        logging=logging_stats(),
         service_name="PurrPal Tabular ML Service",
         version="1.0.0"
     )
@@ -128,199 +358,543 @@ async def root():
         "endpoints": {
             "health": "/health",
             "predict": "/predict",
+            "predict_batch": "/predict/batch",
+            "predict_features": "/predict/features",
+            "predict_stream": "/predict/stream",
+            "schema": "/schema",
+            "catalog": "/catalog",
+            "models": "/models",
+            "models_reload": "/models/reload",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
 
 # Prediction endpoint
-@app.post("/predict", response_model=PredictionResponse)
-async def predict_disease(request: PredictionRequest):
+@app.post("/predict", response_model=Union[PredictionResponse, CompactPredictionResponse])
+async def predict_disease(request: PredictionRequest, http_request: Request, response: Response,
+                          response_format: str = Query("full", alias="format", pattern="^(full|compact)$"),
+                          explain: bool = Query(False, description="Include feature attributions")):
     """
     Predict cat disease based on symptoms and cat information
     
     Args:
         request: PredictionRequest containing cat info and questionnaire data
+        http_request: Raw request, naming the model version (X-Model-Version or ?model=)
+        response: Response, tagged with the model version that answered
+        response_format: "full" (texts included) or "compact" (codes resolved with /catalog)
+        explain: Add the percentage points each feature contributed to the predicted class
         
     Returns:
-        PredictionResponse with prediction results
+        PredictionResponse (or CompactPredictionResponse) with prediction results
     """
-    global model_handler
+    _record_parse_stage()
     
-    if model_handler is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    version, model = await _request_model(http_request)
+    response.headers[MODEL_HEADER] = version
     
     try:
-        # Extract age as number from string (e.g., "2 tahun" -> 2)
-        age_str = request.cat_info.age
-        try:
-            age_num = float(''.join(filter(str.isdigit, age_str.split()[0])))
-        except:
-            age_num = 2.0  # Default age
-        
         # Prepare cat data
-        cat_data = {
-            "name": request.cat_info.name,
-            "age": age_num,
-            "gender": request.cat_info.gender,
-            "weight": request.cat_info.weight,
-            "body_temperature": request.cat_info.body_temperature,
-            "duration_days": request.cat_info.duration_days,
-            "heart_rate": request.cat_info.heart_rate
-        }
+        cat_data = _build_cat_data(request.cat_info)
         
         # Convert questionnaire to dict
         questionnaire_data = request.questionnaire.model_dump()
         
-        # Make prediction
-        result = model_handler.predict(cat_data, questionnaire_data)
+        # Make prediction (coalesced with concurrent requests when micro-batching is on)
+        with stage("inference"):
+            micro_batcher = _micro_batcher(version)
+            if explain:
+                result = await _run_inference("predict", cat_data, questionnaire_data, True, version=version)
+            elif micro_batcher is not None:
+                result = await micro_batcher.submit((cat_data, questionnaire_data))
+                if "error" in result:
+                    raise ValueError(result["error"])
+            else:
+                result = await _run_inference("predict", cat_data, questionnaire_data, version=version)
+        PREDICTIONS.labels(result["predicted_disease"]).inc()
         
-        # Generate human-readable diagnosis and recommendations
-        diagnosis, recommendations = _generate_diagnosis_text(
-            result["predicted_disease"], 
-            result["confidence"],
-            result["feature_summary"]
-        )
-        
-        return PredictionResponse(
-            success=True,
-            predicted_disease=result["predicted_disease"],
-            confidence=result["confidence"],
-            diagnosis=diagnosis,
-            recommendations=recommendations,
-            accuracy=f"{result['confidence']:.1f}",
-            cat_info=cat_data,
-            active_symptoms=result["feature_summary"],
-            all_probabilities=result["all_probabilities"]
-        )
+        with stage("render"):
+            catalog = _catalog_for(model)
+            if response_format == "compact":
+                return _build_compact_response(result, questionnaire_data, catalog)
+            return _build_prediction_response(result, cat_data, catalog)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Prediction error: {e}")
+        logger.exception("Prediction error: %s", e)
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
-def _generate_diagnosis_text(disease: str, confidence: float, symptoms: list) -> tuple:
+# Batch prediction endpoint (JSON encoded by pydantic from the response model:
+# as fast as ORJSONResponse here, which FastAPI deprecates for such routes)
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_disease_batch(request: BatchPredictionRequest, http_request: Request, response: Response,
+                                response_format: str = Query("full", alias="format", pattern="^(full|compact)$"),
+                                explain: bool = Query(False, description="Include feature attributions")):
     """
-    Generate human-readable diagnosis and recommendations
+    Predict cat diseases for many questionnaires in one model pass
     
     Args:
-        disease: Predicted disease name
-        confidence: Prediction confidence (0-100)
-        symptoms: List of active symptoms
+        request: BatchPredictionRequest with a list of PredictionRequest objects
+        http_request: Raw request, naming the model version (X-Model-Version or ?model=)
+        response: Response, tagged with the model version that answered
+        response_format: "full" (texts included) or "compact" (codes resolved with /catalog)
+        explain: Add the feature attributions of each predicted class
         
     Returns:
-        Tuple of (diagnosis_text, recommendations_text)
+        BatchPredictionResponse with one result (or error) per item, in order
     """
+    _record_parse_stage()
     
-    # Disease information mapping
-    disease_info = {
-        "Feline Calicivirus": {
-            "name": "Feline Calicivirus (FCV)",
-            "description": "Infeksi virus yang menyebabkan masalah pernapasan dan mulut",
-            "recommendations": [
-                "Berikan makanan yang mudah dicerna dan lembut",
-                "Pastikan kucing tetap terhidrasi dengan baik",
-                "Isolasi dari kucing lain untuk mencegah penyebaran",
-                "Konsultasi dengan dokter hewan untuk pengobatan antiviral",
-                "Jaga kebersihan area mata dan hidung"
-            ]
-        },
-        "Feline Herpesvirus": {
-            "name": "Feline Herpesvirus (FHV-1)",
-            "description": "Infeksi virus yang menyebabkan masalah pernapasan atas",
-            "recommendations": [
-                "Gunakan humidifier untuk mempermudah pernapasan",
-                "Bersihkan mata dan hidung secara teratur",
-                "Berikan makanan yang mengandung L-lysine",
-                "Isolasi dari kucing lain",
-                "Konsultasi dokter hewan untuk pengobatan supportif"
-            ]
-        },
-        "Feline Infectious Peritonitis": {
-            "name": "Feline Infectious Peritonitis (FIP)",
-            "description": "Penyakit serius yang disebabkan oleh coronavirus",
-            "recommendations": [
-                "SEGERA bawa ke dokter hewan - ini kondisi darurat",
-                "Berikan nutrisi yang baik dan suplemen",
-                "Jaga kucing tetap hangat dan nyaman",
-                "Monitor kondisi dengan ketat",
-                "Diskusikan pilihan pengobatan dengan dokter hewan"
-            ]
-        },
-        "Feline Leukemia Virus": {
-            "name": "Feline Leukemia Virus (FeLV)",
-            "description": "Virus yang menyerang sistem kekebalan tubuh",
-            "recommendations": [
-                "Tes darah untuk konfirmasi diagnosis",
-                "Isolasi dari kucing lain",
-                "Berikan makanan berkualitas tinggi",
-                "Pantau kesehatan secara rutin",
-                "Diskusikan rencana perawatan jangka panjang dengan dokter hewan"
-            ]
-        },
-        "Feline Panleukopenia": {
-            "name": "Feline Panleukopenia (Distemper Kucing)",
-            "description": "Infeksi virus yang sangat menular dan berbahaya",
-            "recommendations": [
-                "SEGERA bawa ke dokter hewan - kondisi darurat",
-                "Berikan cairan untuk mencegah dehidrasi",
-                "Isolasi total dari kucing lain",
-                "Desinfeksi area yang terkontaminasi",
-                "Monitor kondisi dengan sangat ketat"
-            ]
-        },
-        "Upper Respiratory Infection": {
-            "name": "Infeksi Saluran Pernapasan Atas",
-            "description": "Infeksi yang mempengaruhi hidung, tenggorokan, dan sinus",
-            "recommendations": [
-                "Pastikan kucing tetap hangat dan nyaman",
-                "Gunakan humidifier atau steam therapy",
-                "Bersihkan mata dan hidung secara teratur",
-                "Berikan makanan yang mudah dicium aromanya",
-                "Konsultasi dokter hewan jika gejala memburuk"
-            ]
-        }
-    }
+    version, model = await _request_model(http_request)
+    response.headers[MODEL_HEADER] = version
+    
+    if len(request.items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.items)} items (max {MAX_BATCH_SIZE})"
+        )
+    
+    results: List[Optional[BatchItemResult]] = [None] * len(request.items)
+    positions = []
+    inputs = []
+    
+    # Validate items individually and report invalid ones without failing the batch
+    for index, item in enumerate(request.items):
+        try:
+            item_request = PredictionRequest.model_validate(item)
+            cat_data = _build_cat_data(item_request.cat_info)
+            questionnaire_data = item_request.questionnaire.model_dump()
+        except Exception as e:
+            results[index] = BatchItemResult(index=index, success=False, error=f"Invalid item: {str(e)}")
+            continue
+        positions.append(index)
+        inputs.append((cat_data, questionnaire_data))
+    
+    try:
+        with stage("inference"):
+            predictions = await _run_inference("predict_batch", inputs, explain, version=version) if inputs else []
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Batch prediction error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
     
-    # Get disease info
-    disease_data = disease_info.get(disease, {
-        "name": disease,
-        "description": "Kondisi kesehatan yang memerlukan perhatian",
-        "recommendations": ["Konsultasi dengan dokter hewan untuk diagnosis dan pengobatan yang tepat"]
-    })
+    with stage("render"):
+        catalog = _catalog_for(model)
+        for index, (cat_data, questionnaire_data), result in zip(positions, inputs, predictions):
+            if "error" in result:
+                results[index] = BatchItemResult(index=index, success=False, error=f"Prediction failed: {result['error']}")
+                continue
+            try:
+                if response_format == "compact":
+                    item_result = _build_compact_response(result, questionnaire_data, catalog)
+                else:
+                    item_result = _build_prediction_response(result, cat_data, catalog)
+            except Exception as e:
+                results[index] = BatchItemResult(index=index, success=False, error=f"Prediction failed: {str(e)}")
+                continue
+            results[index] = BatchItemResult(index=index, success=True, result=item_result)
+            PREDICTIONS.labels(result["predicted_disease"]).inc()
     
-    # Generate diagnosis text
-    confidence_level = "tinggi" if confidence >= 80 else "sedang" if confidence >= 60 else "rendah"
+    succeeded = sum(1 for item in results if item.success)
+    return BatchPredictionResponse(
+        success=succeeded == len(results),
+        total=len(results),
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        results=results
+    )
+
+# Feature block prediction endpoint
+@app.post("/predict/features")
+async def predict_features(request: Request):
+    """
+    Predict cat diseases for a block of feature rows (JSON, MessagePack, Arrow IPC or .npy)
     
-    diagnosis = f"""
-    Berdasarkan analisis gejala yang diberikan, kucing Anda kemungkinan mengalami <strong>{disease_data['name']}</strong>.
+    The body holds the model's feature columns (see /schema and feature_codecs.py)
+    and is scored in one pass without per-row request objects. The response format
+    follows the Accept header, defaulting to the request's Content-Type.
     
-    <br><br><strong>Deskripsi:</strong><br>
-    {disease_data['description']}
+    Returns:
+        Predicted disease, disease id, confidence and class probabilities per row
+    """
+    version, model = await _request_model(request)
+    if model.feature_schema is None:
+        raise HTTPException(status_code=501, detail="Feature blocks need a compiled feature schema")
     
-    <br><br><strong>Gejala yang terdeteksi:</strong><br>
-    {', '.join(symptoms) if symptoms else 'Gejala umum yang tidak spesifik'}
+    try:
+        request_type = feature_codecs.media_type(request.headers.get("content-type"))
+        response_type = feature_codecs.negotiate(request.headers.get("accept"), default=request_type)
+    except UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except NotAcceptable as e:
+        raise HTTPException(status_code=406, detail=str(e))
     
-    <br><br><strong>Tingkat Keyakinan:</strong> {confidence:.1f}% ({confidence_level})
+    with stage("parse"):
+        body = await request.body()
+        try:
+            block = feature_codecs.decode_block(body, request_type, model.feature_schema)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid feature block: {str(e)}")
+    
+    if len(block) > MAX_FEATURE_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Feature block too large: {len(block)} rows (max {MAX_FEATURE_ROWS})"
+        )
+    
+    try:
+        with stage("inference"):
+            predictions, probabilities = await _run_inference("predict_block", block, version=version)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Feature block prediction error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    
+    with stage("render"):
+        content = feature_codecs.encode_predictions(response_type, probabilities, model.class_keys)
+    
+    for disease, count in zip(*np.unique(predictions, return_counts=True)):
+        PREDICTIONS.labels(str(disease)).inc(int(count))
+    return Response(content=content, media_type=response_type, headers={MODEL_HEADER: version})
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for generators that read the request body themselves
+    
+    Starlette's disconnect listener would swallow the body messages the
+    generator is waiting for; a disconnect surfaces as ClientDisconnect from
+    request.stream() instead.
     """
     
-    # Generate recommendations
-    recommendations = "<br>".join([f"• {rec}" for rec in disease_data['recommendations']])
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+# Streaming bulk prediction endpoint
+@app.post("/predict/stream")
+async def predict_stream(request: Request,
+                         upload_format: Optional[str] = Query(None, alias="format", pattern="^(ndjson|csv)$")):
+    """
+    Score an NDJSON or CSV upload of any size, streaming NDJSON results back
     
-    # Add general disclaimer
-    recommendations += f"""
+    The upload (raw body or the file of a multipart form, see bulk_stream.py) is
+    read incrementally and scored STREAM_CHUNK_SIZE rows at a time, so memory
+    stays flat whatever its size. The first output line holds the class order,
+    then one line per input row (prediction or error, in input order) and a
+    final summary line with the counts and throughput.
     
-    <br><br><strong>⚠️ Penting:</strong><br>
-    • Hasil ini adalah prediksi AI dan bukan diagnosis medis resmi<br>
-    • Segera konsultasi dengan dokter hewan untuk pemeriksaan lebih lanjut<br>
-    • Jangan tunda jika gejala memburuk atau kucing terlihat sangat lemah
+    Args:
+        request: Upload body
+        upload_format: "ndjson" or "csv" when the content type does not tell
     """
+    version, model = await _request_model(request)
+    
+    try:
+        reader = UploadReader(request.headers.get("content-type"), upload_format, STREAM_MAX_LINE_BYTES)
+    except UploadError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    
+    return UploadStreamingResponse(
+        _stream_predictions(request, reader, version, _catalog_for(model)),
+        media_type="application/x-ndjson", headers={MODEL_HEADER: version}
+    )
+
+async def _stream_predictions(request: Request, reader: UploadReader, version: str, catalog: DiagnosisCatalog):
+    """Read, validate and score an upload chunk by chunk with one model version, yielding NDJSON lines"""
+    started = time.perf_counter()
+    counts = {"scored": 0, "failed": 0}
+    decoder = None
+    records: List[Optional[Dict[str, Any]]] = []  # Output of the current chunk; None marks a row to score
+    rows = []  # (line, id, cat_data, questionnaire_data) of the rows to score
+    error = None
+    
+    yield orjson.dumps({"class_names": catalog.class_names, "catalog_version": catalog.etag}) + b"\n"
+    
+    try:
+        async for line_number, line in reader.lines(request.stream()):
+            if decoder is None:
+                if reader.format == CSV:
+                    decoder = CsvDecoder(CatInfo.model_fields, QuestionnaireData.model_fields)
+                else:
+                    decoder = NdjsonDecoder()
+            
+            item_id = None
+            try:
+                if line is None:
+                    raise ValueError(f"Line longer than {STREAM_MAX_LINE_BYTES} bytes")
+                item = decoder.decode(line)
+                if item is None:
+                    continue  # CSV header
+                item_id = item.get("id")
+                item_request = PredictionRequest.model_validate(item)
+                cat_data = _build_cat_data(item_request.cat_info)
+                questionnaire_data = item_request.questionnaire.model_dump()
+            except ValidationError as e:
+                # One short line per field; the full pydantic text repeats documentation links
+                problems = "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                )
+                records.append(_stream_record(line_number, item_id, error=f"Invalid row: {problems}"))
+            except Exception as e:
+                records.append(_stream_record(line_number, item_id, error=f"Invalid row: {str(e)}"))
+            else:
+                rows.append((line_number, item_id, cat_data, questionnaire_data))
+                records.append(None)
+            
+            if len(records) >= STREAM_CHUNK_SIZE:
+                yield await _score_stream_chunk(records, rows, counts, version, catalog)
+                records, rows = [], []
+    except ClientDisconnect:
+        logger.warning("Client disconnected from /predict/stream after %d rows", sum(counts.values()))
+        return
+    except UploadError as e:
+        error = str(e)
+    
+    if records:
+        yield await _score_stream_chunk(records, rows, counts, version, catalog)
     
-    return diagnosis.strip(), recommendations.strip()
+    seconds = time.perf_counter() - started
+    total = counts["scored"] + counts["failed"]
+    summary = {
+        "rows": total,
+        "scored": counts["scored"],
+        "failed": counts["failed"],
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(total / seconds, 1) if seconds > 0 else None
+    }
+    if isinstance(decoder, CsvDecoder) and decoder.ignored_columns:
+        summary["ignored_columns"] = decoder.ignored_columns
+    if error is not None:
+        summary["error"] = error
+    logger.info("Stream scored %d rows (%d failed) in %.2fs, %.0f rows/s",
+                total, counts["failed"], seconds, total / seconds if seconds > 0 else 0.0)
+    yield orjson.dumps({"summary": summary}) + b"\n"
+
+async def _score_stream_chunk(records: List[Optional[Dict[str, Any]]], rows: list, counts: Dict[str, int],
+                             version: str, catalog: DiagnosisCatalog) -> bytes:
+    """Score the rows of one chunk in a single model call and encode its output lines"""
+    results = []
+    if rows:
+        try:
+            with stage("inference"):
+                results = await _run_inference(
+                    "predict_batch", [(cat_data, q) for _, _, cat_data, q in rows], version=version
+                )
+        except Exception as e:
+            # The response has started; report the failure on every row of the chunk
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error("Stream chunk of %d rows failed: %s", len(rows), detail)
+            results = [{"error": detail}] * len(rows)
+    
+    scored = iter(zip(rows, results))
+    lines = []
+    for record in records:
+        if record is None:
+            (line_number, item_id, _, _), result = next(scored)
+            if "error" in result:
+                record = _stream_record(line_number, item_id, error=f"Prediction failed: {result['error']}")
+            else:
+                record = _stream_record(
+                    line_number, item_id,
+                    predicted_disease=result["predicted_disease"],
+                    disease_id=catalog.disease_id(result["predicted_disease"]),
+                    confidence=result["confidence"],
+                    probabilities=list(result["all_probabilities"].values()),
+                    trees_used=result["trees_used"]
+                )
+                PREDICTIONS.labels(result["predicted_disease"]).inc()
+        outcome = "failed" if "error" in record else "scored"
+        counts[outcome] += 1
+        STREAM_ROWS.labels(outcome).inc()
+        lines.append(orjson.dumps(record))
+    return b"\n".join(lines) + b"\n"
+
+def _stream_record(line_number: int, item_id: Any, **fields) -> Dict[str, Any]:
+    """One /predict/stream output line, echoing the input's id when it has one"""
+    record = {"line": line_number}
+    if item_id is not None:
+        record["id"] = item_id
+    record.update(fields)
+    return record
+
+# Feature schema endpoint
+@app.get("/schema")
+async def get_schema(request: Request):
+    """Feature columns, vital defaults, class order and media types accepted by /predict/features"""
+    version, model = await _request_model(request)
+    if model.feature_schema is None:
+        raise HTTPException(status_code=501, detail="Feature blocks need a compiled feature schema")
+    
+    schema = model.feature_schema
+    return {
+        "model_version": version,
+        "feature_names": schema.feature_names,
+        "defaults": schema.defaults,
+        "class_names": model.class_keys,
+        "media_types": feature_codecs.available_media_types(),
+        "max_rows": MAX_FEATURE_ROWS
+    }
+
+# Metrics endpoint
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of request, stage, prediction and queue metrics"""
+    if not service_metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return Response(content=service_metrics.REGISTRY.exposition(), media_type=service_metrics.CONTENT_TYPE)
+
+def _record_parse_stage():
+    """Record body parsing and validation (request start to endpoint entry) as the "parse" stage"""
+    context = current_request()
+    if context is not None:
+        context.add_stage("parse", time.perf_counter() - context.started)
+
+# Catalog endpoint
+@app.get("/catalog")
+async def get_catalog(request: Request):
+    """
+    Diagnosis texts, class order and symptom labels used to render compact predictions
+    
+    The response carries an ETag; clients revalidate with If-None-Match and get
+    304 Not Modified until the catalog (or the model's class list) changes.
+    Model versions with different class lists have their own catalog.
+    """
+    version, model = await _request_model(request)
+    catalog = _catalog_for(model)
+    
+    etag = f'"{catalog.etag}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=3600", MODEL_HEADER: version}
+    if request.headers.get("if-none-match") in (etag, f"W/{etag}"):
+        return Response(status_code=304, headers=headers)
+    return Response(content=catalog.body, media_type="application/json", headers=headers)
+
+# Model versions endpoints
+@app.get("/models")
+async def list_models():
+    """Model versions with their load time, resident size and usage in this worker (see purrpal_common/model_registry.py)"""
+    if model_registry is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return model_registry.stats()
+
+@app.post("/models/reload")
+async def reload_models(version: Optional[str] = Query(None, description="Version to reload even if its spec is unchanged")):
+    """
+    Re-read the model registry and swap changed versions in without a restart
+    
+    New models are loaded completely before they take traffic and requests in
+    flight finish on the model they started with. Only this worker reloads;
+    MODEL_REGISTRY_WATCH_SECONDS makes every worker follow the registry file.
+    """
+    global model_handler
+    if model_registry is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    
+    try:
+        with stage("model_load"):
+            summary = await asyncio.to_thread(model_registry.reload, version)
+    except UnknownModelVersion as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid model registry: {str(e)}")
+    except Exception as e:
+        logger.exception("Model reload failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Reload failed, previous models still serving: {str(e)}")
+    
+    model_handler = model_registry.get()
+    MODEL_LOAD_SECONDS.set(model_handler.load_seconds)
+    return {"success": True, **summary, "models": model_registry.stats()}
+
+def _build_cat_data(cat_info: CatInfo) -> Dict[str, Any]:
+    """Convert CatInfo into the cat_data dictionary used by the model handler"""
+    # Extract age as number from string (e.g., "2 tahun" -> 2)
+    age_str = cat_info.age
+    try:
+        age_num = float(''.join(filter(str.isdigit, age_str.split()[0])))
+    except:
+        age_num = 2.0  # Default age
+    
+    return {
+        "name": cat_info.name,
+        "age": age_num,
+        "gender": cat_info.gender,
+        "weight": cat_info.weight,
+        "body_temperature": cat_info.body_temperature,
+        "duration_days": cat_info.duration_days,
+        "heart_rate": cat_info.heart_rate
+    }
+
+def _build_prediction_response(result: Dict[str, Any], cat_data: Dict[str, Any],
+                               catalog: DiagnosisCatalog) -> PredictionResponse:
+    """Turn a model handler result into the public PredictionResponse"""
+    # Generate human-readable diagnosis and recommendations
+    diagnosis, recommendations = _generate_diagnosis_text(
+        result["predicted_disease"], 
+        result["confidence"],
+        result["feature_summary"],
+        catalog
+    )
+    
+    return PredictionResponse(
+        success=True,
+        predicted_disease=result["predicted_disease"],
+        confidence=result["confidence"],
+        diagnosis=diagnosis,
+        recommendations=recommendations,
+        accuracy=f"{result['confidence']:.1f}",
+        cat_info=cat_data,
+        active_symptoms=result["feature_summary"],
+        all_probabilities=result["all_probabilities"],
+        trees_used=result["trees_used"],
+        attributions=result.get("attributions")
+    )
+
+def _build_compact_response(result: Dict[str, Any], questionnaire_data: Dict[str, Any],
+                            catalog: DiagnosisCatalog) -> CompactPredictionResponse:
+    """Turn a model handler result into a CompactPredictionResponse (codes only)"""
+    return CompactPredictionResponse(
+        success=True,
+        disease_id=catalog.disease_id(result["predicted_disease"]),
+        confidence=result["confidence"],
+        symptom_ids=[
+            question_id for question_id, answer in questionnaire_data.items()
+            if answer and question_id in SYMPTOM_LABELS
+        ],
+        probabilities=list(result["all_probabilities"].values()),
+        catalog_version=catalog.etag,
+        trees_used=result["trees_used"],
+        attributions=result.get("attributions")
+    )
+
+def _generate_diagnosis_text(disease: str, confidence: float, symptoms: list,
+                             catalog: DiagnosisCatalog) -> tuple:
+    """
+    Generate human-readable diagnosis and recommendations
+    
+    Args:
+        disease: Predicted disease name
+        confidence: Prediction confidence (0-100)
+        symptoms: List of active symptoms
+        catalog: Diagnosis catalog of the model version that predicted
+        
+    Returns:
+        Tuple of (diagnosis_text, recommendations_text)
+    """
+    # Texts are precompiled per disease and confidence tier
+    return catalog.render(disease, confidence, symptoms)
 
 # Error handlers
 from fastapi.responses import JSONResponse
 
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
+    # Endpoints raising 404 themselves (unknown model version) keep their detail
+    if getattr(exc, "detail", "Not Found") != "Not Found":
+        return JSONResponse(status_code=404, content={"error": "Not found", "detail": exc.detail})
     return JSONResponse(
         status_code=404,
         content={"error": "Endpoint not found", "detail": "Please check the API documentation at /docs"}
@@ -338,8 +912,9 @@ if __name__ == "__main__":
     import os
     
     port = int(os.environ.get("PORT", 8080))
+    # Pass the app object: importing "app:app" would run this module a second time
     uvicorn.run(
-        "app:app",
+        app,
         host="0.0.0.0", 
         port=port,
         log_level="info"
@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+Offline batch scoring of CSV and Parquet datasets.
+
+Scores a dataset file with PurrPalTabularModel without going through the
+HTTP service. The input is split into chunks (line-aligned byte ranges of
+a CSV, row groups of a Parquet file) that worker processes read, map onto
+the model features, score and write as part files on their own, so the
+parent only plans the chunks, reports progress and merges the parts. Each
+worker holds one model for the whole run (forked workers share the
+parent's copy).
+
+Dataset columns are mapped the way the training notebook built the
+features from cleaned_animal_disease_prediction.csv:
+
+    - a column named like a feature is used as is; Yes/No become 1/0 and
+      numbers are read out of text with units such as "39.5°C"
+    - Symptom_1..Symptom_N values set the symptom feature of the same name
+    - Duration ("3 days", "1 week") fills Duration_days
+    - Gender fills Gender_Male
+    - missing features and empty cells take the CatInfo defaults (vitals) or 0
+
+Rows with values that cannot be read get an error instead of a prediction.
+The output has one row per scored input row: row (0-based data row of the
+input), the optional --id-column, predicted_disease, disease_id, confidence,
+one probability column per class (percentages rounded to 0.1, as in
+/predict) and error.
+
+Finished chunks are checkpoints: the parts are kept in <output>.parts until
+the run completes, and the same command started again after an
+interruption only scores the missing chunks. CSV records must fit on one
+line (no quoted newlines).
+
+Usage:
+    python batch_score.py ../../ml-research/tabular-analytics-engine/cleaned_animal_disease_prediction.csv \\
+        --output predictions.parquet --filter Animal_Type=Cat --workers 4
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import shutil
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_all_start_methods, get_context
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from feature_schema import FeatureSchema, GENDER_FEATURE
+
+CHECKPOINT_VERSION = 1
+DEFAULT_CHUNK_MB = 32
+CSV_FORMAT = "csv"
+PARQUET_FORMAT = "parquet"
+FORMAT_EXTENSIONS = {".csv": CSV_FORMAT, ".parquet": PARQUET_FORMAT, ".pq": PARQUET_FORMAT}
+
+SYMPTOM_COLUMN = re.compile(r"^Symptom_\d+$")
+# A number followed by an optional unit: "39.5°C", "4.2 kg", "120 bpm"
+UNIT_NUMBER = re.compile(r"^([-+]?\d+(?:\.\d+)?)\s*[^\d\s]*$")
+DURATION = re.compile(r"^(\d+(?:\.\d+)?)\s*(day|week)?")
+FLAG_VALUES = {"yes": 1.0, "true": 1.0, "y": 1.0, "no": 0.0, "false": 0.0, "n": 0.0}
+
+# Per-process state of the pool workers
+_worker: Dict[str, Any] = {}
+
+
+class Chunk(NamedTuple):
+    """Unit of work: a byte range [start, end) of a CSV or the row group ``start`` of a Parquet file"""
+    index: int
+    first_row: int
+    rows: int
+    start: int
+    end: int
+
+
+def file_format(path: Path, explicit: Optional[str] = None) -> str:
+    """Dataset format from an explicit choice or the file extension"""
+    found = explicit or FORMAT_EXTENSIONS.get(path.suffix.lower())
+    if found is None:
+        raise SystemExit(f"❌ Cannot tell the format of {path}; expected one of {sorted(FORMAT_EXTENSIONS)}")
+    return found
+
+
+def plan_csv(path: Path, chunk_bytes: int) -> Tuple[List[str], List[Chunk]]:
+    """
+    Header and line-aligned chunks of about ``chunk_bytes`` of a CSV file.
+
+    One sequential pass counts the lines of every chunk, so each worker
+    knows the row number its chunk starts at.
+    """
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+        header = [name.strip() for name in header]
+        chunk_start = pos = f.tell()
+        first_row = rows = 0
+        chunks: List[Chunk] = []
+        last = b"\n"
+
+        while True:
+            block = f.read(1 << 23)
+            if not block:
+                break
+            offset = 0
+            while True:
+                cut = chunk_start + chunk_bytes - pos
+                newline = block.find(b"\n", max(cut, offset)) if cut < len(block) else -1
+                if newline < 0:
+                    rows += block.count(b"\n", offset)
+                    break
+                rows += block.count(b"\n", offset, newline + 1)
+                chunks.append(Chunk(len(chunks), first_row, rows, chunk_start, pos + newline + 1))
+                first_row += rows
+                rows = 0
+                chunk_start = pos + newline + 1
+                offset = newline + 1
+            pos += len(block)
+            last = block[-1:]
+
+        if pos > chunk_start:
+            rows += last != b"\n"  # Final line without a newline
+            chunks.append(Chunk(len(chunks), first_row, rows, chunk_start, pos))
+    return header, chunks
+
+
+def plan_parquet(path: Path) -> Tuple[List[str], List[Chunk]]:
+    """Column names and one chunk per row group of a Parquet file"""
+    import pyarrow.parquet as pq
+
+    metadata = pq.ParquetFile(path).metadata
+    chunks = []
+    first_row = 0
+    for index in range(metadata.num_row_groups):
+        rows = metadata.row_group(index).num_rows
+        chunks.append(Chunk(index, first_row, rows, index, index + 1))
+        first_row += rows
+    return list(metadata.schema.to_arrow_schema().names), chunks
+
+
+def used_columns(header: Sequence[str], schema: FeatureSchema, extra: Sequence[str] = ()) -> List[str]:
+    """Dataset columns the mapping reads, plus ``extra`` (id and filter columns), in file order"""
+    wanted = set(schema.column_index) | {"Duration", "Gender"} | set(extra)
+    return [name for name in header if name in wanted or SYMPTOM_COLUMN.match(name)]
+
+
+def _cell_value(text: str) -> Optional[float]:
+    """Number, Yes/No flag or number with a unit; None for an empty cell, NaN when unreadable"""
+    text = text.strip()
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    flag = FLAG_VALUES.get(text.lower())
+    if flag is not None:
+        return flag
+    match = UNIT_NUMBER.match(text)
+    return float(match.group(1)) if match else np.nan
+
+
+def _duration_days(text: str) -> Optional[float]:
+    """Days of "3 days" / "1 week"; plain numbers are days"""
+    text = text.strip().lower()
+    if not text:
+        return None
+    match = DURATION.match(text)
+    if match is None:
+        return np.nan
+    return float(match.group(1)) * (7 if match.group(2) == "week" else 1)
+
+
+def _column_values(series: pd.Series, convert=_cell_value) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (float64 values, empty cell mask) of a dataset column; unreadable cells are NaN.
+
+    Text columns are converted once per distinct value, so low-cardinality
+    columns (Yes/No, "39.5°C") cost a hash per row instead of a parse.
+    """
+    if convert is _cell_value and (pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series)):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return values, np.isnan(values)
+
+    codes, uniques = pd.factorize(series)
+    converted = [convert(str(value)) for value in uniques]
+    # Missing cells have code -1, which picks the trailing entry
+    lookup = np.array([np.nan if value is None else value for value in converted] + [np.nan])
+    empty = np.array([value is None for value in converted] + [True])
+    return lookup[codes], empty[codes]
+
+
+def map_dataset(frame: pd.DataFrame, schema: FeatureSchema) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """
+    Map dataset rows onto an unscaled feature block.
+
+    Returns:
+        Tuple of (block, per-row error or None); rows with an error must not be scored
+    """
+    block = schema.new_block(len(frame))
+    for name, default in schema.defaults.items():
+        block[:, schema.column_index[name]] = default
+
+    def fill(name: str, values: np.ndarray, empty: np.ndarray):
+        column = block[:, schema.column_index[name]]
+        column[~empty] = values[~empty]
+
+    for name in schema.feature_names:
+        if name in frame.columns:
+            fill(name, *_column_values(frame[name]))
+    if "Duration_days" not in frame.columns and "Duration" in frame.columns:
+        fill("Duration_days", *_column_values(frame["Duration"], _duration_days))
+    if GENDER_FEATURE not in frame.columns and "Gender" in frame.columns:
+        codes, uniques = pd.factorize(frame["Gender"])
+        male = np.array([str(value).strip().lower() == "male" for value in uniques] + [False])
+        block[:, schema.gender_index] = male[codes]
+
+    # Symptom_N cells name a symptom feature; they add to a Yes/No column of the same name
+    flag_names = {schema.feature_names[i]: i for i in schema.flag_index}
+    for column in (name for name in frame.columns if SYMPTOM_COLUMN.match(name)):
+        codes, uniques = pd.factorize(frame[column])
+        features = np.array([flag_names.get(str(value).strip(), -1) for value in uniques] + [-1], dtype=np.intp)
+        index = features[codes]
+        rows = np.flatnonzero(index >= 0)
+        block[rows, index[rows]] = np.maximum(block[rows, index[rows]], 1)
+
+    errors: List[Optional[str]] = [None] * len(frame)
+    invalid = schema.invalid_rows(block)
+    for row in np.flatnonzero(invalid):
+        values = block[row]
+        bad = ~np.isfinite(values)
+        bad[schema.flag_index] |= (values[schema.flag_index] != 0) & (values[schema.flag_index] != 1)
+        errors[row] = f"Invalid values for {', '.join(schema.feature_names[i] for i in np.flatnonzero(bad))}"
+    block[invalid] = schema.new_block(1)  # Scoreable placeholder, never reported
+    block[:, schema.int_index] = np.trunc(block[:, schema.int_index])
+    return block, errors
+
+
+def filter_mask(frame: pd.DataFrame, filters: Sequence[Tuple[str, str]]) -> np.ndarray:
+    """Rows whose columns equal every (column, value) filter"""
+    keep = np.ones(len(frame), dtype=bool)
+    for column, value in filters:
+        keep &= (frame[column].astype("string").str.strip() == value).to_numpy(dtype=bool, na_value=False)
+    return keep
+
+
+def score_frame(model, frame: pd.DataFrame, first_row: int, id_column: Optional[str] = None) -> pd.DataFrame:
+    """Output rows of one dataset frame (see the module docstring for the columns)"""
+    block, errors = map_dataset(frame, model.feature_schema)
+    valid = np.array([error is None for error in errors], dtype=bool)
+    blank = frame.isna().all(axis=1).to_numpy(dtype=bool)
+    for row in np.flatnonzero(blank):
+        errors[row], valid[row] = "Empty row", False
+
+    class_names = model.class_keys
+    percentages = np.full((len(frame), len(class_names)), np.nan)
+    confidence = np.full(len(frame), np.nan)
+    disease_ids = np.full(len(frame), -1, dtype=np.int32)
+    if valid.any():
+        _, probabilities = model.predict_block(np.ascontiguousarray(block[valid]))
+        percentages[valid] = np.round(probabilities * 100, 1)
+        confidence[valid] = percentages[valid].max(axis=1)
+        disease_ids[valid] = np.argmax(probabilities, axis=1)
+
+    predicted = np.asarray(class_names, dtype=object)[disease_ids]
+    predicted[~valid] = None
+    # Filtered frames keep the position of each row within the chunk as index
+    output = {"row": np.asarray(frame.index, dtype=np.int64) + first_row}
+    if id_column:
+        output[id_column] = frame[id_column].astype("string").to_numpy(dtype=object, na_value=None)
+    output.update({"predicted_disease": predicted, "disease_id": disease_ids, "confidence": confidence})
+    output.update({name: percentages[:, i] for i, name in enumerate(class_names)})
+    output["error"] = np.asarray(errors, dtype=object)
+    return pd.DataFrame(output)
+
+
+def output_schema(class_names: Sequence[str], id_column: Optional[str]):
+    """Arrow schema of the Parquet output, fixed so every part has the same types"""
+    import pyarrow as pa
+
+    fields = [("row", pa.int64())]
+    if id_column:
+        fields.append((id_column, pa.string()))
+    fields += [("predicted_disease", pa.string()), ("disease_id", pa.int32()), ("confidence", pa.float64())]
+    fields += [(name, pa.float64()) for name in class_names]
+    fields.append(("error", pa.string()))
+    return pa.schema(fields)
+
+
+def _init_worker(settings: Dict[str, Any]):
+    """Pool initializer: load the model unless it was inherited from the parent"""
+    # Interrupts are handled by the parent, which lets the chunks in progress finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _worker.update(settings)
+    if "model" not in _worker:
+        from model_handler import PurrPalTabularModel
+
+        _worker["model"] = PurrPalTabularModel(settings["models_dir"], cache_size=0)
+
+
+def _read_chunk(chunk: Chunk) -> pd.DataFrame:
+    """Dataset rows of a chunk, indexed from 0 within the chunk"""
+    path, columns = _worker["input"], _worker["columns"]
+    if chunk.rows == 0:
+        return pd.DataFrame(columns=columns)
+    if _worker["input_format"] == PARQUET_FORMAT:
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).read_row_group(chunk.start, columns=columns).to_pandas()
+
+    with open(path, "rb") as f:
+        f.seek(chunk.start)
+        data = f.read(chunk.end - chunk.start)
+    frame = pd.read_csv(io.BytesIO(data), header=None, names=_worker["header"], usecols=columns,
+                        skip_blank_lines=False, encoding="utf-8")
+    if len(frame) != chunk.rows:
+        raise ValueError(f"Read {len(frame)} rows where {chunk.rows} lines were counted (quoted newlines?)")
+    return frame
+
+
+def _score_chunk(chunk: Chunk) -> Dict[str, Any]:
+    """Read, score and write one chunk as a part file; returns its counts"""
+    started = time.perf_counter()
+    try:
+        frame = _read_chunk(chunk)
+    except Exception as e:
+        raise RuntimeError(f"Cannot read chunk {chunk.index} (rows {chunk.first_row}-"
+                           f"{chunk.first_row + chunk.rows - 1}): {e}") from None
+    if _worker["filters"]:
+        frame = frame[filter_mask(frame, _worker["filters"])]
+    output = score_frame(_worker["model"], frame, chunk.first_row, _worker["id_column"])
+
+    part = part_path(Path(_worker["parts_dir"]), chunk.index, _worker["output_format"])
+    temporary = part.with_name(part.name + ".tmp")
+    if _worker["output_format"] == PARQUET_FORMAT:
+        output.to_parquet(temporary, index=False, schema=output_schema(_worker["model"].class_keys,
+                                                                       _worker["id_column"]))
+    else:
+        output.to_csv(temporary, index=False)
+    os.replace(temporary, part)  # A part only exists once it is complete
+
+    return {
+        "index": chunk.index,
+        "rows": chunk.rows,
+        "scored": int(output["error"].isna().sum()),
+        "failed": int(output["error"].notna().sum()),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def part_path(parts_dir: Path, index: int, output_format: str) -> Path:
+    return parts_dir / f"part-{index:06d}.{output_format}"
+
+
+def open_checkpoint(parts_dir: Path, manifest: Dict[str, Any], restart: bool) -> List[int]:
+    """
+    Create or reuse the parts directory of a run.
+
+    Returns:
+        Indexes of the chunks already written by an interrupted run with the same manifest
+    """
+    manifest_path = parts_dir / "manifest.json"
+    if restart and parts_dir.exists():
+        shutil.rmtree(parts_dir)
+    if manifest_path.exists():
+        previous = json.loads(manifest_path.read_text())
+        if previous != manifest:
+            changed = sorted(key for key in manifest if previous.get(key) != manifest[key])
+            raise SystemExit(f"❌ {parts_dir} belongs to a run with different {', '.join(changed)}; "
+                             f"pass --restart to discard it")
+        return sorted(
+            index for index in range(manifest["chunks"])
+            if part_path(parts_dir, index, manifest["output_format"]).exists()
+        )
+
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    for stale in parts_dir.glob("part-*"):
+        stale.unlink()
+    manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    return []
+
+
+def merge_parts(parts_dir: Path, n_chunks: int, output: Path, output_format: str):
+    """Concatenate the parts in chunk order into ``output``"""
+    temporary = output.with_name(output.name + ".tmp")
+    parts = [part_path(parts_dir, index, output_format) for index in range(n_chunks)]
+    if output_format == PARQUET_FORMAT:
+        import pyarrow.parquet as pq
+
+        writer = None
+        for part in parts:
+            table = pq.read_table(part)
+            if writer is None:
+                writer = pq.ParquetWriter(temporary, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    else:
+        with open(temporary, "wb") as out:
+            for number, part in enumerate(parts):
+                with open(part, "rb") as f:
+                    header = f.readline()
+                    if number == 0:
+                        out.write(header)
+                    shutil.copyfileobj(f, out, 1 << 20)
+    os.replace(temporary, output)
+
+
+class Progress:
+    """Rows done, throughput and ETA, printed at most once per ``interval`` seconds"""
+
+    def __init__(self, total_rows: int, done_rows: int = 0, interval: float = 1.0):
+        self.total_rows = total_rows
+        self.done_rows = done_rows
+        self.resumed_rows = done_rows
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.printed = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return (self.done_rows - self.resumed_rows) / max(time.perf_counter() - self.started, 1e-9)
+
+    def add(self, rows: int, force: bool = False):
+        self.done_rows += rows
+        now = time.perf_counter()
+        if not force and now - self.printed < self.interval:
+            return
+        self.printed = now
+        rate = self.rows_per_second
+        remaining = (self.total_rows - self.done_rows) / rate if rate else float("nan")
+        share = self.done_rows / self.total_rows * 100 if self.total_rows else 100.0
+        print(f"   {share:5.1f}%  {self.done_rows:>12,}/{self.total_rows:,} rows  "
+              f"{rate:>10,.0f} rows/s  ETA {remaining:6.1f}s", flush=True)
+
+
+def run(args) -> Dict[str, Any]:
+    """Score ``args.input`` into ``args.output``; returns the run summary"""
+    from model_handler import PurrPalTabularModel
+    from purrpal_common.worker_sizing import available_cpus
+
+    input_path = Path(args.input)
+    output_path = Path(args.output)
+    if not input_path.exists():
+        raise SystemExit(f"❌ Input not found: {input_path}")
+    input_format = file_format(input_path, args.input_format)
+    output_format = file_format(output_path, args.output_format)
+    filters = []
+    for item in args.filter:
+        column, separator, value = item.partition("=")
+        if not separator:
+            raise SystemExit(f"❌ Filters are COLUMN=VALUE, got '{item}'")
+        filters.append((column.strip(), value.strip()))
+
+    model = PurrPalTabularModel(args.models_dir, cache_size=0)
+    if model.feature_schema is None:
+        raise SystemExit("❌ Batch scoring needs a compiled feature schema")
+    planned = time.perf_counter()
+    if input_format == PARQUET_FORMAT:
+        header, chunks = plan_parquet(input_path)
+    else:
+        header, chunks = plan_csv(input_path, int(args.chunk_mb * 2 ** 20))
+    chunks = chunks or [Chunk(0, 0, 0, 0, 0)]  # An empty input still gets an (empty) output
+    extra = [column for column, _ in filters] + ([args.id_column] if args.id_column else [])
+    missing = [column for column in extra if column not in header]
+    if missing:
+        raise SystemExit(f"❌ Columns not in {input_path.name}: {missing}")
+    columns = used_columns(header, model.feature_schema, extra)
+    total_rows = sum(chunk.rows for chunk in chunks)
+    planned = time.perf_counter() - planned
+
+    stat = input_path.stat()
+    manifest = {
+        "version": CHECKPOINT_VERSION,
+        "input": str(input_path.resolve()),
+        "input_size": stat.st_size,
+        "input_mtime_ns": stat.st_mtime_ns,
+        "chunks": len(chunks),
+        "chunk_mb": args.chunk_mb if input_format == CSV_FORMAT else None,
+        "filters": [list(item) for item in filters],
+        "id_column": args.id_column,
+        "output_format": output_format,
+        "model": model.fingerprint(),
+    }
+    parts_dir = Path(str(output_path) + ".parts")
+    done = set(open_checkpoint(parts_dir, manifest, args.restart))
+    pending = [chunk for chunk in chunks if chunk.index not in done]
+    workers = max(1, min(args.workers or available_cpus(), len(pending) or 1))
+
+    print(f"📂 {input_path.name}: {total_rows:,} rows in {len(chunks)} chunks ({planned:.2f}s to plan)")
+    print(f"   Columns used: {', '.join(columns)}")
+    if done:
+        print(f"   Resuming: {len(done)} chunks already scored")
+    print(f"⚙️  Scoring with {workers} worker(s)")
+
+    settings = {
+        "models_dir": args.models_dir, "input": str(input_path), "input_format": input_format,
+        "header": header, "columns": columns, "filters": filters, "id_column": args.id_column,
+        "parts_dir": str(parts_dir), "output_format": output_format,
+    }
+    # Forked workers inherit the loaded model; spawned ones load their own in _init_worker
+    if "fork" in get_all_start_methods():
+        _worker["model"] = model
+        context = get_context("fork")
+    else:
+        context = get_context()
+
+    progress = Progress(total_rows, sum(chunk.rows for chunk in chunks if chunk.index in done))
+    totals = {"scored": 0, "failed": 0, "busy_seconds": 0.0}
+    started = time.perf_counter()
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # Stop like Ctrl+C, keeping finished parts
+    executor = ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(settings,))
+    queue = iter(pending)
+    futures = set()
+    try:
+        # A few chunks in flight per worker, so an interrupted run stops after the current ones
+        for chunk in itertools.islice(queue, 2 * workers):
+            futures.add(executor.submit(_score_chunk, chunk))
+        while futures:
+            finished, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                totals["scored"] += result["scored"]
+                totals["failed"] += result["failed"]
+                totals["busy_seconds"] += result["seconds"]
+                chunk = next(queue, None)
+                if chunk is not None:
+                    futures.add(executor.submit(_score_chunk, chunk))
+                progress.add(result["rows"], force=not futures)
+    except KeyboardInterrupt:
+        print("⏹️  Stopping after the chunks in progress...", flush=True)
+        executor.shutdown(cancel_futures=True)
+        raise SystemExit(f"❌ Interrupted; run the same command again to resume from {parts_dir}")
+    except Exception as e:
+        executor.shutdown(cancel_futures=True)
+        raise SystemExit(f"❌ {e}\n   Finished chunks are kept in {parts_dir}")
+    finally:
+        _worker.pop("model", None)
+    executor.shutdown()
+    seconds = time.perf_counter() - started
+
+    merge_parts(parts_dir, len(chunks), output_path, output_format)
+    if not args.keep_parts:
+        shutil.rmtree(parts_dir)
+
+    scored_rows = total_rows - progress.resumed_rows
+    return {
+        "rows": total_rows,
+        "resumed_rows": progress.resumed_rows,
+        "scored": totals["scored"],
+        "failed": totals["failed"],
+        "workers": workers,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(scored_rows / seconds, 1) if seconds else None,
+        "rows_per_worker_second": round(scored_rows / totals["busy_seconds"], 1) if totals["busy_seconds"] else None,
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet dataset with the tabular model")
+    parser.add_argument('input', help="Dataset file (.csv or .parquet)")
+    parser.add_argument('--output', required=True, help="Predictions file (.csv or .parquet)")
+    parser.add_argument('--models-dir', default='models', help="Directory containing model files")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: available CPUs)")
+    parser.add_argument('--chunk-mb', type=float, default=DEFAULT_CHUNK_MB, help="CSV chunk size in MB")
+    parser.add_argument('--filter', action='append', default=[], metavar='COLUMN=VALUE',
+                        help="Only score rows where COLUMN equals VALUE (repeatable)")
+    parser.add_argument('--id-column', default=None, help="Input column copied to the output")
+    parser.add_argument('--input-format', choices=[CSV_FORMAT, PARQUET_FORMAT], default=None)
+    parser.add_argument('--output-format', choices=[CSV_FORMAT, PARQUET_FORMAT], default=None)
+    parser.add_argument('--restart', action='store_true', help="Discard the checkpoint of an earlier run")
+    parser.add_argument('--keep-parts', action='store_true', help="Keep the per-chunk part files")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    summary = run(args)
+    print(f"✅ Predictions written to {args.output}")
+    print(f"   Scored:  {summary['scored']:,} rows ({summary['failed']:,} with errors)")
+    print(f"   Took:    {summary['seconds']:.2f}s, {summary['rows_per_second'] or 0:,.0f} rows/s "
+          f"({summary['rows_per_worker_second'] or 0:,.0f} rows/s per busy worker)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Incremental upload readers for the /predict/stream bulk scoring endpoint.
+
+Uploads are NDJSON (one PredictionRequest object per line) or CSV (a
+header row, then one flat row per submission), sent either as the raw
+request body or as the file part of a multipart/form-data upload. Bodies
+are consumed chunk by chunk as they arrive and split into lines, so memory
+is bounded by the chunk and line sizes whatever the upload size:
+
+    {"id": "a1", "cat_info": {"name": "Mochi", ...}, "questionnaire": {...}}
+
+    id,name,age,gender,weight,cough,fever,...
+    a1,Mochi,3 tahun,female,4.2,true,false,...
+
+CSV cells are mapped to the cat_info or questionnaire field of the same
+name; empty cells keep the field default and unknown columns are
+ignored. CSV records must fit on one line. An optional ``id`` (NDJSON key
+or CSV column) is echoed in the results.
+"""
+
+import csv
+from pathlib import PurePosixPath
+from typing import Any, AsyncIterator, Collection, Dict, List, Optional, Tuple
+
+import orjson
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+# Content types (raw bodies and multipart file parts) and file extensions per format
+FORMAT_TYPES = {
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "application/x-jsonlines": NDJSON,
+    "text/csv": CSV,
+    "application/csv": CSV,
+}
+FORMAT_EXTENSIONS = {".ndjson": NDJSON, ".jsonl": NDJSON, ".csv": CSV}
+
+UTF8_BOM = b"\xef\xbb\xbf"
+
+
+class UploadError(ValueError):
+    """Upload that cannot be read at all (unknown format, broken multipart body)"""
+
+
+def _format_of(content_type: Optional[bytes], filename: Optional[bytes] = None) -> Optional[str]:
+    if content_type:
+        media_type, _ = parse_options_header(content_type)
+        found = FORMAT_TYPES.get(media_type.decode("latin-1").lower())
+        if found:
+            return found
+    if filename:
+        return FORMAT_EXTENSIONS.get(PurePosixPath(filename.decode("utf-8", "replace")).suffix.lower())
+    return None
+
+
+class UploadReader:
+    """
+    Splits a streamed NDJSON or CSV upload into numbered lines.
+
+    ``format`` is known after construction for raw bodies and once the file
+    part's headers have been read for multipart uploads.
+    """
+
+    def __init__(self, content_type: Optional[str], format: Optional[str] = None, max_line_bytes: int = 65536):
+        """
+        Args:
+            content_type: Request Content-Type header
+            format: Explicit format ("ndjson" or "csv"), overriding the detected one
+            max_line_bytes: Longer lines are reported as errors and skipped
+
+        Raises:
+            UploadError: When the body type is neither a known format nor multipart
+        """
+        self.format = format
+        self.max_line_bytes = max_line_bytes
+        self.filename: Optional[str] = None
+
+        media_type, params = parse_options_header(content_type or "")
+        self.multipart = media_type == b"multipart/form-data"
+        if self.multipart:
+            if b"boundary" not in params:
+                raise UploadError("Multipart upload without a boundary")
+            self.boundary = params[b"boundary"]
+        elif self.format is None:
+            self.format = _format_of((content_type or "").encode("latin-1"))
+            if self.format is None:
+                raise UploadError(
+                    f"Unsupported upload type '{media_type.decode('latin-1')}', "
+                    f"expected one of {sorted(FORMAT_TYPES)} or multipart/form-data (or ?format=)"
+                )
+
+    async def lines(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+        """
+        Yield (line number, line) for every non-blank line, numbered from 1.
+
+        Overlong lines are yielded as (line number, None) and skipped.
+        """
+        body = self._file_data(chunks) if self.multipart else chunks
+        pending = bytearray()
+        number = 0
+        skipping = False
+
+        async for chunk in body:
+            start = 0
+            while True:
+                end = chunk.find(b"\n", start)
+                if not skipping:
+                    pending += chunk[start:] if end < 0 else chunk[start:end]
+                    if len(pending) > self.max_line_bytes:
+                        number += 1
+                        skipping = True
+                        pending.clear()
+                        yield number, None
+                if end < 0:
+                    break
+
+                if skipping:
+                    skipping = False  # The overlong line ends here
+                else:
+                    number += 1
+                    line = self._line(pending, number)
+                    pending.clear()
+                    if line is not None:
+                        yield number, line
+                start = end + 1
+
+        if pending and not skipping:
+            number += 1
+            line = self._line(pending, number)
+            if line is not None:
+                yield number, line
+
+    @staticmethod
+    def _line(pending: bytearray, number: int) -> Optional[bytes]:
+        line = bytes(pending).rstrip(b"\r")
+        if number == 1 and line.startswith(UTF8_BOM):
+            line = line[len(UTF8_BOM):]
+        return line if line.strip() else None
+
+    async def _file_data(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Data of the first multipart part that carries a filename, as it arrives"""
+        state = {"field": b"", "value": b"", "headers": {}, "in_file": False, "done": False}
+        output: List[bytes] = []
+
+        def on_part_begin():
+            state["headers"] = {}
+
+        def on_header_field(data, start, end):
+            state["field"] += data[start:end]
+
+        def on_header_value(data, start, end):
+            state["value"] += data[start:end]
+
+        def on_header_end():
+            state["headers"][state["field"].lower()] = state["value"]
+            state["field"], state["value"] = b"", b""
+
+        def on_headers_finished():
+            if state["done"]:
+                return
+            _, params = parse_options_header(state["headers"].get(b"content-disposition", b""))
+            filename = params.get(b"filename")
+            if filename is not None or params.get(b"name") == b"file":
+                state["in_file"] = True
+                self.filename = filename.decode("utf-8", "replace") if filename else None
+                if self.format is None:
+                    self.format = _format_of(state["headers"].get(b"content-type"), filename)
+                if self.format is None:
+                    raise UploadError("Cannot tell the uploaded file's format; use ?format=ndjson or ?format=csv")
+
+        def on_part_data(data, start, end):
+            if state["in_file"]:
+                output.append(data[start:end])
+
+        def on_part_end():
+            if state["in_file"]:
+                state["in_file"], state["done"] = False, True
+
+        parser = MultipartParser(self.boundary, {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        })
+
+        async for chunk in chunks:
+            try:
+                parser.write(chunk)
+            except UploadError:
+                raise
+            except Exception as e:
+                raise UploadError(f"Malformed multipart body: {e}")
+            if output:
+                yield b"".join(output)
+                output.clear()
+        parser.finalize()
+        if not state["done"]:
+            raise UploadError("Multipart upload has no file part")
+
+
+class NdjsonDecoder:
+    """One PredictionRequest object (plus optional "id") per line"""
+
+    def decode(self, line: bytes) -> Dict[str, Any]:
+        try:
+            item = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        if not isinstance(item, dict):
+            raise ValueError("Line must be a JSON object")
+        return item
+
+
+class CsvDecoder:
+    """Flat CSV rows mapped onto cat_info and questionnaire fields by column name"""
+
+    def __init__(self, cat_fields: Collection[str], questionnaire_fields: Collection[str]):
+        self.cat_fields = set(cat_fields)
+        self.questionnaire_fields = set(questionnaire_fields)
+        self.header: Optional[List[str]] = None
+        self.ignored_columns: List[str] = []
+
+    def decode(self, line: bytes) -> Optional[Dict[str, Any]]:
+        """Item for a data row, or None for the header row"""
+        try:
+            cells = next(csv.reader([line.decode("utf-8")]))
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise ValueError(f"Invalid CSV row: {e}")
+
+        if self.header is None:
+            self.header = [cell.strip() for cell in cells]
+            known = self.cat_fields | self.questionnaire_fields | {"id"}
+            self.ignored_columns = [name for name in self.header if name not in known]
+            return None
+
+        if len(cells) != len(self.header):
+            raise ValueError(f"Expected {len(self.header)} fields, got {len(cells)}")
+
+        item: Dict[str, Any] = {"cat_info": {}, "questionnaire": {}}
+        for name, value in zip(self.header, cells):
+            if value == "":
+                continue
+            if name in self.cat_fields:
+                item["cat_info"][name] = value
+            elif name in self.questionnaire_fields:
+                item["questionnaire"][name] = value
+            elif name == "id":
+                item["id"] = value
+        return item
@@ -0,0 +1,215 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Tuple
+
+# Human-readable labels of the questionnaire answers reported as active symptoms
+SYMPTOM_LABELS = {
+    'cough': 'Batuk',
+    'breathingDifficulty': 'Kesulitan bernapas',
+    'fever': 'Demam',
+    'discomfort': 'Terlihat tidak nyaman',
+    'appetiteLoss': 'Kehilangan nafsu makan',
+    'weightLoss': 'Penurunan berat badan',
+    'vomiting': 'Muntah',
+    'diarrhea': 'Diare',
+    'skinLesions': 'Luka pada kulit',
+    'nasalDischarge': 'Keluaran hidung',
+    'eyeDischarge': 'Keluaran mata',
+    'nightSweats': 'Dehidrasi',
+    'phlegmGreen': 'Bersin-bersin',
+    'phlegmBlood': 'Kehilangan nafsu makan',
+    'yellowPhlegm': 'Bersin-bersin',
+    'breathingSound': 'Gangguan pernapasan'
+}
+
+# Disease information mapping
+DISEASE_INFO = {
+    "Feline Calicivirus": {
+        "name": "Feline Calicivirus (FCV)",
+        "description": "Infeksi virus yang menyebabkan masalah pernapasan dan mulut",
+        "recommendations": [
+            "Berikan makanan yang mudah dicerna dan lembut",
+            "Pastikan kucing tetap terhidrasi dengan baik",
+            "Isolasi dari kucing lain untuk mencegah penyebaran",
+            "Konsultasi dengan dokter hewan untuk pengobatan antiviral",
+            "Jaga kebersihan area mata dan hidung"
+        ]
+    },
+    "Feline Herpesvirus": {
+        "name": "Feline Herpesvirus (FHV-1)",
+        "description": "Infeksi virus yang menyebabkan masalah pernapasan atas",
+        "recommendations": [
+            "Gunakan humidifier untuk mempermudah pernapasan",
+            "Bersihkan mata dan hidung secara teratur",
+            "Berikan makanan yang mengandung L-lysine",
+            "Isolasi dari kucing lain",
+            "Konsultasi dokter hewan untuk pengobatan supportif"
+        ]
+    },
+    "Feline Infectious Peritonitis": {
+        "name": "Feline Infectious Peritonitis (FIP)",
+        "description": "Penyakit serius yang disebabkan oleh coronavirus",
+        "recommendations": [
+            "SEGERA bawa ke dokter hewan - ini kondisi darurat",
+            "Berikan nutrisi yang baik dan suplemen",
+            "Jaga kucing tetap hangat dan nyaman",
+            "Monitor kondisi dengan ketat",
+            "Diskusikan pilihan pengobatan dengan dokter hewan"
+        ]
+    },
+    "Feline Leukemia Virus": {
+        "name": "Feline Leukemia Virus (FeLV)",
+        "description": "Virus yang menyerang sistem kekebalan tubuh",
+        "recommendations": [
+            "Tes darah untuk konfirmasi diagnosis",
+            "Isolasi dari kucing lain",
+            "Berikan makanan berkualitas tinggi",
+            "Pantau kesehatan secara rutin",
+            "Diskusikan rencana perawatan jangka panjang dengan dokter hewan"
+        ]
+    },
+    "Feline Panleukopenia": {
+        "name": "Feline Panleukopenia (Distemper Kucing)",
+        "description": "Infeksi virus yang sangat menular dan berbahaya",
+        "recommendations": [
+            "SEGERA bawa ke dokter hewan - kondisi darurat",
+            "Berikan cairan untuk mencegah dehidrasi",
+            "Isolasi total dari kucing lain",
+            "Desinfeksi area yang terkontaminasi",
+            "Monitor kondisi dengan sangat ketat"
+        ]
+    },
+    "Upper Respiratory Infection": {
+        "name": "Infeksi Saluran Pernapasan Atas",
+        "description": "Infeksi yang mempengaruhi hidung, tenggorokan, dan sinus",
+        "recommendations": [
+            "Pastikan kucing tetap hangat dan nyaman",
+            "Gunakan humidifier atau steam therapy",
+            "Bersihkan mata dan hidung secara teratur",
+            "Berikan makanan yang mudah dicium aromanya",
+            "Konsultasi dokter hewan jika gejala memburuk"
+        ]
+    }
+}
+
+DEFAULT_DESCRIPTION = "Kondisi kesehatan yang memerlukan perhatian"
+DEFAULT_RECOMMENDATIONS = ["Konsultasi dengan dokter hewan untuk diagnosis dan pengobatan yang tepat"]
+NO_SYMPTOMS_TEXT = 'Gejala umum yang tidak spesifik'
+
+# Confidence tiers as (label, minimum confidence), checked in order
+CONFIDENCE_TIERS = (("tinggi", 80), ("sedang", 60), ("rendah", float("-inf")))
+
+DISCLAIMER = (
+    "\n    \n    <br><br><strong>⚠️ Penting:</strong><br>\n"
+    "    • Hasil ini adalah prediksi AI dan bukan diagnosis medis resmi<br>\n"
+    "    • Segera konsultasi dengan dokter hewan untuk pemeriksaan lebih lanjut<br>\n"
+    "    • Jangan tunda jika gejala memburuk atau kucing terlihat sangat lemah\n    "
+)
+
+
+def confidence_tier(confidence: float) -> str:
+    """Tier label ("tinggi", "sedang" or "rendah") of a 0-100 confidence"""
+    for label, minimum in CONFIDENCE_TIERS:
+        if confidence >= minimum:
+            return label
+    return CONFIDENCE_TIERS[-1][0]
+
+
+class DiagnosisCatalog:
+    """
+    Diagnosis and recommendation texts, compiled once per disease and tier.
+
+    Each diagnosis is split into static fragments around the two per-request
+    values (the symptom list and the confidence), so rendering is a handful
+    of string concatenations. ``etag`` identifies the catalog content for
+    clients that cache ``body`` and only receive codes per prediction.
+    """
+
+    def __init__(self, class_names: List[str], disease_info: Dict[str, Dict[str, Any]] = None):
+        """
+        Args:
+            class_names: Model classes; diseases without an entry get a generic text
+            disease_info: Disease name -> {name, description, recommendations}
+        """
+        disease_info = DISEASE_INFO if disease_info is None else disease_info
+        self.class_names = [str(name) for name in class_names]
+        self.diseases = {
+            disease: disease_info.get(disease, {
+                "name": disease,
+                "description": DEFAULT_DESCRIPTION,
+                "recommendations": DEFAULT_RECOMMENDATIONS
+            })
+            for disease in self.class_names
+        }
+
+        self._templates: Dict[Tuple[str, str], Tuple[str, str, str]] = {}
+        self._recommendations: Dict[str, str] = {}
+        for disease, info in self.diseases.items():
+            self._compile(disease, info)
+
+        content = json.dumps(self.payload(include_etag=False), sort_keys=True, ensure_ascii=False)
+        self.etag = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+        # Serialized /catalog response, built once
+        self.body = json.dumps(self.payload(), ensure_ascii=False).encode('utf-8')
+
+    def _compile(self, disease: str, info: Dict[str, Any]):
+        """Precompile the recommendation text and the per-tier diagnosis fragments of one disease"""
+        head = (
+            "Berdasarkan analisis gejala yang diberikan, kucing Anda kemungkinan mengalami "
+            f"<strong>{info['name']}</strong>.\n    \n"
+            "    <br><br><strong>Deskripsi:</strong><br>\n"
+            f"    {info['description']}\n    \n"
+            "    <br><br><strong>Gejala yang terdeteksi:</strong><br>\n    "
+        )
+        middle = "\n    \n    <br><br><strong>Tingkat Keyakinan:</strong> "
+        for tier, _ in CONFIDENCE_TIERS:
+            self._templates[(disease, tier)] = (head, middle, f"% ({tier})")
+
+        recommendations = "<br>".join([f"• {rec}" for rec in info['recommendations']])
+        self._recommendations[disease] = (recommendations + DISCLAIMER).strip()
+
+    def render(self, disease: str, confidence: float, symptoms: List[str]) -> Tuple[str, str]:
+        """
+        Render the diagnosis and recommendation texts of one prediction.
+
+        Args:
+            disease: Predicted disease name
+            confidence: Prediction confidence (0-100)
+            symptoms: List of active symptom labels
+
+        Returns:
+            Tuple of (diagnosis_text, recommendations_text)
+        """
+        key = (disease, confidence_tier(confidence))
+        if key not in self._templates:
+            # Diseases outside the catalog's classes get the generic text, compiled on first use
+            self._compile(disease, {
+                "name": disease,
+                "description": DEFAULT_DESCRIPTION,
+                "recommendations": DEFAULT_RECOMMENDATIONS
+            })
+
+        head, middle, tail = self._templates[key]
+        symptom_text = ', '.join(symptoms) if symptoms else NO_SYMPTOMS_TEXT
+        diagnosis = f"{head}{symptom_text}{middle}{confidence:.1f}{tail}"
+        return diagnosis, self._recommendations[disease]
+
+    def disease_id(self, disease: str) -> int:
+        """Index of a disease in the catalog's class order (-1 if unknown)"""
+        try:
+            return self.class_names.index(disease)
+        except ValueError:
+            return -1
+
+    def payload(self, include_etag: bool = True) -> Dict[str, Any]:
+        """Catalog content served by the /catalog endpoint"""
+        payload = {
+            'classes': self.class_names,
+            'diseases': self.diseases,
+            'symptoms': SYMPTOM_LABELS,
+            'confidence_tiers': {label: minimum for label, minimum in CONFIDENCE_TIERS[:-1]},
+            'disclaimer': DISCLAIMER.strip()
+        }
+        if include_etag:
+            payload['version'] = self.etag
+        return payload
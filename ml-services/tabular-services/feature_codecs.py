@@ -0,0 +1,265 @@
+"""
+Feature block formats for bulk scoring (POST /predict/features).
+
+Bulk callers send the model's feature columns instead of nested
+CatInfo/QuestionnaireData objects. Bodies are decoded straight into an
+unscaled FeatureSchema block, without Python objects per row, and the
+predictions are encoded in the media type picked from the Accept header
+(the request's own type by default):
+
+    application/json                     {"Age": [...], "Fever": [...], ...}
+    application/msgpack                  the same map; a column may also be raw
+                                         little-endian float64 bytes
+    application/vnd.apache.arrow.stream  Arrow IPC stream, one column per feature
+    application/x-npy                    (rows, n_features) matrix in /schema order
+
+Column names and order are served by GET /schema. Missing vital columns
+take the CatInfo defaults and missing symptom columns are 0.
+
+Predictions come back as the columns predicted_disease, disease_id,
+confidence and one probability per class (percentages rounded to 0.1, as in
+/predict). An .npy response is only the (rows, n_classes) probability matrix.
+
+orjson, msgpack and pyarrow are imported on first use. Without orjson JSON
+falls back to the standard library; a format whose library is missing is
+refused (415) and never negotiated.
+"""
+
+import importlib
+import io
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from feature_schema import FeatureSchema
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+NPY = "application/x-npy"
+
+NPY_MAGIC = b"\x93NUMPY"
+
+# Accepted spellings -> canonical media type
+MEDIA_TYPES = {
+    JSON: JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    ARROW: ARROW,
+    NPY: NPY,
+}
+
+# Optional library each format needs
+FORMAT_MODULES = {MSGPACK: "msgpack", ARROW: "pyarrow"}
+
+_modules: Dict[str, Any] = {}
+
+
+class UnsupportedMediaType(ValueError):
+    """Request body type that cannot be decoded (HTTP 415)"""
+
+
+class NotAcceptable(ValueError):
+    """No acceptable response type can be produced (HTTP 406)"""
+
+
+def _import(name: str):
+    """Import an optional module once; None if it is not installed"""
+    if name not in _modules:
+        try:
+            _modules[name] = importlib.import_module(name)
+        except ImportError:
+            _modules[name] = None
+    return _modules[name]
+
+
+def available(media_type: str) -> bool:
+    """Whether the library for a canonical media type is installed"""
+    module = FORMAT_MODULES.get(media_type)
+    return module is None or _import(module) is not None
+
+
+def available_media_types() -> List[str]:
+    """Canonical media types this process can decode and encode"""
+    return [media_type for media_type in dict.fromkeys(MEDIA_TYPES.values()) if available(media_type)]
+
+
+def media_type(content_type: Optional[str]) -> str:
+    """
+    Canonical media type of a Content-Type header (JSON when absent)
+
+    Raises:
+        UnsupportedMediaType: For unknown types and formats whose library is missing
+    """
+    name = (content_type or JSON).split(";", 1)[0].strip().lower()
+    canonical = MEDIA_TYPES.get(name)
+    if canonical is None:
+        raise UnsupportedMediaType(f"Unsupported content type '{name}', expected one of {available_media_types()}")
+    if not available(canonical):
+        raise UnsupportedMediaType(f"'{name}' needs the {FORMAT_MODULES[canonical]} package")
+    return canonical
+
+
+def negotiate(accept: Optional[str], default: str) -> str:
+    """
+    Response media type for an Accept header
+
+    Types are tried by decreasing q-value (header order breaks ties); wildcards
+    and a missing header select ``default``.
+
+    Raises:
+        NotAcceptable: When no accepted type is available
+    """
+    if not accept:
+        return default
+
+    ranges = []
+    for position, part in enumerate(accept.split(",")):
+        name, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            ranges.append((-quality, position, name.lower()))
+
+    for _, _, name in sorted(ranges):
+        if name in ("*/*", "application/*"):
+            return default
+        canonical = MEDIA_TYPES.get(name)
+        if canonical is not None and available(canonical):
+            return canonical
+    raise NotAcceptable(f"Cannot respond with '{accept}', available: {available_media_types()}")
+
+
+def decode_block(body: bytes, media_type: str, schema: FeatureSchema) -> np.ndarray:
+    """
+    Decode a request body into an unscaled, checked feature block
+
+    Raises:
+        ValueError: On malformed bodies or invalid feature values
+    """
+    if media_type == NPY:
+        return schema.check_block(_load_npy(body))
+    return schema.block_from_columns(_COLUMN_DECODERS[media_type](body))
+
+
+def _load_npy(body: bytes) -> np.ndarray:
+    """Read a .npy matrix (a 1-D array is one row) as a writable float64 block"""
+    if not body.startswith(NPY_MAGIC):
+        raise ValueError("Body is not a .npy array")
+    try:
+        array = np.load(io.BytesIO(body), allow_pickle=False)
+    except (ValueError, OSError, EOFError) as e:
+        raise ValueError(f"Invalid .npy body: {e}")
+    if array.ndim == 1:
+        array = array[np.newaxis, :]
+    if array.dtype.kind not in "biuf":
+        raise ValueError(f"Unsupported .npy dtype {array.dtype}")
+    return np.require(array, dtype=np.float64, requirements=["C", "W"])
+
+
+def _decode_json(body: bytes) -> Dict[str, Any]:
+    orjson = _import("orjson")
+    try:
+        columns = orjson.loads(body) if orjson is not None else json.loads(body)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON body: {e}")
+    return _column_map(columns)
+
+
+def _decode_msgpack(body: bytes) -> Dict[str, Any]:
+    msgpack = _import("msgpack")
+    try:
+        columns = msgpack.unpackb(body, raw=False)
+    except Exception as e:
+        raise ValueError(f"Invalid MessagePack body: {type(e).__name__} {e}".rstrip())
+    columns = _column_map(columns)
+    for name, values in columns.items():
+        if isinstance(values, bytes):
+            if len(values) % 8:
+                raise ValueError(f"Binary column '{name}' is not a whole number of float64 values")
+            columns[name] = np.frombuffer(values, dtype="<f8")
+    return columns
+
+
+def _decode_arrow(body: bytes) -> Dict[str, Any]:
+    pyarrow = _import("pyarrow")
+    try:
+        table = pyarrow.ipc.open_stream(pyarrow.py_buffer(body)).read_all()
+    except pyarrow.ArrowException as e:
+        raise ValueError(f"Invalid Arrow IPC stream: {e}")
+    if len(set(table.column_names)) != len(table.column_names):
+        raise ValueError("Arrow stream has duplicate column names")
+    # Nulls become NaN and are rejected by FeatureSchema.check_block
+    return {
+        name: table.column(name).cast(pyarrow.float64()).to_numpy()
+        for name in table.column_names
+    }
+
+
+def _column_map(columns: Any) -> Dict[str, Any]:
+    if not isinstance(columns, dict):
+        raise ValueError("Body must be a map of feature name to column values")
+    return columns
+
+
+_COLUMN_DECODERS = {JSON: _decode_json, MSGPACK: _decode_msgpack, ARROW: _decode_arrow}
+
+
+def encode_predictions(media_type: str, probabilities: np.ndarray, class_names: List[str]) -> bytes:
+    """
+    Encode scored rows in a canonical media type
+
+    Args:
+        media_type: Response type from negotiate()
+        probabilities: Class probabilities of shape (n, n_classes), columns in class_names order
+        class_names: Class names of the model
+    """
+    percentages = np.round(probabilities * 100, 1)
+    if media_type == NPY:
+        buffer = io.BytesIO()
+        np.save(buffer, percentages, allow_pickle=False)
+        return buffer.getvalue()
+
+    disease_ids = np.argmax(probabilities, axis=1)
+    confidence = percentages.max(axis=1) if len(percentages) else np.empty(0)
+    predicted = np.asarray(class_names, dtype=object)[disease_ids]
+
+    if media_type == ARROW:
+        pyarrow = _import("pyarrow")
+        columns = [
+            pyarrow.array(predicted, type=pyarrow.string()),
+            pyarrow.array(disease_ids, type=pyarrow.int32()),
+            pyarrow.array(confidence),
+        ] + [pyarrow.array(percentages[:, i]) for i in range(len(class_names))]
+        batch = pyarrow.record_batch(columns, names=["predicted_disease", "disease_id", "confidence"] + list(class_names))
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+    payload = {
+        "total": len(percentages),
+        "class_names": list(class_names),
+        "predicted_disease": predicted.tolist(),
+        "disease_id": disease_ids,
+        "confidence": confidence,
+        "probabilities": percentages,
+    }
+    if media_type == MSGPACK:
+        return _import("msgpack").packb(_to_lists(payload))
+
+    orjson = _import("orjson")
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(_to_lists(payload)).encode()
+
+
+def _to_lists(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in payload.items()}
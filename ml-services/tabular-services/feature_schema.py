@@ -0,0 +1,257 @@
+import numpy as np
+from typing import Dict, List, Any, Iterable, Mapping, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Map questionnaire IDs to exact feature names that model expects
+QUESTIONNAIRE_MAPPING = {
+    'cough': 'Coughing',
+    'breathingDifficulty': 'Labored_Breathing',
+    'fever': 'Fever',
+    'discomfort': 'Lethargy',
+    'appetiteLoss': 'Appetite_Loss',  # Use underscore version
+    'weightLoss': 'Weight Loss',  # Use space version
+    'vomiting': 'Vomiting',
+    'diarrhea': 'Diarrhea',
+    'skinLesions': 'Skin_Lesions',  # Use underscore version
+    'nasalDischarge': 'Nasal_Discharge',  # Use underscore version
+    'eyeDischarge': 'Eye_Discharge',  # Use underscore version
+    'nightSweats': 'Dehydration',  # Map to Dehydration
+    'phlegmGreen': 'Sneezing',  # Map to Sneezing
+    'phlegmBlood': 'Loss of Appetite',  # Map to existing feature
+    'yellowPhlegm': 'Sneezing',  # Map to Sneezing (same as phlegmGreen)
+    'breathingSound': 'Labored_Breathing'  # Map to existing feature
+}
+
+# (feature name, cat_data key, default, cast) for the numeric cat fields
+NUMERIC_FIELDS = [
+    ('Age', 'age', 2, float),  # Default 2 years
+    ('Weight', 'weight', 4.0, float),  # Default 4kg
+    ('Body_Temperature', 'body_temperature', 38.5, float),  # Default normal temp
+    ('Duration_days', 'duration_days', 3, float),  # Default 3 days
+    ('Heart_Rate', 'heart_rate', 120, int),  # Default normal heart rate
+]
+
+GENDER_FEATURE = 'Gender_Male'
+
+
+class FeatureSchema:
+    """
+    Compiled feature layout of the fitted preprocessor.
+
+    Rows are written straight into NumPy arrays in the preprocessor's output
+    column order, and the StandardScaler step is applied with the same
+    float64 operations sklearn uses, so ``transform`` returns exactly what
+    ``preprocessor.transform(DataFrame)`` would.
+    """
+
+    def __init__(self, output_names: List[str], numeric_features: List[str],
+                 mean: np.ndarray, scale: np.ndarray):
+        """
+        Args:
+            output_names: Preprocessor output columns (``get_feature_names_out``)
+            numeric_features: Input columns handled by the StandardScaler
+            mean: Scaler ``mean_`` (or None when fitted with ``with_mean=False``)
+            scale: Scaler ``scale_`` (or None when fitted with ``with_std=False``)
+        """
+        self.output_names = [str(name) for name in output_names]
+        # Strip the ColumnTransformer prefixes ("num__", "remainder__")
+        self.feature_names = [name.split('__', 1)[-1] for name in self.output_names]
+        self.column_index = {name: i for i, name in enumerate(self.feature_names)}
+        self.n_features = len(self.feature_names)
+
+        self.numeric_index = np.array(
+            [self.column_index[name] for name in numeric_features], dtype=np.intp
+        )
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = None if scale is None else np.asarray(scale, dtype=np.float64)
+
+        missing = [name for name, _, _, _ in NUMERIC_FIELDS if name not in self.column_index]
+        missing += [name for name in QUESTIONNAIRE_MAPPING.values() if name not in self.column_index]
+        if GENDER_FEATURE not in self.column_index:
+            missing.append(GENDER_FEATURE)
+        if missing:
+            raise ValueError(f"Preprocessor is missing required columns: {sorted(set(missing))}")
+
+        # Precomputed slots so vectorizing a row is a handful of index writes
+        self.numeric_slots: List[Tuple[int, str, Any, type]] = [
+            (self.column_index[name], key, default, cast)
+            for name, key, default, cast in NUMERIC_FIELDS
+        ]
+        self.gender_index = self.column_index[GENDER_FEATURE]
+        self.questionnaire_index: Dict[str, int] = {
+            question_id: self.column_index[feature_name]
+            for question_id, feature_name in QUESTIONNAIRE_MAPPING.items()
+        }
+        # Caller-supplied blocks: vitals cast to int by vectorize, and 0/1 flag columns
+        self.int_index = np.array(
+            [self.column_index[name] for name, _, _, cast in NUMERIC_FIELDS if cast is int], dtype=np.intp
+        )
+        self.flag_index = np.setdiff1d(np.arange(self.n_features), self.numeric_index)
+        self.defaults = {name: cast(default) for name, _, default, cast in NUMERIC_FIELDS}
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor) -> 'FeatureSchema':
+        """
+        Compile the schema from a fitted ColumnTransformer.
+
+        Only the layout the training notebook produces is supported: one
+        StandardScaler over the numeric columns and a passthrough remainder.
+        Anything else raises ValueError so callers can keep the DataFrame path.
+        """
+        transformers = [
+            (name, transformer, columns)
+            for name, transformer, columns in getattr(preprocessor, 'transformers_', [])
+            if transformer != 'drop'
+        ]
+        scalers = [t for t in transformers if t[0] != 'remainder']
+        if len(scalers) != 1 or type(scalers[0][1]).__name__ != 'StandardScaler':
+            raise ValueError("Unsupported preprocessor layout: expected a single StandardScaler")
+        for name, transformer, _ in transformers:
+            if name == 'remainder' and not _is_passthrough(transformer):
+                raise ValueError("Unsupported preprocessor layout: remainder must be passthrough")
+
+        _, scaler, numeric_features = scalers[0]
+        return cls(
+            output_names=list(preprocessor.get_feature_names_out()),
+            numeric_features=list(numeric_features),
+            mean=scaler.mean_ if scaler.with_mean else None,
+            scale=scaler.scale_ if scaler.with_std else None,
+        )
+
+    def new_block(self, n_rows: int) -> np.ndarray:
+        """Allocate a zeroed feature block of ``n_rows`` rows"""
+        return np.zeros((n_rows, self.n_features), dtype=np.float64)
+
+    def vectorize(self, cat_data: Dict[str, Any], questionnaire_data: Dict[str, Any],
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Write one unscaled feature row.
+
+        Args:
+            cat_data: Dictionary containing cat information
+            questionnaire_data: Dictionary containing questionnaire answers
+            out: Optional zeroed row of length ``n_features`` to fill in place
+
+        Returns:
+            np.ndarray: The filled row
+        """
+        row = np.zeros(self.n_features, dtype=np.float64) if out is None else out
+
+        for index, key, default, cast in self.numeric_slots:
+            row[index] = cast(cat_data.get(key, default))
+
+        row[self.gender_index] = 1 if cat_data.get('gender', '').lower() == 'male' else 0
+
+        # Later answers win when two questions share a feature, as in the dict path
+        questionnaire_index = self.questionnaire_index
+        for question_id, answer in questionnaire_data.items():
+            index = questionnaire_index.get(question_id)
+            if index is not None:
+                row[index] = 1 if answer else 0
+
+        return row
+
+    def vectorize_many(self, records: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]]) -> np.ndarray:
+        """Vectorize ``(cat_data, questionnaire_data)`` pairs into one unscaled block"""
+        records = list(records)
+        block = self.new_block(len(records))
+        for row, (cat_data, questionnaire_data) in zip(block, records):
+            self.vectorize(cat_data, questionnaire_data, out=row)
+        return block
+
+    def block_from_columns(self, columns: Mapping[str, Any]) -> np.ndarray:
+        """
+        Build an unscaled block from feature columns (name -> sequence of values).
+
+        Missing vital columns take the CatInfo defaults and missing flag
+        columns are 0, as in ``vectorize``. The result is checked with
+        ``check_block``.
+        """
+        unknown = sorted(set(columns) - set(self.column_index))
+        if unknown:
+            raise ValueError(f"Unknown feature columns: {unknown}")
+
+        arrays = {}
+        for name, values in columns.items():
+            try:
+                arrays[name] = np.asarray(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                raise ValueError(f"Feature column '{name}' is not numeric")
+            if arrays[name].ndim != 1:
+                raise ValueError(f"Feature column '{name}' must be one-dimensional")
+
+        lengths = {len(values) for values in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError("Feature columns have different lengths")
+
+        block = self.new_block(lengths.pop() if lengths else 0)
+        for name, default in self.defaults.items():
+            block[:, self.column_index[name]] = default
+        for name, values in arrays.items():
+            block[:, self.column_index[name]] = values
+        return self.check_block(block)
+
+    def check_block(self, block: np.ndarray) -> np.ndarray:
+        """
+        Validate a caller-supplied unscaled block in place.
+
+        Rows must be finite and flag columns (symptoms, gender) 0 or 1, the
+        only values ``vectorize`` writes there. Integer vitals are truncated
+        like ``int()``.
+
+        Raises:
+            ValueError: On a wrong shape or invalid values
+        """
+        if block.ndim != 2 or block.shape[1] != self.n_features:
+            raise ValueError(f"Expected rows of {self.n_features} features, got shape {block.shape}")
+        if not np.isfinite(block).all():
+            raise ValueError("Feature values must be finite")
+
+        flags = block[:, self.flag_index]
+        invalid = ((flags != 0) & (flags != 1)).any(axis=0)
+        if invalid.any():
+            names = [self.feature_names[i] for i in self.flag_index[invalid]]
+            raise ValueError(f"Columns must be 0 or 1: {names}")
+
+        block[:, self.int_index] = np.trunc(block[:, self.int_index])
+        return block
+
+    def invalid_rows(self, block: np.ndarray) -> np.ndarray:
+        """Mask of the rows ``check_block`` would reject (non-finite values, flags other than 0/1)"""
+        flags = block[:, self.flag_index]
+        return ~np.isfinite(block).all(axis=1) | ((flags != 0) & (flags != 1)).any(axis=1)
+
+    def standardize(self, block: np.ndarray) -> np.ndarray:
+        """
+        Apply the StandardScaler step to an unscaled block in place.
+
+        Mirrors ``StandardScaler.transform`` (subtract ``mean_`` then divide
+        by ``scale_``) so the result is bit-identical to sklearn.
+        """
+        numeric = block[:, self.numeric_index]
+        if self.mean is not None:
+            numeric -= self.mean
+        if self.scale is not None:
+            numeric /= self.scale
+        block[:, self.numeric_index] = numeric
+        return block
+
+    def transform(self, cat_data: Dict[str, Any], questionnaire_data: Dict[str, Any]) -> np.ndarray:
+        """Vectorize and scale a single input into a ``(1, n_features)`` matrix"""
+        block = self.new_block(1)
+        self.vectorize(cat_data, questionnaire_data, out=block[0])
+        return self.standardize(block)
+
+
+def _is_passthrough(transformer) -> bool:
+    """Check whether a fitted remainder transformer leaves columns untouched"""
+    if transformer == 'passthrough':
+        return True
+    # sklearn >= 1.2 stores a fitted identity FunctionTransformer for passthrough
+    return (
+        type(transformer).__name__ == 'FunctionTransformer'
+        and getattr(transformer, 'func', None) is None
+        and getattr(transformer, 'inverse_func', None) is None
+    )
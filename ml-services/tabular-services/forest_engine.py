@@ -0,0 +1,398 @@
+import math
+import numpy as np
+from typing import Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Array names used by FlatForest.arrays() / FlatForest.from_arrays()
+FOREST_ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes')
+
+# Early-exit voting modes (see FlatForest.predict_proba_early)
+EARLY_EXIT_EXACT = "exact"  # Stop once no remaining tree can change the argmax
+EARLY_EXIT_BOUND = "bound"  # Also stop once the leader is ahead with confidence 1 - delta
+EARLY_EXIT_MODES = (EARLY_EXIT_EXACT, EARLY_EXIT_BOUND)
+
+# Margin the exact mode keeps over the remaining votes, far above the rounding of the sums
+EXACT_MARGIN = 1e-9
+
+# Rows per gather in FlatForest.contributions
+CONTRIBUTION_CHUNK_ROWS = 64
+
+
+class FlatForest:
+    """
+    Random forest flattened into contiguous NumPy arrays.
+
+    All trees share one node table (feature, threshold, left/right child and
+    normalized leaf value). Leaves point to themselves, so scoring is a fixed
+    number of vectorized steps over a (rows, trees) matrix of node indices,
+    with no per-tree Python work and no sklearn input validation.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, value: np.ndarray, roots: np.ndarray, classes: np.ndarray):
+        """
+        Args:
+            feature: Split feature per node (0 for leaves)
+            threshold: Split threshold per node; go left when x <= threshold
+            left: Global index of the left child (self for leaves)
+            right: Global index of the right child (self for leaves)
+            value: Normalized class distribution per node, shape (n_nodes, n_classes)
+            roots: Global index of each tree's root node
+            classes: Class labels in probability column order
+        """
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.classes = np.asarray(classes)
+        # Interleaved (right, left) children so one take() picks the next node
+        self._children = np.empty(2 * len(self.left), dtype=np.intp)
+        self._children[0::2] = self.right
+        self._children[1::2] = self.left
+        self.n_trees = len(self.roots)
+        self.n_classes = self.value.shape[1]
+        self.tree_depth = self._compute_tree_depths()
+        self.max_depth = int(self.tree_depth.max(initial=0))
+        # Largest and smallest leaf value per tree and class, bounding what a tree not yet evaluated can add
+        self._leaf_max, self._leaf_min = self._compute_leaf_bounds()
+        # Per-leaf sums of the contributions along its path, so attributions are a gather instead of a walk
+        self._leaf_index, self._leaf_paths = self._compute_leaf_paths()
+
+    @classmethod
+    def from_sklearn(cls, forest) -> 'FlatForest':
+        """
+        Flatten a fitted single-output sklearn forest classifier.
+
+        Raises:
+            ValueError: If the estimator is not a supported forest
+        """
+        estimators = getattr(forest, 'estimators_', None)
+        if not estimators or getattr(forest, 'n_outputs_', 1) != 1:
+            raise ValueError("Only fitted single-output forest classifiers can be flattened")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+
+            roots.append(offset)
+            offset += tree.node_count
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.array(roots),
+            classes=forest.classes_,
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'FlatForest':
+        """Rebuild a forest from the output of arrays()"""
+        return cls(**{name: arrays[name] for name in FOREST_ARRAYS})
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Return the node table as plain arrays (e.g. for serialization)"""
+        return {name: getattr(self, name) for name in FOREST_ARRAYS}
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def _tree_of_nodes(self) -> np.ndarray:
+        """Tree index of every node (trees occupy consecutive node ranges)"""
+        return np.repeat(np.arange(self.n_trees), np.diff(np.append(self.roots, self.n_nodes)))
+
+    def _compute_tree_depths(self) -> np.ndarray:
+        """Number of steps needed for each tree's root to reach its deepest leaf"""
+        depth = np.zeros(self.n_nodes, dtype=np.intp)
+        node = self.roots
+        level = 0
+        while len(node):
+            depth[node] = level
+            node = node[self.left[node] != node]
+            node = np.concatenate([self.left[node], self.right[node]])
+            level += 1
+        tree_depth = np.zeros(self.n_trees, dtype=np.intp)
+        np.maximum.at(tree_depth, self._tree_of_nodes(), depth)
+        return tree_depth
+
+    def _compute_leaf_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(max, min) leaf value per tree and class, each of shape (n_trees, n_classes)"""
+        is_leaf = (self.left == np.arange(self.n_nodes))[:, np.newaxis]
+        trees = self._tree_of_nodes()
+        leaf_max = np.full((self.n_trees, self.n_classes), -np.inf)
+        leaf_min = np.full((self.n_trees, self.n_classes), np.inf)
+        np.maximum.at(leaf_max, trees, np.where(is_leaf, self.value, -np.inf))
+        np.minimum.at(leaf_min, trees, np.where(is_leaf, self.value, np.inf))
+        return leaf_max, leaf_min
+
+    def _compute_leaf_paths(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tree-path contributions summed from each tree's root to every leaf.
+
+        Every split moves the class distribution from the node's to the
+        child's; the change is credited to the node's split feature.
+
+        Returns:
+            Tuple of (leaf number per node, -1 for internal nodes; summed
+            contributions of shape (n_classes, n_leaves, n_split_features))
+        """
+        n_features = int(self.feature.max(initial=0)) + 1
+        paths = np.zeros((self.n_nodes, n_features, self.n_classes))
+        node = self.roots
+        while len(node):
+            node = node[self.left[node] != node]
+            for child in (self.left[node], self.right[node]):
+                paths[child] = paths[node]
+                paths[child, self.feature[node]] += self.value[child] - self.value[node]
+            node = np.concatenate([self.left[node], self.right[node]])
+
+        leaves = np.flatnonzero(self.left == np.arange(self.n_nodes))
+        leaf_index = np.full(self.n_nodes, -1, dtype=np.intp)
+        leaf_index[leaves] = np.arange(len(leaves))
+        return leaf_index, np.ascontiguousarray(paths[leaves].transpose(2, 0, 1))
+
+    @staticmethod
+    def _flatten_rows(X: np.ndarray) -> Tuple[np.ndarray, int, int]:
+        """(flattened float64 features, rows, features) of a feature matrix"""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        n_rows, n_features = X.shape
+        return X.astype(np.float64).ravel(), n_rows, n_features
+
+    def _traverse(self, flat_X: np.ndarray, row_offset: np.ndarray, roots: np.ndarray, depth: int) -> np.ndarray:
+        """Leaves reached from ``roots`` by the rows starting at ``row_offset`` (a column vector)"""
+        node = np.repeat(roots[np.newaxis, :], len(row_offset), axis=0)
+        for _ in range(depth):
+            go_left = flat_X.take(row_offset + self.feature.take(node)) <= self.threshold.take(node)
+            node = self._children.take(2 * node + go_left)
+        return node
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """
+        Return the leaf reached in every tree.
+
+        Args:
+            X: Preprocessed feature matrix of shape (n_rows, n_features)
+
+        Returns:
+            np.ndarray: Global leaf indices of shape (n_rows, n_trees)
+        """
+        flat_X, n_rows, n_features = self._flatten_rows(X)
+        row_offset = (np.arange(n_rows) * n_features)[:, np.newaxis]
+        return self._traverse(flat_X, row_offset, self.roots, self.max_depth)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Average class probabilities over all trees.
+
+        Returns:
+            np.ndarray: Probabilities of shape (n_rows, n_classes)
+        """
+        leaves = self.apply(X)
+        # Reduce over the leading tree axis so trees are summed in order, as sklearn does
+        proba = self.value[leaves.T].sum(axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predict class labels"""
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def contributions(self, X: np.ndarray, classes: Optional[np.ndarray] = None
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Exact tree-path (Saabas) feature contributions, averaged over the trees.
+
+        Uses the path sums precomputed per leaf, so on top of the traversal
+        this is one gather of (rows, trees, features) values for a single
+        class per row. For every row, ``bias + contributions.sum(axis=1)``
+        equals the probability of its class up to rounding.
+
+        Args:
+            X: Preprocessed feature matrix of shape (n_rows, n_features)
+            classes: Probability column to explain per row (default: the argmax)
+
+        Returns:
+            Tuple of (probabilities of shape (n_rows, n_classes), bias (mean root
+            probability of the explained class) of shape (n_rows,), contributions
+            of shape (n_rows, n_features))
+        """
+        leaves = self.apply(X)
+        proba = self.value[leaves.T].sum(axis=0)
+        proba /= self.n_trees
+        if classes is None:
+            classes = np.argmax(proba, axis=1)
+
+        n_classes, n_leaves, n_split_features = self._leaf_paths.shape
+        index = np.asarray(classes, dtype=np.intp)[:, np.newaxis] * n_leaves + self._leaf_index.take(leaves)
+        paths = self._leaf_paths.reshape(-1, n_split_features)
+
+        contributions = np.zeros((len(leaves), np.shape(X)[-1]))
+        # Gather in chunks so the (rows, trees, features) intermediate stays cache-sized
+        for start in range(0, len(leaves), CONTRIBUTION_CHUNK_ROWS):
+            chunk = slice(start, start + CONTRIBUTION_CHUNK_ROWS)
+            contributions[chunk, :n_split_features] = paths.take(index[chunk], axis=0).sum(axis=1)
+        contributions /= self.n_trees
+        bias = self.value[self.roots].mean(axis=0).take(classes)
+        return proba, bias, contributions
+
+    def tree_order(self, X: np.ndarray) -> np.ndarray:
+        """
+        Trees ordered by how often they vote for the forest's class on ``X``.
+
+        Trees that agree with the forest most are evaluated first by
+        predict_proba_early, so the leader emerges after fewer trees.
+
+        Args:
+            X: Representative preprocessed rows (calibration traffic)
+        """
+        leaves = self.apply(X)
+        forest_class = np.argmax(self.value[leaves.T].sum(axis=0), axis=1)
+        agreement = (np.argmax(self.value[leaves], axis=2) == forest_class[:, np.newaxis]).mean(axis=0)
+        return np.argsort(-agreement, kind='stable')
+
+    def predict_proba_early(self, X: np.ndarray, mode: str = EARLY_EXIT_EXACT, order: Optional[np.ndarray] = None,
+                            step: int = 16, delta: float = 0.01) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Class probabilities from as few trees as the vote needs.
+
+        Trees are evaluated ``step`` at a time in ``order`` and rows leave as
+        soon as their vote is settled:
+
+        - exact: the leader's lowest possible total still beats every other
+          class's highest possible total over the remaining trees (bounded
+          by the trees' largest and smallest leaf values), so the predicted
+          class is always the full forest's.
+        - bound: additionally, the leader's average lead over the runner-up
+          exceeds a Hoeffding-Serfling bound, i.e. the full forest would
+          pick another class with probability below ``delta`` if the trees
+          were in random order.
+
+        Rows that leave early get the average over the trees they used, so
+        their probabilities (not their class, in exact mode) can differ from
+        predict_proba. Rows that need every tree get exactly predict_proba.
+        Each check costs about as much as a full pass over a single row, so
+        this pays off on blocks of rows, not on single rows.
+
+        Args:
+            X: Preprocessed feature matrix of shape (n_rows, n_features)
+            mode: "exact" or "bound"
+            order: Tree evaluation order (default: forest order)
+            step: Trees evaluated between checks
+            delta: Error probability allowed by the bound mode
+
+        Returns:
+            Tuple of (probabilities of shape (n_rows, n_classes), trees used per row)
+        """
+        order, checkpoints, rest_max, rest_min, bounds = self._early_exit_plan(mode, order, step, delta)
+        flat_X, n_rows, n_features = self._flatten_rows(X)
+
+        sums = np.zeros((n_rows, self.n_classes))
+        leaves = np.empty((n_rows, self.n_trees), dtype=np.intp)
+        trees_used = np.full(n_rows, self.n_trees, dtype=np.intp)
+        active = np.arange(n_rows)
+
+        start = 0
+        for done in checkpoints:
+            trees = order[start:done]
+            stage = self._traverse(
+                flat_X, (active * n_features)[:, np.newaxis], self.roots[trees], int(self.tree_depth[trees].max())
+            )
+            leaves[active, start:done] = stage
+            sums[active] += self.value[stage.T].sum(axis=0)
+            start = done
+            if done == self.n_trees:
+                break
+
+            current = sums[active]
+            rows = np.arange(len(active))
+            leader = np.argmax(current, axis=1)
+            leading = current[rows, leader]
+            others = current + rest_max[done]
+            others[rows, leader] = -np.inf
+            settled = leading + rest_min[done][leader] > others.max(axis=1) + EXACT_MARGIN
+            if bounds is not None:
+                current[rows, leader] = -np.inf
+                settled |= (leading - current.max(axis=1)) / done > bounds[done]
+
+            trees_used[active[settled]] = done
+            active = active[~settled]
+            if not len(active):
+                break
+
+        proba = sums / trees_used[:, np.newaxis]
+        full = np.flatnonzero(trees_used == self.n_trees)
+        if len(full):
+            # Sum in forest order, exactly as predict_proba does
+            in_forest_order = leaves[full][:, np.argsort(order, kind='stable')]
+            proba[full] = self.value[in_forest_order.T].sum(axis=0) / self.n_trees
+        return proba, trees_used
+
+    def _early_exit_plan(self, mode: str, order: Optional[np.ndarray], step: int, delta: float):
+        """
+        (order, checkpoints, rest_max, rest_min, bounds) for predict_proba_early, cached per configuration
+
+        rest_max[k] / rest_min[k] bound what each class can still gain from the
+        trees after position k; checkpoints skip positions where no row could
+        settle yet, so the first stage is as large as the vote requires.
+        """
+        if mode not in EARLY_EXIT_MODES:
+            raise ValueError(f"Unknown early-exit mode '{mode}', expected one of {EARLY_EXIT_MODES}")
+        order = np.arange(self.n_trees) if order is None else np.asarray(order, dtype=np.intp)
+        key = (mode, order.tobytes(), step, delta)
+        plans = self.__dict__.setdefault('_early_exit_plans', {})
+        if key in plans:
+            return plans[key]
+        if sorted(order.tolist()) != list(range(self.n_trees)):
+            raise ValueError("Tree order must be a permutation of the trees")
+
+        rest_max = np.zeros((self.n_trees + 1, self.n_classes))
+        rest_min = np.zeros((self.n_trees + 1, self.n_classes))
+        rest_max[:-1] = np.cumsum(self._leaf_max[order][::-1], axis=0)[::-1]
+        rest_min[:-1] = np.cumsum(self._leaf_min[order][::-1], axis=0)[::-1]
+        done_max = np.zeros((self.n_trees + 1, self.n_classes))
+        done_max[1:] = np.cumsum(self._leaf_max[order], axis=0)
+
+        # A class can lead at position k only up to its largest possible total, with the others at 0
+        reachable = done_max + rest_min
+        possible = np.zeros(self.n_trees + 1, dtype=bool)
+        for leader in range(self.n_classes):
+            others = np.delete(rest_max, leader, axis=1).max(axis=1, initial=0.0)
+            possible |= reachable[:, leader] > others + EXACT_MARGIN
+
+        bounds = None
+        if mode == EARLY_EXIT_BOUND:
+            # Difference of two per-tree values lies in [-1, 1]: range 2
+            done = np.arange(1, self.n_trees + 1)
+            log_term = math.log(max(self.n_classes - 1, 1) / delta)
+            bounds = np.full(self.n_trees + 1, np.inf)
+            bounds[1:] = 2 * np.sqrt((1 - (done - 1) / self.n_trees) * log_term / (2 * done))
+            possible |= bounds < 1.0
+
+        first = max(step, int(np.argmax(possible)) if possible.any() else self.n_trees)
+        checkpoints = list(range(first, self.n_trees, step)) + [self.n_trees]
+        plans[key] = plan = (order, checkpoints, rest_max, rest_min, bounds)
+        return plan
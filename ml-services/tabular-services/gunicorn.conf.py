@@ -0,0 +1,65 @@
+"""
+Gunicorn settings for production serving of the tabular service.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app and the model are loaded once in the master process and the
+uvicorn workers are forked from it, so they share the model arrays
+copy-on-write. Workers and per-worker threads follow the container's CPU
+quota (see purrpal_common/worker_sizing.py), and workers are recycled gracefully after
+MAX_REQUESTS requests.
+
+Configuration (environment variables):
+    PORT                  Listen port (default 8080)
+    WEB_CONCURRENCY       Worker processes (default: one per available CPU)
+    WORKER_THREADS        BLAS/inference threads per worker (default: CPUs / workers)
+    MAX_REQUESTS          Requests before a worker is replaced (default 200000, 0 = never)
+    GRACEFUL_TIMEOUT      Seconds a stopping worker may finish requests (default 30)
+    PRELOAD_APP           0 imports the app in every worker instead (no sharing)
+"""
+
+import gc
+import os
+
+from purrpal_common.worker_sizing import limit_native_threads, worker_plan
+
+workers, worker_threads = worker_plan()
+
+# Before the app (and numpy) is imported by preload_app
+limit_native_threads(worker_threads)
+os.environ.setdefault("INFERENCE_WORKERS", str(worker_threads))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("PRELOAD_APP", "1") == "1"
+
+# Recycle workers (staggered by the jitter) to bound slow memory growth
+max_requests = int(os.environ.get("MAX_REQUESTS", 200000))
+max_requests_jitter = max_requests // 10
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+timeout = 60
+keepalive = 5
+
+# Logging goes through structured_logging; keep gunicorn's own messages on stderr
+accesslog = None
+errorlog = "-"
+
+
+def on_starting(server):
+    """Load the model in the master so every forked worker shares it"""
+    if not server.cfg.preload_app:
+        return
+    import app
+
+    app.load_model_handler()
+    # Objects that exist now are never collected; keeps the GC from writing to shared pages
+    gc.collect()
+    gc.freeze()
+    server.log.info("Model preloaded, forking %d workers with %d threads each", workers, worker_threads)
+
+
+def post_fork(server, worker):
+    """The background log writer thread does not survive the fork; start one per worker"""
+    from purrpal_common.structured_logging import setup_logging
+
+    setup_logging("tabular")
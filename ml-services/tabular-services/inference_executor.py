@@ -0,0 +1,211 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from purrpal_common.worker_sizing import available_cpus
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class ExecutorOverloaded(Exception):
+    """Raised when the submission queue is full"""
+
+
+# Model instance of a process-pool worker (set by _init_worker)
+_worker_model = None
+
+
+def _init_worker(model_factory: Callable[[], Any]):
+    global _worker_model
+    _worker_model = model_factory()
+
+
+def _versioned(model: Any, version: Optional[str]) -> Any:
+    """The model to call: ``model`` itself, or the ``version`` it holds when it is a ModelRegistry"""
+    return model if version is None else model.get(version)
+
+
+def _call_worker_model(method: str, args: tuple, version: Optional[str] = None):
+    return getattr(_versioned(_worker_model, version), method)(*args)
+
+
+class InferenceExecutor:
+    """
+    Runs model calls off the asyncio event loop.
+
+    Thread mode shares the service's model instance; process mode loads one
+    model per worker through ``model_factory``. Either may be a ModelRegistry,
+    in which case calls name the version to run on. Submissions beyond
+    ``workers + max_queue`` outstanding calls are rejected with
+    ExecutorOverloaded, and calls that exceed ``timeout`` are cancelled.
+    """
+
+    def __init__(self, model: Any = None, model_factory: Callable[[], Any] = None,
+                 kind: str = "thread", workers: int = None, max_queue: int = 256,
+                 timeout: Optional[float] = 30.0):
+        """
+        Args:
+            model: Model instance used by thread workers
+            model_factory: Picklable callable creating a model in each process worker
+            kind: "thread" or "process"
+            workers: Pool size (defaults to available_cpus())
+            max_queue: Calls allowed to wait for a free worker
+            timeout: Default per-call timeout in seconds (None = no timeout)
+        """
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind '{kind}', expected one of {EXECUTOR_KINDS}")
+        if kind == "thread" and model is None:
+            raise ValueError("Thread executor needs a model instance")
+        if kind == "process" and model_factory is None:
+            raise ValueError("Process executor needs a model factory")
+
+        self.kind = kind
+        self.model = model
+        self.workers = workers or available_cpus()
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = self._create_pool(model_factory)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.max_queue_depth = 0
+        self._started = 0
+        self._queue_wait_total = 0.0
+
+        logger.info(f"Inference executor ready: {self.workers} {kind} workers, queue limit {max_queue}")
+
+    @classmethod
+    def from_env(cls, model: Any = None, model_factory: Callable[[], Any] = None) -> "InferenceExecutor":
+        """Create an executor configured by the INFERENCE_* environment variables"""
+        workers = os.environ.get("INFERENCE_WORKERS")
+        timeout = os.environ.get("INFERENCE_TIMEOUT", "30")
+        return cls(
+            model=model,
+            model_factory=model_factory,
+            kind=os.environ.get("INFERENCE_EXECUTOR", "thread"),
+            workers=int(workers) if workers else None,
+            max_queue=int(os.environ.get("INFERENCE_MAX_QUEUE", 256)),
+            timeout=float(timeout) if timeout else None,
+        )
+
+    def _create_pool(self, model_factory) -> Executor:
+        if self.kind == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        # spawn: forking a process that already runs an event loop and threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_factory,),
+        )
+
+    def _run_in_worker(self, method: str, args: tuple, version: Optional[str], enqueued_at: float):
+        """Executed on a pool thread (thread mode only)"""
+        with self._lock:
+            self._running += 1
+            self._started += 1
+            self._queue_wait_total += time.perf_counter() - enqueued_at
+        try:
+            return getattr(_versioned(self.model, version), method)(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    async def call(self, method: str, *args, version: Optional[str] = None,
+                   timeout: Optional[float] = None) -> Any:
+        """
+        Call ``model.<method>(*args)`` on a worker and await the result.
+
+        With a ``version``, the model is a ModelRegistry and the call runs on
+        that version (loaded by the worker if it does not hold it yet).
+
+        Raises:
+            ExecutorOverloaded: If the submission queue is full
+            asyncio.TimeoutError: If the call did not finish in time
+        """
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorOverloaded(
+                    f"Inference queue full ({self._in_flight} calls in flight)"
+                )
+            self._in_flight += 1
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._in_flight - self.workers)
+
+        try:
+            if self.kind == "thread":
+                # Carry the request context (id, stage timings) into the worker thread
+                future = self._pool.submit(
+                    contextvars.copy_context().run, self._run_in_worker, method, args, version, time.perf_counter()
+                )
+            else:
+                future = self._pool.submit(_call_worker_model, method, args, version)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(self._on_done)
+
+        # Cancelling the awaiting task (timeout or client disconnect) cancels the
+        # pool future too, which drops the call if it has not started yet
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout=self.timeout if timeout is None else timeout
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise
+
+    def _on_done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if future.cancelled():
+                self.cancelled += 1
+            elif future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue-depth and outcome counters for the /health endpoint"""
+        with self._lock:
+            return {
+                'kind': self.kind,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'timeout_seconds': self.timeout,
+                'in_flight': self._in_flight,
+                'running': self._running if self.kind == "thread" else None,
+                'queue_depth': max(0, self._in_flight - self.workers),
+                'max_queue_depth': self.max_queue_depth,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'cancelled': self.cancelled,
+                'avg_queue_wait_ms': (
+                    round(self._queue_wait_total / self._started * 1000, 3) if self._started else None
+                )
+            }
+
+    def shutdown(self):
+        """Stop accepting work and drop calls that have not started"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Exhaustive lookup table for default-vitals questionnaires.
+
+Requests that leave weight, body temperature, duration and heart rate at
+their CatInfo defaults only vary in the questionnaire symptoms, gender and
+a whole-number age. This module enumerates that space, scores it in bulk
+and stores the probabilities in a memory-mapped .npy table indexed by a
+bit-packed key:
+
+    key = (age - age_min) << (n_symptoms + 1) | gender << n_symptoms | symptom bits
+
+Usage:
+    python lookup_table.py --output models/purrpal_symptoms_lookup.npy
+"""
+
+import argparse
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import numpy as np
+from feature_schema import FeatureSchema, QUESTIONNAIRE_MAPPING, NUMERIC_FIELDS
+
+logger = logging.getLogger(__name__)
+
+TABLE_VERSION = 1
+DEFAULT_AGE_RANGE = (0, 20)
+
+
+def symptom_features() -> List[str]:
+    """Distinct features set by the questionnaire, in mapping order"""
+    return list(dict.fromkeys(QUESTIONNAIRE_MAPPING.values()))
+
+
+def default_vitals() -> Dict[str, float]:
+    """Feature values written by FeatureSchema.vectorize when the vitals are defaults"""
+    return {name: float(cast(default)) for name, _, default, cast in NUMERIC_FIELDS if name != 'Age'}
+
+
+class LookupTable:
+    """Memory-mapped probability table for default-vitals inputs"""
+
+    def __init__(self, table: np.ndarray, meta: Dict[str, Any], schema: FeatureSchema):
+        """
+        Args:
+            table: Probabilities of shape (n_keys, n_classes), usually a read-only memmap
+            meta: Table metadata (see build())
+            schema: Feature schema of the model the table was built for
+        """
+        self.table = table
+        self.meta = meta
+        self.age_min = int(meta['age_min'])
+        self.age_max = int(meta['age_max'])
+
+        self.symptom_index = np.array(
+            [schema.column_index[name] for name in meta['symptom_features']], dtype=np.intp
+        )
+        self.n_symptoms = len(self.symptom_index)
+        self.gender_index = schema.gender_index
+        self.age_index = schema.column_index['Age']
+        self.vital_index = np.array(
+            [schema.column_index[name] for name in meta['vitals']], dtype=np.intp
+        )
+        self.vital_values = np.array(list(meta['vitals'].values()), dtype=np.float64)
+
+        # Every other column must stay zero for a row to be in the table
+        used = set(self.symptom_index) | set(self.vital_index) | {self.gender_index, self.age_index}
+        self.zero_index = np.array(
+            [i for i in range(schema.n_features) if i not in used], dtype=np.intp
+        )
+        self.symptom_weights = np.left_shift(1, np.arange(self.n_symptoms, dtype=np.int64))
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def n_keys(self) -> int:
+        return (self.age_max - self.age_min + 1) << (self.n_symptoms + 1)
+
+    @classmethod
+    def build(cls, schema: FeatureSchema, predict_proba: Callable[[np.ndarray], np.ndarray],
+              class_names: List[str], fingerprint: str, path: str,
+              age_range=DEFAULT_AGE_RANGE, dtype: str = 'float64',
+              chunk_size: int = 65536) -> 'LookupTable':
+        """
+        Enumerate and score every default-vitals input and write the table to disk.
+
+        Args:
+            schema: Feature schema of the model
+            predict_proba: Scorer taking a standardized feature block
+            class_names: Class labels in probability column order
+            fingerprint: Identifier of the model the table belongs to
+            path: Output .npy path (metadata is written next to it as .json)
+            age_range: Inclusive (min, max) whole-number ages to cover
+            dtype: Storage dtype, float64 (exact) or float32 (half the size)
+            chunk_size: Rows scored per model call
+        """
+        started = time.perf_counter()
+        path = Path(path)
+        age_min, age_max = int(age_range[0]), int(age_range[1])
+        meta = {
+            'version': TABLE_VERSION,
+            'fingerprint': fingerprint,
+            'age_min': age_min,
+            'age_max': age_max,
+            'symptom_features': symptom_features(),
+            'vitals': default_vitals(),
+            'class_names': [str(name) for name in class_names],
+            'dtype': dtype,
+        }
+        lookup = cls(np.empty((0, len(class_names))), meta, schema)
+
+        table = np.lib.format.open_memmap(
+            path, mode='w+', dtype=np.dtype(dtype), shape=(lookup.n_keys, len(class_names))
+        )
+        for start in range(0, lookup.n_keys, chunk_size):
+            keys = np.arange(start, min(start + chunk_size, lookup.n_keys), dtype=np.int64)
+            block = lookup.decode(keys, schema)
+            table[start:start + len(keys)] = predict_proba(schema.standardize(block))
+        table.flush()
+        del table
+
+        meta['build_seconds'] = round(time.perf_counter() - started, 3)
+        meta['size_bytes'] = path.stat().st_size
+        meta['entries'] = lookup.n_keys
+        _meta_path(path).write_text(json.dumps(meta, indent=2))
+
+        logger.info(
+            f"Lookup table built: {meta['entries']} entries, "
+            f"{meta['size_bytes'] / 1e6:.1f} MB in {meta['build_seconds']:.2f}s -> {path}"
+        )
+        return cls.load(path, schema, fingerprint)
+
+    @classmethod
+    def load(cls, path: str, schema: FeatureSchema, fingerprint: str) -> 'LookupTable':
+        """
+        Memory-map a table built by build().
+
+        Raises:
+            FileNotFoundError: If the table or its metadata is missing
+            ValueError: If the table was built for a different model or format
+        """
+        path = Path(path)
+        meta = json.loads(_meta_path(path).read_text())
+        if meta.get('version') != TABLE_VERSION:
+            raise ValueError(f"Unsupported lookup table version: {meta.get('version')}")
+        if meta.get('fingerprint') != fingerprint:
+            raise ValueError("Lookup table was built for a different model")
+        if meta.get('symptom_features') != symptom_features() or meta.get('vitals') != default_vitals():
+            raise ValueError("Lookup table was built for a different feature mapping")
+
+        table = np.load(path, mmap_mode='r')
+        lookup = cls(table, meta, schema)
+        if table.shape != (lookup.n_keys, len(meta['class_names'])):
+            raise ValueError(f"Lookup table has unexpected shape {table.shape}")
+        return lookup
+
+    def decode(self, keys: np.ndarray, schema: FeatureSchema) -> np.ndarray:
+        """Unscaled feature rows for an array of keys"""
+        block = schema.new_block(len(keys))
+        block[:, self.symptom_index] = (keys[:, np.newaxis] >> np.arange(self.n_symptoms)) & 1
+        block[:, self.gender_index] = (keys >> self.n_symptoms) & 1
+        block[:, self.age_index] = self.age_min + (keys >> (self.n_symptoms + 1))
+        block[:, self.vital_index] = self.vital_values
+        return block
+
+    def lookup(self, block: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """
+        Fill probabilities for the rows of an unscaled block that are in the table.
+
+        Args:
+            block: Unscaled feature block from FeatureSchema.vectorize
+            out: Probability matrix; rows of matching inputs are overwritten
+
+        Returns:
+            np.ndarray: Boolean mask of the rows that were found
+        """
+        age = block[:, self.age_index]
+        found = (
+            (block[:, self.vital_index] == self.vital_values).all(axis=1)
+            & (block[:, self.zero_index] == 0).all(axis=1)
+            & (age >= self.age_min) & (age <= self.age_max) & (age == np.floor(age))
+        )
+        if found.any():
+            rows = block[found]
+            keys = (
+                (rows[:, self.symptom_index] != 0).astype(np.int64) @ self.symptom_weights
+                | (rows[:, self.gender_index] != 0).astype(np.int64) << self.n_symptoms
+                | (rows[:, self.age_index].astype(np.int64) - self.age_min) << (self.n_symptoms + 1)
+            )
+            out[found] = self.table[keys]
+
+        n_found = int(found.sum())
+        self.hits += n_found
+        self.misses += len(found) - n_found
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        """Table size and hit counters for the /health endpoint"""
+        return {
+            'entries': self.n_keys,
+            'size_bytes': self.meta.get('size_bytes'),
+            'build_seconds': self.meta.get('build_seconds'),
+            'age_range': [self.age_min, self.age_max],
+            'dtype': self.meta.get('dtype'),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+def _meta_path(path: Path) -> Path:
+    return path.with_suffix('.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the default-vitals lookup table")
+    parser.add_argument('--models-dir', default='models', help="Directory containing model files")
+    parser.add_argument('--output', default='models/purrpal_symptoms_lookup.npy', help="Output .npy path")
+    parser.add_argument('--age-min', type=int, default=DEFAULT_AGE_RANGE[0])
+    parser.add_argument('--age-max', type=int, default=DEFAULT_AGE_RANGE[1])
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64')
+    args = parser.parse_args()
+
+    from model_handler import PurrPalTabularModel
+
+    model = PurrPalTabularModel(args.models_dir, cache_size=0)
+    if model.feature_schema is None:
+        raise SystemExit("❌ Preprocessor layout not supported, cannot build a lookup table")
+
+    table = LookupTable.build(
+        model.feature_schema, model.predict_proba, list(model.class_names), model.fingerprint(),
+        args.output, age_range=(args.age_min, args.age_max), dtype=args.dtype
+    )
+    stats = table.stats()
+    print(f"✅ Lookup table written to {args.output}")
+    print(f"   Entries:    {stats['entries']}")
+    print(f"   Size:       {stats['size_bytes'] / 1e6:.1f} MB")
+    print(f"   Build time: {stats['build_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
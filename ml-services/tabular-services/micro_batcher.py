@@ -0,0 +1,145 @@
+import asyncio
+import bisect
+import contextvars
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into one batch call.
+
+    Items wait at most ``max_wait_ms`` (or until ``max_batch`` items are
+    pending), then the whole batch goes through ``run_batch`` and each result
+    is routed back to the request that submitted it. Several batches can be
+    in flight at once, so a slow batch does not hold up the next window.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_wait_ms: float = 2.0, max_batch: int = 64):
+        """
+        Args:
+            run_batch: Coroutine function scoring a list of items, returning results in order
+            max_wait_ms: Longest time the first item of a batch waits for company
+            max_batch: Flush as soon as this many items are pending
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.run_batch = run_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+
+        self._pending: List[tuple] = []  # (item, future, enqueued_at)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        self.batches = 0
+        self.items = 0
+        self.failed_batches = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    @classmethod
+    def from_env(cls, run_batch) -> Optional["MicroBatcher"]:
+        """Create a batcher from the MICRO_BATCH_* env variables, or None when disabled (max wait 0)"""
+        max_wait_ms = float(os.environ.get("MICRO_BATCH_MAX_WAIT_MS", 0))
+        if max_wait_ms <= 0:
+            return None
+        return cls(run_batch, max_wait_ms=max_wait_ms,
+                   max_batch=int(os.environ.get("MICRO_BATCH_MAX_SIZE", 64)))
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush, context=contextvars.Context())
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = self._pending[:self.max_batch]
+        self._pending = self._pending[self.max_batch:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_wait, self._flush, context=contextvars.Context()
+            )
+
+        # Requests cancelled while waiting (e.g. client gone) are not scored
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            wait = now - enqueued_at
+            self.queue_wait_total += wait
+            self.queue_wait_max = max(self.queue_wait_max, wait)
+        self.batches += 1
+        self.items += len(batch)
+        self.batch_size_counts[bisect.bisect_left(BATCH_SIZE_BUCKETS, len(batch))] += 1
+
+        # A batch serves many requests, so it runs outside any one request's context
+        # (Context.run rather than create_task(context=), which needs Python 3.11)
+        coroutine = self._run(batch)
+        try:
+            task = contextvars.Context().run(asyncio.get_running_loop().create_task, coroutine)
+        except BaseException as e:
+            coroutine.close()
+            self.failed_batches += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[tuple]):
+        try:
+            results = await self.run_batch([item for item, _, _ in batch])
+        except BaseException as e:
+            self.failed_batches += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch-size distribution and added queueing latency for the /health endpoint"""
+        labels = [f"<={bound}" for bound in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+        return {
+            'max_wait_ms': self.max_wait * 1000,
+            'max_batch': self.max_batch,
+            'pending': len(self._pending),
+            'batches': self.batches,
+            'items': self.items,
+            'failed_batches': self.failed_batches,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'batch_size_histogram': dict(zip(labels, self.batch_size_counts)),
+            'avg_queue_wait_ms': round(self.queue_wait_total / self.items * 1000, 3) if self.items else 0.0,
+            'max_queue_wait_ms': round(self.queue_wait_max * 1000, 3)
+        }
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Precompiled model bundle for fast cold starts.
+
+Compiles the joblib model, preprocessor parameters and class names into a
+single versioned file that serving can memory-map with only NumPy:
+
+    MAGIC (8 bytes) | format version, header length (<II) | JSON header | padding | arrays
+
+Every array starts on a 64-byte boundary and is read with np.frombuffer
+straight from the mapping, so loading copies nothing.
+
+Usage:
+    python model_bundle.py --models-dir models --output models/purrpal_symptoms_rf.bundle
+"""
+
+import argparse
+import json
+import mmap
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+import numpy as np
+
+MAGIC = b"PURRPAL\x00"
+BUNDLE_FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<II")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_bundle(path: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+    """
+    Write arrays and metadata to a bundle file.
+
+    Args:
+        path: Output file path
+        arrays: Named arrays (numeric or fixed-width string dtypes only)
+        meta: JSON-serializable metadata
+    """
+    entries = {}
+    offset = 0
+    contiguous = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise ValueError(f"Array '{name}' has object dtype and cannot be bundled")
+        offset = _align(offset)
+        entries[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        contiguous[name] = array
+        offset += array.nbytes
+
+    header = json.dumps({'meta': meta, 'arrays': entries}).encode('utf-8')
+    data_start = _align(len(MAGIC) + _PREAMBLE.size + len(header))
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_PREAMBLE.pack(BUNDLE_FORMAT_VERSION, len(header)))
+        f.write(header)
+        for name, array in contiguous.items():
+            f.seek(data_start + entries[name]['offset'])
+            f.write(array.tobytes())
+    # Atomic replace so a serving process never maps a half-written bundle
+    tmp_path.replace(path)
+
+
+def read_bundle(path: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Memory-map a bundle.
+
+    Returns:
+        Tuple of (metadata, read-only arrays backed by the mapping)
+
+    Raises:
+        ValueError: If the file is not a bundle or has an unsupported version
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mapped[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"Not a PurrPal model bundle: {path}")
+    version, header_length = _PREAMBLE.unpack_from(mapped, len(MAGIC))
+    if version != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format version {version} (expected {BUNDLE_FORMAT_VERSION})")
+
+    header_start = len(MAGIC) + _PREAMBLE.size
+    header = json.loads(mapped[header_start:header_start + header_length].decode('utf-8'))
+    data_start = _align(header_start + header_length)
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        arrays[name] = np.frombuffer(
+            mapped, dtype=dtype, count=count, offset=data_start + entry['offset']
+        ).reshape(entry['shape'])
+    return header['meta'], arrays
+
+
+def compile_bundle(models_dir: str, output: str, model_version: str = None) -> Dict[str, Any]:
+    """
+    Compile the joblib model files in models_dir into a bundle.
+
+    Returns:
+        The metadata written to the bundle
+    """
+    import sklearn
+    from model_handler import PurrPalTabularModel
+
+    started = time.perf_counter()
+    model = PurrPalTabularModel(models_dir, backend="native", cache_size=0, bundle_path="")
+    if model.forest is None or model.feature_schema is None:
+        raise ValueError("Model cannot be compiled: forest or preprocessor layout not supported")
+
+    schema = model.feature_schema
+    fingerprint = model.fingerprint()
+    arrays = {f"forest.{name}": array for name, array in model.forest.arrays().items()}
+    arrays['forest.classes'] = np.asarray(model.forest.classes).astype(str)
+    if schema.mean is not None:
+        arrays['schema.mean'] = schema.mean
+    if schema.scale is not None:
+        arrays['schema.scale'] = schema.scale
+
+    meta = {
+        'model_version': model_version or fingerprint[:12],
+        'fingerprint': fingerprint,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'sklearn_version': sklearn.__version__,
+        'class_names': [str(name) for name in model.class_names],
+        'output_names': schema.output_names,
+        'numeric_features': [schema.feature_names[i] for i in schema.numeric_index],
+    }
+    write_bundle(output, arrays, meta)
+    meta['compile_seconds'] = round(time.perf_counter() - started, 3)
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the tabular model into a memory-mappable bundle")
+    parser.add_argument('--models-dir', default='models', help="Directory containing model files")
+    parser.add_argument('--output', default='models/purrpal_symptoms_rf.bundle', help="Output bundle path")
+    parser.add_argument('--model-version', default=None, help="Version label (defaults to the model fingerprint)")
+    args = parser.parse_args()
+
+    meta = compile_bundle(args.models_dir, args.output, args.model_version)
+    print(f"✅ Bundle written to {args.output}")
+    print(f"   Version: {meta['model_version']}")
+    print(f"   Size:    {Path(args.output).stat().st_size / 1e3:.1f} KB")
+    print(f"   Took:    {meta['compile_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,258 @@
-import joblib
-import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Sequence, Tuple, TYPE_CHECKING
 import logging
+import os
+from feature_schema import FeatureSchema, QUESTIONNAIRE_MAPPING
+from forest_engine import FlatForest, EARLY_EXIT_MODES
+from prediction_cache import PredictionCache
+from lookup_table import LookupTable
+from model_bundle import read_bundle
+from purrpal_common.model_registry import ModelRegistry
+from diagnosis_catalog import SYMPTOM_LABELS
+from purrpal_common.structured_logging import stage, sampled
+import hashlib
+import time
+
+# pandas, joblib and sklearn are imported lazily: bundle serving never needs them
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Inference backends for the random forest
+BACKEND_NATIVE = "native"    # FlatForest vectorized traversal
+BACKEND_SKLEARN = "sklearn"  # RandomForestClassifier.predict_proba
+BACKENDS = (BACKEND_NATIVE, BACKEND_SKLEARN)
+
+# Tree orders for early-exit voting
+TREE_ORDER_FIXED = "fixed"            # Forest order
+TREE_ORDER_IMPORTANCE = "importance"  # Trees agreeing most with the forest first
+TREE_ORDERS = (TREE_ORDER_FIXED, TREE_ORDER_IMPORTANCE)
+
 class PurrPalTabularModel:
-    def __init__(self, models_dir: str = "models"):
+    def __init__(self, models_dir: str = "models", backend: str = None,
+                 cache_size: int = None, cache_ttl: float = None,
+                 lookup_table_path: str = None, build_lookup_table: bool = None,
+                 bundle_path: str = None, early_exit: str = None):
         """
         Initialize PurrPal Tabular Model Handler
         
         Args:
             models_dir: Directory containing model files
+            backend: Forest inference backend, "native" or "sklearn"
+                     (defaults to the TABULAR_BACKEND env variable, then "native")
+            cache_size: Max entries of the prediction cache, 0 disables it
+                        (defaults to the PREDICTION_CACHE_SIZE env variable, then 4096)
+            cache_ttl: Optional cache entry lifetime in seconds
+                       (defaults to the PREDICTION_CACHE_TTL env variable)
+            lookup_table_path: Optional precomputed default-vitals table (.npy)
+                               (defaults to the LOOKUP_TABLE_PATH env variable)
+            build_lookup_table: Build the table at startup if it is missing or stale
+                                (defaults to LOOKUP_TABLE_BUILD=1)
+            bundle_path: Precompiled model bundle to serve from instead of the joblib files
+                         (defaults to the MODEL_BUNDLE env variable, "" disables it)
+            early_exit: Early-exit forest voting, "exact", "bound" or "off" (native backend only;
+                        defaults to the FOREST_EARLY_EXIT env variable, then "off")
         """
         self.models_dir = Path(models_dir)
+        self.requested_backend = (backend or os.environ.get("TABULAR_BACKEND", BACKEND_NATIVE)).lower()
+        if self.requested_backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{self.requested_backend}', expected one of {BACKENDS}")
+        self.backend = None
+        self.forest = None
         self.model = None
         self.preprocessor = None
         self.class_names = None
+        self.class_keys = None
         self.feature_names = None
+        self.feature_schema = None
+        self.cache = self._create_cache(cache_size, cache_ttl)
+        self.lookup_table = None
+        self.lookup_table_path = lookup_table_path or os.environ.get("LOOKUP_TABLE_PATH")
+        if build_lookup_table is None:
+            build_lookup_table = os.environ.get("LOOKUP_TABLE_BUILD", "0") == "1"
+        self.build_lookup_table = build_lookup_table
+        self.bundle_path = os.environ.get("MODEL_BUNDLE") if bundle_path is None else bundle_path
+        self.bundle_meta = None
+        self.load_seconds = None
+        self.early_exit = (early_exit or os.environ.get("FOREST_EARLY_EXIT", "off")).lower()
+        if self.early_exit not in EARLY_EXIT_MODES + ("off",):
+            raise ValueError(f"Unknown early-exit mode '{self.early_exit}', expected one of {EARLY_EXIT_MODES} or 'off'")
+        self.tree_order_kind = os.environ.get("FOREST_TREE_ORDER", TREE_ORDER_IMPORTANCE).lower()
+        if self.tree_order_kind not in TREE_ORDERS:
+            raise ValueError(f"Unknown tree order '{self.tree_order_kind}', expected one of {TREE_ORDERS}")
+        self.early_exit_step = int(os.environ.get("FOREST_EARLY_EXIT_STEP", 16))
+        self.early_exit_delta = float(os.environ.get("FOREST_EARLY_EXIT_DELTA", 0.01))
+        # Below this many rows a full pass is faster than the staged one
+        self.early_exit_min_rows = int(os.environ.get("FOREST_EARLY_EXIT_MIN_ROWS", 256))
+        self.tree_order = None
+        # Features listed per explained prediction (0 = all); the rest are summed into 'other'
+        self.attribution_top_k = int(os.environ.get("ATTRIBUTION_TOP_K", 10))
         
         # Load models on initialization
         self.load_models()
         
     def load_models(self):
         """Load trained model, preprocessor, and class names"""
+        reloading = self.model is not None or self.forest is not None
+        started = time.perf_counter()
         try:
-            # Load model files
-            model_path = self.models_dir / "purrpal_symptoms_rf_model.joblib"
-            preprocessor_path = self.models_dir / "purrpal_symptoms_rf_preprocessor.joblib"
-            class_names_path = self.models_dir / "purrpal_symptoms_rf_class_names.joblib"
+            if not (self.bundle_path and self.requested_backend == BACKEND_NATIVE and self._load_bundle()):
+                self._load_joblib_models()
             
-            # Verify files exist
-            for path in [model_path, preprocessor_path, class_names_path]:
-                if not path.exists():
-                    raise FileNotFoundError(f"Model file not found: {path}")
+            # all_probabilities keys, built once instead of per prediction
+            self.class_keys = [str(name) for name in self.class_names]
             
-            # Load models
-            self.model = joblib.load(model_path)
-            self.preprocessor = joblib.load(preprocessor_path)
-            self.class_names = joblib.load(class_names_path)
+            # Precomputed default-vitals probabilities (optional)
+            self.lookup_table = self._load_lookup_table()
             
-            # Define feature names (based on notebook analysis)
-            self.feature_names = self._get_expected_features()
+            # Evaluation order of the trees for early-exit voting
+            self.tree_order = self._compute_tree_order()
             
-            logger.info("Models loaded successfully!")
+            # Cached probabilities belong to the previous model
+            if reloading and self.cache is not None:
+                self.cache.clear()
+            
+            self.load_seconds = round(time.perf_counter() - started, 4)
+            logger.info(f"Models loaded successfully! (backend: {self.backend}, {self.load_seconds:.3f}s)")
             logger.info(f"Available classes: {list(self.class_names)}")
             
         except Exception as e:
             logger.error(f"Error loading models: {e}")
             raise
     
+    def _load_joblib_models(self):
+        """Load the sklearn model, preprocessor and class names from joblib files"""
+        import joblib
+        
+        # Load model files
+        model_path = self.models_dir / "purrpal_symptoms_rf_model.joblib"
+        preprocessor_path = self.models_dir / "purrpal_symptoms_rf_preprocessor.joblib"
+        class_names_path = self.models_dir / "purrpal_symptoms_rf_class_names.joblib"
+        
+        # Verify files exist
+        for path in [model_path, preprocessor_path, class_names_path]:
+            if not path.exists():
+                raise FileNotFoundError(f"Model file not found: {path}")
+        
+        # Load models
+        self.model = joblib.load(model_path)
+        self.preprocessor = joblib.load(preprocessor_path)
+        self.class_names = joblib.load(class_names_path)
+        
+        # Define feature names (based on notebook analysis)
+        self.feature_names = self._get_expected_features()
+        
+        # Compile array-backed feature layout from the preprocessor
+        self.feature_schema = self._compile_feature_schema()
+        
+        # Flatten the forest for the native backend
+        self.forest = self._compile_forest() if self.requested_backend == BACKEND_NATIVE else None
+        self.backend = BACKEND_NATIVE if self.forest is not None else BACKEND_SKLEARN
+        self.bundle_meta = None
+    
+    def _load_bundle(self) -> bool:
+        """
+        Load the forest, feature schema and class names from a precompiled bundle (NumPy only).
+        Returns False if the bundle is missing, invalid or stale, so the joblib files are used instead.
+        """
+        try:
+            meta, arrays = read_bundle(self.bundle_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Model bundle unavailable, loading joblib models: {e}")
+            return False
+        
+        if self._joblib_fingerprint() not in (None, meta['fingerprint']):
+            logger.warning(f"Model bundle {self.bundle_path} is stale, loading joblib models")
+            return False
+        
+        self.forest = FlatForest.from_arrays({
+            name.split('.', 1)[1]: array for name, array in arrays.items() if name.startswith('forest.')
+        })
+        self.feature_schema = FeatureSchema(
+            output_names=meta['output_names'],
+            numeric_features=meta['numeric_features'],
+            mean=arrays.get('schema.mean'),
+            scale=arrays.get('schema.scale')
+        )
+        self.class_names = np.array(meta['class_names'])
+        self.feature_names = self._get_expected_features()
+        self.model = None
+        self.preprocessor = None
+        self.backend = BACKEND_NATIVE
+        self.bundle_meta = meta
+        
+        logger.info(f"Model bundle {meta['model_version']} loaded from {self.bundle_path}")
+        return True
+    
+    def _create_cache(self, cache_size: int = None, cache_ttl: float = None):
+        """Create the prediction cache from arguments or environment, or None if disabled"""
+        if cache_size is None:
+            cache_size = int(os.environ.get("PREDICTION_CACHE_SIZE", 4096))
+        if cache_ttl is None and os.environ.get("PREDICTION_CACHE_TTL"):
+            cache_ttl = float(os.environ["PREDICTION_CACHE_TTL"])
+        if cache_size <= 0:
+            return None
+        
+        decimals = os.environ.get("PREDICTION_CACHE_DECIMALS")
+        return PredictionCache(
+            max_size=cache_size,
+            ttl_seconds=cache_ttl,
+            decimals=int(decimals) if decimals else None
+        )
+    
+    def _load_lookup_table(self):
+        """
+        Memory-map (or build) the default-vitals lookup table.
+        Returns None if no table is configured or it cannot be used.
+        """
+        if not self.lookup_table_path:
+            return None
+        if self.feature_schema is None:
+            logger.warning("Lookup table requires the compiled feature schema, disabled")
+            return None
+        
+        fingerprint = self.fingerprint()
+        try:
+            table = LookupTable.load(self.lookup_table_path, self.feature_schema, fingerprint)
+        except (FileNotFoundError, ValueError) as e:
+            if not self.build_lookup_table:
+                logger.warning(f"Lookup table unavailable, using live inference: {e}")
+                return None
+            logger.info(f"Building lookup table ({e})...")
+            table = LookupTable.build(
+                self.feature_schema, self.predict_proba, list(self.class_names),
+                fingerprint, self.lookup_table_path
+            )
+        
+        stats = table.stats()
+        logger.info(
+            f"Lookup table ready: {stats['entries']} entries, "
+            f"{stats['size_bytes'] / 1e6:.1f} MB (built in {stats['build_seconds']:.2f}s)"
+        )
+        return table
+    
+    def fingerprint(self) -> str:
+        """SHA-256 over the model files, used to detect stale precomputed artifacts"""
+        if self.bundle_meta is not None:
+            return self.bundle_meta['fingerprint']
+        return self._joblib_fingerprint()
+    
+    def _joblib_fingerprint(self):
+        """SHA-256 over the joblib model files, or None if they are not present"""
+        digest = hashlib.sha256()
+        for name in ["purrpal_symptoms_rf_model.joblib",
+                     "purrpal_symptoms_rf_preprocessor.joblib",
+                     "purrpal_symptoms_rf_class_names.joblib"]:
+            path = self.models_dir / name
+            if not path.exists():
+                return None
+            digest.update(path.read_bytes())
+        return digest.hexdigest()
+    
     def _get_expected_features(self) -> List[str]:
         """
         Get list of expected feature names that should exist in input DataFrame
@@ -90,7 +289,210 @@ class PurrPalTabularModel:
         
         return expected_features
     
-    def preprocess_input(self, cat_data: Dict[str, Any], questionnaire_data: Dict[str, Any]) -> pd.DataFrame:
+    def _compile_feature_schema(self):
+        """
+        Build the FeatureSchema used on the hot path.
+        Returns None (DataFrame fallback) if the preprocessor layout is not supported.
+        """
+        try:
+            schema = FeatureSchema.from_preprocessor(self.preprocessor)
+        except Exception as e:
+            logger.warning(f"Feature schema unavailable, using DataFrame path: {e}")
+            return None
+        
+        if set(schema.feature_names) != set(self.feature_names):
+            logger.warning("Preprocessor columns differ from expected features, using DataFrame path")
+            return None
+        
+        return schema
+    
+    def _compile_forest(self):
+        """
+        Flatten the random forest into a FlatForest.
+        Returns None (sklearn fallback) if the model cannot be flattened.
+        """
+        try:
+            forest = FlatForest.from_sklearn(self.model)
+        except Exception as e:
+            logger.warning(f"Native forest unavailable, using sklearn backend: {e}")
+            return None
+        
+        logger.info(f"Forest flattened: {forest.n_trees} trees, {forest.n_nodes} nodes, depth {forest.max_depth}")
+        return forest
+    
+    def _compute_tree_order(self):
+        """
+        Tree order for early-exit voting, or None when early exit is off.
+        The importance order is calibrated on synthetic questionnaires.
+        """
+        if self.early_exit == "off":
+            return None
+        if self.forest is None:
+            logger.warning("Early-exit voting needs the native backend, using the full forest")
+            return None
+        if self.tree_order_kind == TREE_ORDER_FIXED or self.feature_schema is None:
+            order = np.arange(self.forest.n_trees)
+        else:
+            order = self.forest.tree_order(self.feature_schema.standardize(self._calibration_block()))
+        logger.info(f"Early-exit voting: {self.early_exit} mode, {self.tree_order_kind} tree order, "
+                    f"blocks of {self.early_exit_min_rows}+ rows")
+        return order
+    
+    def _calibration_block(self, n_rows: int = 2048) -> np.ndarray:
+        """Unscaled synthetic rows: vitals around their defaults, a few symptoms each"""
+        rng = np.random.default_rng(0)
+        schema = self.feature_schema
+        block = schema.new_block(n_rows)
+        for name, default in schema.defaults.items():
+            block[:, schema.column_index[name]] = default * rng.uniform(0.7, 1.3, n_rows)
+        block[:, schema.flag_index] = rng.random((n_rows, len(schema.flag_index))) < 0.2
+        return schema.check_block(block)
+    
+    def predict_proba(self, X_processed: np.ndarray) -> np.ndarray:
+        """Class probabilities for a preprocessed feature matrix using the active backend"""
+        if self.forest is not None:
+            return self.forest.predict_proba(X_processed)
+        return self.model.predict_proba(X_processed)
+    
+    @property
+    def n_trees(self) -> int:
+        return self.forest.n_trees if self.forest is not None else len(self.model.estimators_)
+    
+    def _forest_scores(self, X_processed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(probabilities, trees used per row), voting with early exit on large enough blocks"""
+        if self.tree_order is not None and len(X_processed) >= self.early_exit_min_rows:
+            return self.forest.predict_proba_early(
+                X_processed, self.early_exit, self.tree_order, self.early_exit_step, self.early_exit_delta
+            )
+        return self.predict_proba(X_processed), np.full(len(X_processed), self.n_trees)
+    
+    def _score(self, X_processed: np.ndarray):
+        """
+        Run the forest once and return (predicted labels, probabilities, trees used per row).
+        Labels are the argmax of the probabilities, exactly as RandomForestClassifier.predict
+        (also in the exact early-exit mode).
+        """
+        probabilities, trees_used = self._forest_scores(X_processed)
+        return self._labels(probabilities), probabilities, trees_used
+    
+    def _labels(self, probabilities: np.ndarray) -> np.ndarray:
+        """Class labels for rows of class probabilities"""
+        classes = self.forest.classes if self.forest is not None else self.model.classes_
+        return classes.take(np.argmax(probabilities, axis=1))
+    
+    def _score_block(self, block: np.ndarray, use_cache: bool = True):
+        """
+        Score an unscaled FeatureSchema block, serving rows from the lookup table
+        and the prediction cache before falling back to the forest.
+        Returns (predicted labels, probabilities, trees used per row) like _score.
+        
+        With use_cache=False rows are still quantized like cached ones (when
+        PREDICTION_CACHE_DECIMALS is set), so the results are the same, but the
+        cache is neither read nor filled.
+        """
+        # Rows are quantized (if configured) before keying, lookup and scoring
+        if self.cache is not None:
+            self.cache.canonicalize(block)
+        
+        if self.lookup_table is None and (self.cache is None or not use_cache):
+            return self._score(self.feature_schema.standardize(block))
+        
+        probabilities = np.empty((len(block), len(self.class_names)))
+        trees_used = np.full(len(block), self.n_trees)
+        pending = np.arange(len(block))
+        if self.lookup_table is not None:
+            found = self.lookup_table.lookup(block, out=probabilities)
+            pending = np.flatnonzero(~found)
+        
+        score_rows = self._score_rows if use_cache else self._forest_scores_unscaled
+        if len(pending) == len(block):
+            probabilities, trees_used = score_rows(block)
+        elif len(pending):
+            probabilities[pending], trees_used[pending] = score_rows(block[pending])
+        
+        return self._labels(probabilities), probabilities, trees_used
+    
+    def _score_rows(self, block: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(probabilities, trees used) for canonical unscaled rows, using the prediction cache if enabled"""
+        if self.cache is None:
+            return self._forest_scores_unscaled(block)
+        
+        keys = [self.cache.key(row) for row in block]
+        cached = [self.cache.get(key) for key in keys]
+        misses = [i for i, value in enumerate(cached) if value is None]
+        
+        if misses:
+            fresh, fresh_trees = self._forest_scores_unscaled(block[misses])
+            for i, prediction_proba, trees in zip(misses, fresh, fresh_trees.tolist()):
+                prediction_proba = prediction_proba.copy()
+                prediction_proba.setflags(write=False)
+                cached[i] = (prediction_proba, trees, None)
+                self.cache.put(keys[i], cached[i])
+        
+        return np.vstack([entry[0] for entry in cached]), np.array([entry[1] for entry in cached])
+    
+    def _forest_scores_unscaled(self, block: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(probabilities, trees used) for canonical unscaled rows, straight from the forest"""
+        return self._forest_scores(self.feature_schema.standardize(block))
+    
+    def _explain(self, X_processed: np.ndarray):
+        """
+        Run the full forest with tree-path attributions for the predicted class.
+        Returns (predicted labels, probabilities, trees used per row, attribution
+        summary per row).
+        """
+        if self.forest is None:
+            raise RuntimeError("Feature attributions need the native forest backend")
+        probabilities, bias, contributions = self.forest.contributions(X_processed)
+        trees_used = np.full(len(X_processed), self.n_trees)
+        return self._labels(probabilities), probabilities, trees_used, self._attribution_summaries(bias, contributions)
+    
+    def _explain_block(self, block: np.ndarray):
+        """
+        Like _explain for an unscaled FeatureSchema block. Attribution summaries
+        are cached alongside the probabilities; the lookup table is skipped, since
+        it holds no attributions. Explained rows always use the full forest, so
+        the baseline plus contributions add up to the returned probability.
+        """
+        if self.cache is None:
+            return self._explain(self.feature_schema.standardize(block))
+        
+        self.cache.canonicalize(block)
+        keys = [self.cache.key(row) for row in block]
+        cached = [self.cache.get(key) for key in keys]
+        misses = [i for i, entry in enumerate(cached) if entry is None or entry[2] is None]
+        
+        if misses:
+            _, fresh, _, summaries = self._explain(self.feature_schema.standardize(block[misses]))
+            for i, prediction_proba, summary in zip(misses, fresh, summaries):
+                prediction_proba = prediction_proba.copy()
+                prediction_proba.setflags(write=False)
+                cached[i] = (prediction_proba, self.n_trees, summary)
+                self.cache.put(keys[i], cached[i])
+        
+        probabilities = np.vstack([entry[0] for entry in cached])
+        return (self._labels(probabilities), probabilities, np.array([entry[1] for entry in cached]),
+                [entry[2] for entry in cached])
+    
+    def transform_input(self, cat_data: Dict[str, Any], questionnaire_data: Dict[str, Any]) -> np.ndarray:
+        """
+        Build the model-ready (preprocessed) feature matrix for one input
+        
+        Args:
+            cat_data: Dictionary containing cat information
+            questionnaire_data: Dictionary containing questionnaire answers
+            
+        Returns:
+            np.ndarray: Array of shape (1, n_features), identical to
+            preprocessor.transform(preprocess_input(...))
+        """
+        if self.feature_schema is not None:
+            return self.feature_schema.transform(cat_data, questionnaire_data)
+        
+        X = self.preprocess_input(cat_data, questionnaire_data)
+        return self.preprocessor.transform(X)
+    
+    def preprocess_input(self, cat_data: Dict[str, Any], questionnaire_data: Dict[str, Any]) -> "pd.DataFrame":
         """
         Preprocess input data to match training format
         
@@ -101,6 +503,8 @@ class PurrPalTabularModel:
         Returns:
             pd.DataFrame: Preprocessed feature vector ready for prediction
         """
+        import pandas as pd
+        
         try:
             # Initialize feature vector with zeros for ALL expected features
             features = {feature: 0 for feature in self.feature_names}
@@ -116,25 +520,7 @@ class PurrPalTabularModel:
             features['Gender_Male'] = 1 if cat_data.get('gender', '').lower() == 'male' else 0
             
             # Process questionnaire answers
-            # Map questionnaire IDs to exact feature names that model expects
-            questionnaire_mapping = {
-                'cough': 'Coughing',
-                'breathingDifficulty': 'Labored_Breathing',
-                'fever': 'Fever', 
-                'discomfort': 'Lethargy',
-                'appetiteLoss': 'Appetite_Loss',  # Use underscore version
-                'weightLoss': 'Weight Loss',  # Use space version
-                'vomiting': 'Vomiting',
-                'diarrhea': 'Diarrhea',
-                'skinLesions': 'Skin_Lesions',  # Use underscore version
-                'nasalDischarge': 'Nasal_Discharge',  # Use underscore version
-                'eyeDischarge': 'Eye_Discharge',  # Use underscore version
-                'nightSweats': 'Dehydration',  # Map to Dehydration
-                'phlegmGreen': 'Sneezing',  # Map to Sneezing
-                'phlegmBlood': 'Loss of Appetite',  # Map to existing feature
-                'yellowPhlegm': 'Sneezing',  # Map to Sneezing (same as phlegmGreen)
-                'breathingSound': 'Labored_Breathing'  # Map to existing feature
-            }
+            questionnaire_mapping = QUESTIONNAIRE_MAPPING
             
             # Apply questionnaire answers
             for question_id, answer in questionnaire_data.items():
@@ -159,95 +545,282 @@ class PurrPalTabularModel:
                 logger.error(f"Expected columns: {self.feature_names}")
                 raise ValueError(f"Missing required columns: {missing_cols}")
             
-            logger.info(f"Input preprocessed successfully. Shape: {df.shape}")
-            logger.info(f"All required columns present: {len(df.columns)} columns")
-            logger.debug(f"Feature columns: {list(df.columns)}")
+            logger.debug("Input preprocessed successfully. Shape: %s", df.shape)
+            logger.debug("Feature columns: %s", list(df.columns))
             return df
             
         except Exception as e:
             logger.error(f"Error preprocessing input: {e}")
             raise
     
-    def predict(self, cat_data: Dict[str, Any], questionnaire_data: Dict[str, Any]) -> Dict[str, Any]:
+    def predict(self, cat_data: Dict[str, Any], questionnaire_data: Dict[str, Any],
+                explain: bool = False) -> Dict[str, Any]:
         """
         Make prediction on cat symptoms
         
         Args:
             cat_data: Dictionary containing cat information
             questionnaire_data: Dictionary containing questionnaire answers
+            explain: Also return the feature attributions of the predicted class
             
         Returns:
             Dictionary containing prediction results
         """
         try:
-            # Preprocess input
-            X = self.preprocess_input(cat_data, questionnaire_data)
-            
-            # Apply same preprocessing as training (StandardScaler for numeric features)
-            X_processed = self.preprocessor.transform(X)
-            
-            # Make prediction
-            prediction = self.model.predict(X_processed)[0]
-            prediction_proba = self.model.predict_proba(X_processed)[0]
-            
-            # Get prediction confidence
-            max_proba = float(np.max(prediction_proba))
+            # Make prediction (single forest pass, or a cache hit)
+            attribution = None
+            if self.feature_schema is not None:
+                with stage("vectorize"):
+                    block = self.feature_schema.new_block(1)
+                    self.feature_schema.vectorize(cat_data, questionnaire_data, out=block[0])
+                with stage("score"):
+                    if explain:
+                        predictions, probabilities, trees_used, attributions = self._explain_block(block)
+                        attribution = attributions[0]
+                    else:
+                        predictions, probabilities, trees_used = self._score_block(block)
+            else:
+                # Preprocess input and apply same scaling as training (StandardScaler for numeric features)
+                with stage("vectorize"):
+                    X_processed = self.transform_input(cat_data, questionnaire_data)
+                with stage("score"):
+                    if explain:
+                        predictions, probabilities, trees_used, attributions = self._explain(X_processed)
+                        attribution = attributions[0]
+                    else:
+                        predictions, probabilities, trees_used = self._score(X_processed)
+            prediction, prediction_proba = predictions[0], probabilities[0]
             
             # Prepare result
-            result = {
-                'predicted_disease': prediction,
-                'confidence': round(max_proba * 100, 1),
-                'all_probabilities': {
-                    disease: round(float(prob) * 100, 1) 
-                    for disease, prob in zip(self.class_names, prediction_proba)
-                },
-                'cat_info': cat_data,
-                'feature_summary': self._get_active_symptoms(cat_data, questionnaire_data)
-            }
+            result = self._build_result(prediction, prediction_proba, cat_data, questionnaire_data, trees_used[0],
+                                        attribution)
             
-            logger.info(f"Prediction completed: {prediction} ({max_proba:.2%} confidence)")
+            if sampled():
+                logger.info("Prediction completed: %s (%.2f%% confidence)", prediction, result['confidence'])
             return result
             
         except Exception as e:
             logger.error(f"Error making prediction: {e}")
             raise
     
+    def predict_batch(self, items: Sequence[Tuple[Dict[str, Any], Dict[str, Any]]],
+                      explain: bool = False) -> List[Dict[str, Any]]:
+        """
+        Make predictions for many inputs with a single transform and predict_proba pass
+        
+        Args:
+            items: Sequence of (cat_data, questionnaire_data) pairs
+            explain: Also return the feature attributions of each predicted class
+            
+        Returns:
+            List with one entry per input, in order. Successful entries have the
+            same shape as predict(); failed entries are {'error': message}.
+        """
+        results: List[Dict[str, Any]] = [None] * len(items)
+        rows = []  # (position in items, cat_data, questionnaire_data) of valid inputs
+        
+        if self.feature_schema is not None:
+            block = self.feature_schema.new_block(len(items))
+        else:
+            block = []
+        
+        for position, (cat_data, questionnaire_data) in enumerate(items):
+            try:
+                if self.feature_schema is not None:
+                    row = block[len(rows)]
+                    try:
+                        self.feature_schema.vectorize(cat_data, questionnaire_data, out=row)
+                    except Exception:
+                        row[:] = 0  # Row is reused by the next input
+                        raise
+                else:
+                    block.append(self.preprocess_input(cat_data, questionnaire_data))
+                rows.append((position, cat_data, questionnaire_data))
+            except Exception as e:
+                logger.warning("Batch item %d rejected: %s", position, e)
+                results[position] = {'error': str(e)}
+        
+        if not rows:
+            return results
+        
+        try:
+            # One forest pass for the whole batch (cache misses only)
+            attributions = [None] * len(rows)
+            with stage("score"):
+                if self.feature_schema is not None:
+                    if explain:
+                        predictions, probabilities, trees_used, attributions = self._explain_block(block[:len(rows)])
+                    else:
+                        predictions, probabilities, trees_used = self._score_block(block[:len(rows)])
+                else:
+                    import pandas as pd
+                    X_processed = self.preprocessor.transform(pd.concat(block, ignore_index=True))
+                    if explain:
+                        predictions, probabilities, trees_used, attributions = self._explain(X_processed)
+                    else:
+                        predictions, probabilities, trees_used = self._score(X_processed)
+        except Exception as e:
+            logger.error(f"Error making batch prediction: {e}")
+            raise
+        
+        for (position, cat_data, questionnaire_data), prediction, prediction_proba, trees, attribution in zip(
+            rows, predictions, probabilities, trees_used.tolist(), attributions
+        ):
+            results[position] = self._build_result(prediction, prediction_proba, cat_data, questionnaire_data, trees,
+                                                   attribution)
+        
+        if sampled():
+            logger.info("Batch prediction completed: %d scored, %d rejected", len(rows), len(items) - len(rows))
+        return results
+    
+    def predict_block(self, block: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score a caller-supplied unscaled feature block (see feature_codecs.py)
+        
+        The block is scored in one vectorized pass without creating per-row
+        Python objects: the lookup table serves default-vitals rows and the
+        forest the rest. The prediction cache is skipped, since keying it row
+        by row would cost more than bulk inputs gain from it.
+        
+        Args:
+            block: Block of shape (n, n_features), checked with FeatureSchema.check_block
+                   (standardized in place)
+            
+        Returns:
+            Tuple of (predicted labels, probabilities of shape (n, n_classes))
+        """
+        if self.feature_schema is None:
+            raise RuntimeError("Feature blocks need a compiled feature schema")
+        
+        with stage("score"):
+            predictions, probabilities, _ = self._score_block(block, use_cache=False)
+        return predictions, probabilities
+    
+    def _build_result(self, prediction, prediction_proba: np.ndarray,
+                      cat_data: Dict[str, Any], questionnaire_data: Dict[str, Any],
+                      trees_used: int, attribution: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the prediction result dictionary from one row of class probabilities"""
+        # One conversion to Python floats; float * 100 rounds exactly like float(prob) * 100
+        percentages = [round(prob * 100, 1) for prob in prediction_proba.tolist()]
+        
+        result = {
+            'predicted_disease': prediction,
+            'confidence': max(percentages),
+            'all_probabilities': dict(zip(self.class_keys, percentages)),
+            'cat_info': cat_data,
+            'feature_summary': self._get_active_symptoms(cat_data, questionnaire_data),
+            'trees_used': int(trees_used)
+        }
+        if attribution is not None:
+            # Summaries may be shared with the prediction cache, so each result gets its own copy
+            result['attributions'] = {**attribution, 'contributions': dict(attribution['contributions'])}
+        return result
+    
+    def _attribution_summaries(self, bias: np.ndarray, contributions: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Per row, the percentage points the ATTRIBUTION_TOP_K strongest features
+        added to (or took from) the predicted class, largest first, starting from
+        the baseline (the forest's average prediction); 'other' sums the rest.
+        Features that moved it by less than 0.005 points are left out. Rounding
+        and ranking run once for the whole block.
+        """
+        order = np.argsort(-np.abs(contributions), axis=1, kind='stable')
+        if self.attribution_top_k > 0:
+            order = order[:, :self.attribution_top_k]
+        top = np.take_along_axis(contributions, order, axis=1)
+        other = np.round((contributions.sum(axis=1) - top.sum(axis=1)) * 100, 2)
+        names = self.attribution_features
+        return [
+            {'baseline': baseline,
+             'contributions': {names[i]: value for i, value in zip(row_order, row_points) if value != 0},
+             'other': row_other}
+            for baseline, row_order, row_points, row_other in zip(
+                np.round(bias * 100, 2).tolist(), order.tolist(), np.round(top * 100, 2).tolist(), other.tolist()
+            )
+        ]
+    
+    @property
+    def attribution_features(self) -> List[str]:
+        """Feature names in model (preprocessor output) column order"""
+        if self.feature_schema is not None:
+            return self.feature_schema.feature_names
+        return [str(name).split('__', 1)[-1] for name in self.preprocessor.get_feature_names_out()]
+    
     def _get_active_symptoms(self, cat_data: Dict[str, Any], questionnaire_data: Dict[str, Any]) -> List[str]:
         """Get list of active symptoms for interpretation"""
         active_symptoms = []
         
-        # Map questionnaire to human-readable symptoms
-        symptom_labels = {
-            'cough': 'Batuk',
-            'breathingDifficulty': 'Kesulitan bernapas',
-            'fever': 'Demam',
-            'discomfort': 'Terlihat tidak nyaman',
-            'appetiteLoss': 'Kehilangan nafsu makan',
-            'weightLoss': 'Penurunan berat badan',
-            'vomiting': 'Muntah',
-            'diarrhea': 'Diare',
-            'skinLesions': 'Luka pada kulit',
-            'nasalDischarge': 'Keluaran hidung',
-            'eyeDischarge': 'Keluaran mata',
-            'nightSweats': 'Dehidrasi',
-            'phlegmGreen': 'Bersin-bersin',
-            'phlegmBlood': 'Kehilangan nafsu makan',
-            'yellowPhlegm': 'Bersin-bersin',
-            'breathingSound': 'Gangguan pernapasan'
-        }
-        
         for question_id, answer in questionnaire_data.items():
-            if answer and question_id in symptom_labels:
-                active_symptoms.append(symptom_labels[question_id])
+            if answer and question_id in SYMPTOM_LABELS:
+                active_symptoms.append(SYMPTOM_LABELS[question_id])
         
         return active_symptoms
 
+    def memory_bytes(self) -> int:
+        """Approximate resident size: forest arrays, sklearn trees and the lookup table"""
+        size = 0
+        if self.forest is not None:
+            size += sum(value.nbytes for value in vars(self.forest).values() if isinstance(value, np.ndarray))
+        for estimator in getattr(self.model, 'estimators_', []):
+            state = estimator.tree_.__getstate__()
+            size += state['nodes'].nbytes + state['values'].nbytes
+        if self.lookup_table is not None:
+            size += self.lookup_table.stats()['size_bytes'] or 0
+        return size
+
     def get_health_info(self) -> Dict[str, Any]:
         """Get model health information"""
         return {
-            'model_loaded': self.model is not None,
-            'preprocessor_loaded': self.preprocessor is not None,
+            'model_loaded': self.model is not None or self.forest is not None,
+            'backend': self.backend,
+            'model_version': self.bundle_meta['model_version'] if self.bundle_meta else None,
+            'load_seconds': self.load_seconds,
+            'preprocessor_loaded': self.preprocessor is not None or self.feature_schema is not None,
             'class_names_loaded': self.class_names is not None,
             'available_classes': list(self.class_names) if self.class_names is not None else [],
-            'total_features': len(self.feature_names) if self.feature_names else 0
-        }
\ No newline at end of file
+            'total_features': len(self.feature_names) if self.feature_names else 0,
+            'feature_schema_compiled': self.feature_schema is not None,
+            'prediction_cache': self.cache.stats() if self.cache is not None else None,
+            'lookup_table': self.lookup_table.stats() if self.lookup_table is not None else None,
+            'early_exit': {
+                'mode': self.early_exit,
+                'tree_order': self.tree_order_kind,
+                'min_rows': self.early_exit_min_rows,
+                'active': self.tree_order is not None,
+            }
+        }
+
+
+def load_model_version(name: str, spec: Dict[str, Any]) -> PurrPalTabularModel:
+    """
+    ModelRegistry loader for the tabular model
+
+    Spec keys: "path" (models directory), "bundle" and "lookup_table". A
+    version with its own path serves its joblib files unless it names a
+    bundle (and never builds a lookup table it does not name); a spec
+    without keys is the model configured by the environment.
+    """
+    logger.info(f"Loading model version {name}: {spec or 'environment defaults'}")
+    return PurrPalTabularModel(
+        spec.get('path', 'models'),
+        bundle_path=spec.get('bundle', '' if 'path' in spec else None),
+        lookup_table_path=spec.get('lookup_table'),
+        # Never rebuild the environment's table from another version's model
+        build_lookup_table=False if 'path' in spec and 'lookup_table' not in spec else None,
+    )
+
+
+def create_model_registry(preload: bool = True, watch: bool = False) -> ModelRegistry:
+    """
+    Registry of the tabular model versions configured by the MODEL_* env variables
+
+    Args:
+        preload: Load the default version now
+        watch: Follow changes of the registry file (see ModelRegistry.watch)
+    """
+    registry = ModelRegistry.from_env(load_model_version, size_of=PurrPalTabularModel.memory_bytes)
+    if preload:
+        registry.get()
+    if watch:
+        registry.watch()
+    return registry
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Thread-safe bounded LRU cache for class probabilities.
+
+    Keys are canonical feature rows (see ``canonicalize``/``key``), so two
+    requests that vectorize to the same row share an entry regardless of the
+    cat's name or which aliased questionnaire key set a feature.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl_seconds: Optional[float] = None,
+                 decimals: Optional[int] = None, clock=time.monotonic):
+        """
+        Args:
+            max_size: Maximum number of entries before LRU eviction
+            ttl_seconds: Optional time-to-live of an entry (None = no expiry)
+            decimals: Optional rounding of the vitals before keying and
+                      scoring (None = exact float keys). Rounding raises the hit
+                      rate but changes the inputs the model sees, and so can
+                      change its output.
+            clock: Monotonic time source (overridable for tests)
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.decimals = decimals
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def canonicalize(self, block: np.ndarray) -> np.ndarray:
+        """
+        Quantize an unscaled feature block in place (only if decimals is set).
+
+        Rounding is applied to the rows that are scored, not only to the keys,
+        so a cached result is always exactly what a fresh prediction would give.
+        """
+        if self.decimals is not None:
+            np.round(block, self.decimals, out=block)
+        block += 0.0  # Fold -0.0 into 0.0 so both produce the same key
+        return block
+
+    @staticmethod
+    def key(row: np.ndarray) -> bytes:
+        """Cache key of one canonical feature row"""
+        return row.tobytes()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value (and mark it recently used), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and self._clock() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Insert or refresh an entry, evicting the least recently used ones"""
+        expires_at = None if self.ttl_seconds is None else self._clock() + self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (e.g. after the model is reloaded)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the /health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'decimals': self.decimals,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
@@ -3,7 +3,31 @@
 Test script to verify preprocessing works correctly
 """
 
+import asyncio
+import contextvars
+import io
+import json
+import logging
+import random
+import tempfile
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
 from model_handler import PurrPalTabularModel
+from feature_schema import QUESTIONNAIRE_MAPPING
+from lookup_table import LookupTable, symptom_features
+from micro_batcher import MicroBatcher
+from prediction_cache import PredictionCache
+from inference_executor import InferenceExecutor, ExecutorOverloaded
+from purrpal_common.model_registry import ModelRegistry, UnknownModelVersion
+import feature_codecs
+from bulk_stream import UploadReader, CsvDecoder
+import batch_score
+import model_bundle
+from diagnosis_catalog import DiagnosisCatalog
+from purrpal_common import structured_logging
+from purrpal_common import service_metrics
 
 def test_preprocessing():
     """Test the preprocessing pipeline"""
@@ -11,74 +35,816 @@ def test_preprocessing():
     print("🧪 Testing PurrPal Model Preprocessing...")
     print("=" * 50)
     
-    try:
-        # Initialize model
-        print("1. Loading model...")
-        model = PurrPalTabularModel()
-        print("✅ Model loaded successfully!")
+    # Initialize model
+    print("1. Loading model...")
+    model = PurrPalTabularModel()
+    print("✅ Model loaded successfully!")
+    
+    # Test data
+    print("\n2. Preparing test data...")
+    cat_data = {
+        "name": "Test Cat",
+        "age": 2.0,
+        "gender": "male",
+        "weight": 4.5,
+        "body_temperature": 39.0,
+        "duration_days": 5,
+        "heart_rate": 130
+    }
+    
+    questionnaire_data = {
+        'cough': True,
+        'breathingDifficulty': False,
+        'fever': True,
+        'discomfort': True,
+        'appetiteLoss': True,
+        'weightLoss': False,
+        'vomiting': False,
+        'diarrhea': False,
+        'skinLesions': False,
+        'nasalDischarge': True,
+        'eyeDischarge': False,
+        'nightSweats': False,
+        'phlegmGreen': True,
+        'phlegmBlood': False,
+        'yellowPhlegm': False,
+        'breathingSound': False
+    }
+    
+    print("✅ Test data prepared!")
+    
+    # Test preprocessing
+    print("\n3. Testing preprocessing...")
+    X = model.preprocess_input(cat_data, questionnaire_data)
+    assert X.shape[0] == 1
+    print(f"✅ Preprocessing successful! Shape: {X.shape}")
+    
+    # Test model transformation
+    print("\n4. Testing model transformation...")
+    X_processed = model.preprocessor.transform(X)
+    assert X_processed.shape[0] == 1
+    print(f"✅ Model transformation successful! Shape: {X_processed.shape}")
+    
+    # Test prediction
+    print("\n5. Testing full prediction...")
+    result = model.predict(cat_data, questionnaire_data)
+    assert result['predicted_disease']
+    assert 0 <= result['confidence'] <= 100
+    print("✅ Prediction successful!")
+    print(f"   Predicted disease: {result['predicted_disease']}")
+    print(f"   Confidence: {result['confidence']}%")
+    print(f"   Active symptoms: {result['feature_summary']}")
+    
+    print("\n" + "=" * 50)
+    print("🎉 ALL TESTS PASSED! Model is working correctly.")
+
+def test_predict_batch():
+    """One bad row is reported in place without failing the rows around it"""
+    
+    print("🧪 Testing batch prediction...")
+    
+    model = PurrPalTabularModel(cache_size=0)
+    items = [
+        ({"age": 2.0, "gender": "male"}, {'cough': True}),
+        ({"age": "old", "gender": "male"}, {'cough': True}),
+        ({"age": 5.0, "gender": "female"}, {'vomiting': True, 'diarrhea': True}),
+        ({"weight": None}, {}),
+    ]
+    results = model.predict_batch(items)
+    
+    assert len(results) == len(items)
+    assert set(results[1]) == {'error'} and set(results[3]) == {'error'}
+    for position in (0, 2):
+        expected = model.predict(*items[position])
+        assert results[position]['predicted_disease'] == expected['predicted_disease']
+        assert results[position]['all_probabilities'] == expected['all_probabilities']
+    assert model.predict_batch([items[1]]) == [results[1]]
+    
+    print("✅ Batch prediction isolates failing rows")
+
+def test_predict_batch_endpoint():
+    """POST /predict/batch answers in request order and rejects malformed or oversized batches"""
+    
+    print("🧪 Testing /predict/batch...")
+    
+    from fastapi.testclient import TestClient
+    import app as service
+    
+    good = {"cat_info": {"name": "Mochi", "age": "2 tahun", "gender": "male"}, "questionnaire": {"cough": True}}
+    other = {"cat_info": {"name": "Luna", "age": "9 tahun", "gender": "female"},
+             "questionnaire": {"vomiting": True, "diarrhea": True}}
+    items = [good, {"cat_info": {"name": "Nameless"}}, other, good]
+    
+    with TestClient(service.app) as client:
+        singles = [client.post("/predict", json=item).json() for item in (good, other)]
+        response = client.post("/predict/batch", json={"items": items})
+        assert response.status_code == 200
+        body = response.json()
+        assert (body["success"], body["total"], body["succeeded"], body["failed"]) == (False, 4, 3, 1)
+        assert [result["index"] for result in body["results"]] == [0, 1, 2, 3]
+        assert body["results"][1]["error"].startswith("Invalid item")
+        for position, single in ((0, singles[0]), (2, singles[1]), (3, singles[0])):
+            result = body["results"][position]["result"]
+            assert result["predicted_disease"] == single["predicted_disease"]
+            assert result["all_probabilities"] == single["all_probabilities"]
         
-        # Test data
-        print("\n2. Preparing test data...")
+        # Malformed requests fail validation as a whole
+        assert client.post("/predict/batch", json={"items": "not a list"}).status_code == 422
+        assert client.post("/predict/batch", json={}).status_code == 422
+        assert client.post("/predict/batch", json={"items": [good]}, params={"format": "xml"}).status_code == 422
+        
+        max_batch_size = service.MAX_BATCH_SIZE
+        service.MAX_BATCH_SIZE = 3
+        try:
+            response = client.post("/predict/batch", json={"items": items})
+        finally:
+            service.MAX_BATCH_SIZE = max_batch_size
+        assert response.status_code == 413 and "max 3" in response.json()["detail"]
+    
+    print("✅ /predict/batch keeps order and rejects bad batches")
+
+def test_feature_schema_equivalence():
+    """Compiled feature schema must match the DataFrame path bit for bit"""
+    
+    print("🧪 Testing array-backed feature schema against DataFrame path...")
+    
+    model = PurrPalTabularModel()
+    assert model.feature_schema is not None, "Feature schema was not compiled"
+    
+    rng = random.Random(42)
+    question_ids = list(QUESTIONNAIRE_MAPPING) + ['coughDuration']
+    
+    cases = [({"name": "Default Cat", "gender": "female"}, {})]
+    for _ in range(200):
         cat_data = {
             "name": "Test Cat",
-            "age": 2.0,
-            "gender": "male",
-            "weight": 4.5,
-            "body_temperature": 39.0,
-            "duration_days": 5,
-            "heart_rate": 130
+            "age": rng.choice([0.5, 1.0, 2.0, 7.0, 15.0]),
+            "gender": rng.choice(["male", "Male", "female", ""]),
+            "weight": rng.choice([2.3, 4.0, 5.75]),
+            "body_temperature": rng.choice([37.9, 38.5, 40.1]),
+            "duration_days": rng.choice([1, 3, 21]),
+            "heart_rate": rng.choice([90, 120, 181])
         }
+        shuffled = rng.sample(question_ids, len(question_ids))
+        questionnaire_data = {q: rng.random() < 0.4 for q in shuffled}
+        cases.append((cat_data, questionnaire_data))
+    
+    for cat_data, questionnaire_data in cases:
+        expected = model.preprocessor.transform(model.preprocess_input(cat_data, questionnaire_data))
+        actual = model.transform_input(cat_data, questionnaire_data)
+        assert actual.shape == expected.shape
+        assert actual.dtype == expected.dtype
+        assert actual.tobytes() == expected.tobytes(), f"Mismatch for {cat_data}, {questionnaire_data}"
+    
+    # Row blocks must match the single-row path as well
+    block = model.feature_schema.standardize(model.feature_schema.vectorize_many(cases))
+    stacked = np.vstack([model.transform_input(c, q) for c, q in cases])
+    assert block.tobytes() == stacked.tobytes()
+    
+    print(f"✅ {len(cases)} inputs bit-identical to the DataFrame path")
+
+def test_native_forest_matches_sklearn():
+    """Flattened forest must reproduce sklearn's probabilities and labels"""
+    
+    print("🧪 Testing native forest backend against sklearn...")
+    
+    model = PurrPalTabularModel(backend="native")
+    assert model.backend == "native", "Forest was not flattened"
+    
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(2000, model.feature_schema.n_features))
+    X[:, 5:] = rng.integers(0, 2, size=(2000, X.shape[1] - 5))
+    
+    expected = model.model.predict_proba(X)
+    actual = model.forest.predict_proba(X)
+    assert np.max(np.abs(actual - expected)) <= 1e-9
+    assert (model.forest.predict(X) == model.model.predict(X)).all()
+    
+    # Single rows go through the same path as batches
+    assert np.max(np.abs(model.forest.predict_proba(X[0]) - expected[:1])) <= 1e-9
+    
+    print(f"✅ {len(X)} rows match sklearn within 1e-9")
+
+def test_early_exit_voting():
+    """Exact early exit keeps the full forest's class; rows using every tree keep its probabilities"""
+    
+    print("🧪 Testing early-exit forest voting...")
+    
+    model = PurrPalTabularModel(cache_size=0, lookup_table_path="", early_exit="exact")
+    forest = model.forest
+    rng = np.random.default_rng(11)
+    block = model._calibration_block(4000)
+    block[:, model.feature_schema.flag_index] = rng.random((4000, len(model.feature_schema.flag_index))) < 0.1
+    X = model.feature_schema.standardize(block)
+    expected = forest.predict_proba(X)
+    
+    for order in (None, model.tree_order):
+        for step in (1, 7, 16):
+            proba, trees_used = forest.predict_proba_early(X, "exact", order, step)
+            assert (np.argmax(proba, axis=1) == np.argmax(expected, axis=1)).all()
+            assert trees_used.min() < forest.n_trees and trees_used.max() <= forest.n_trees
+            full = trees_used == forest.n_trees
+            assert np.array_equal(proba[full], expected[full])
+    
+    proba, bound_trees = forest.predict_proba_early(X, "bound", model.tree_order, 16, 0.01)
+    assert bound_trees.mean() <= trees_used.mean()
+    assert (np.argmax(proba, axis=1) == np.argmax(expected, axis=1)).mean() > 0.95
+    
+    # Blocks below FOREST_EARLY_EXIT_MIN_ROWS use every tree; larger ones report what they used
+    items = [({"age": 2, "gender": "male"}, {'cough': True})] * 300
+    assert model.predict(*items[0])['trees_used'] == forest.n_trees
+    results = model.predict_batch(items)
+    assert results[0]['trees_used'] < forest.n_trees
+    assert results[0]['predicted_disease'] == model.predict(*items[0])['predicted_disease']
+    
+    print(f"✅ Exact mode matches the full forest using {trees_used.mean():.1f} of {forest.n_trees} trees on average")
+
+def test_feature_attributions():
+    """Tree-path contributions add up to the explained probability and are cached with it"""
+    
+    print("🧪 Testing feature attributions...")
+    
+    model = PurrPalTabularModel(cache_size=16)
+    forest = model.forest
+    X = model.feature_schema.standardize(model._calibration_block(1000))
+    expected = forest.predict_proba(X)
+    
+    for classes in (None, np.full(len(X), 2)):
+        proba, bias, contributions = forest.contributions(X, classes)
+        explained = np.argmax(expected, axis=1) if classes is None else classes
+        assert np.array_equal(proba, expected)
+        assert contributions.shape == X.shape
+        assert np.max(np.abs(bias + contributions.sum(axis=1) - expected[np.arange(len(X)), explained])) <= 1e-12
+    
+    cat_data, questionnaire = {"age": 4, "gender": "female"}, {'phlegmGreen': True, 'fever': True}
+    plain = model.predict(cat_data, questionnaire)
+    explained = model.predict(cat_data, questionnaire, explain=True)
+    assert 'attributions' not in plain
+    assert explained['all_probabilities'] == plain['all_probabilities']
+    attributions = explained['attributions']
+    total = attributions['baseline'] + sum(attributions['contributions'].values()) + attributions['other']
+    assert abs(total - explained['confidence']) < 0.5
+    points = [abs(value) for value in attributions['contributions'].values()]
+    assert points == sorted(points, reverse=True) and len(points) <= model.attribution_top_k
+    # phlegmGreen sets Sneezing, which moves the predicted class
+    assert attributions['contributions'].get(QUESTIONNAIRE_MAPPING['phlegmGreen'], 0) != 0
+    
+    # The second call is served from the cache entry the first one filled
+    hits = model.cache.hits
+    assert model.predict_batch([(cat_data, questionnaire)], explain=True)[0] == explained
+    assert model.cache.hits == hits + 1
+    
+    print(f"✅ Baseline {attributions['baseline']} + {len(points)} contributions + other = {total:.2f}% confidence")
+
+def test_lookup_table():
+    """Table rows equal live inference; inputs outside the table fall back to the forest"""
+    
+    print("🧪 Testing default-vitals lookup table...")
+    
+    plain = PurrPalTabularModel(cache_size=0, lookup_table_path="")
+    schema = plain.feature_schema
+    rng = random.Random(5)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "lookup.npy"
+        table = LookupTable.build(schema, plain.predict_proba, list(plain.class_names), plain.fingerprint(),
+                                  str(path), age_range=(1, 3))
+        assert table.n_keys == 3 << (len(symptom_features()) + 1) and table.stats()['size_bytes'] > 0
         
-        questionnaire_data = {
-            'cough': True,
-            'breathingDifficulty': False,
-            'fever': True,
-            'discomfort': True,
-            'appetiteLoss': True,
-            'weightLoss': False,
-            'vomiting': False,
-            'diarrhea': False,
-            'skinLesions': False,
-            'nasalDischarge': True,
-            'eyeDischarge': False,
-            'nightSweats': False,
-            'phlegmGreen': True,
-            'phlegmBlood': False,
-            'yellowPhlegm': False,
-            'breathingSound': False
-        }
+        # Every stored row is the forest's answer for the row its key decodes to
+        keys = np.array(rng.sample(range(table.n_keys), 500), dtype=np.int64)
+        expected = plain.predict_proba(schema.standardize(table.decode(keys, schema)))
+        assert np.array_equal(table.table[keys], expected)
+        
+        model = PurrPalTabularModel(cache_size=0, lookup_table_path=str(path))
+        assert model.lookup_table is not None
+        
+        question_ids = list(QUESTIONNAIRE_MAPPING)
+        inside = [({"age": rng.choice([1, 2.0, 3]), "gender": rng.choice(["male", "female"])},
+                   {q: rng.random() < 0.3 for q in question_ids}) for _ in range(50)]
+        outside = [
+            ({"age": 7, "gender": "male"}, {'cough': True}),
+            ({"age": 2.5, "gender": "female"}, {'fever': True}),
+            ({"age": 2, "gender": "male", "weight": 5.2}, {'cough': True}),
+            ({"age": 2, "gender": "male", "heart_rate": 150}, {}),
+        ]
+        results = model.predict_batch(inside + outside)
+        assert (model.lookup_table.hits, model.lookup_table.misses) == (len(inside), len(outside))
+        for (cat_data, questionnaire), result in zip(inside + outside, results):
+            assert result['all_probabilities'] == plain.predict(cat_data, questionnaire)['all_probabilities']
+        
+        # A table built for other model files is ignored, not served
+        meta_path = path.with_suffix('.json')
+        meta = json.loads(meta_path.read_text())
+        meta_path.write_text(json.dumps({**meta, 'fingerprint': 'stale'}))
+        stale = PurrPalTabularModel(cache_size=0, lookup_table_path=str(path))
+        assert stale.lookup_table is None
+        assert stale.predict(*inside[0])['all_probabilities'] == results[0]['all_probabilities']
+    
+    print(f"✅ {table.n_keys} table entries match live inference")
+
+def test_model_bundle():
+    """A compiled bundle serves the joblib model's predictions; stale or broken bundles fall back"""
+    
+    print("🧪 Testing precompiled model bundle...")
+    
+    arrays = {"values": np.arange(10, dtype=np.float64).reshape(2, 5), "names": np.array(["a", "bc"]),
+              "flags": np.array([True, False, True])}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "arrays.bundle"
+        model_bundle.write_bundle(str(path), arrays, {"answer": 42})
+        meta, loaded = model_bundle.read_bundle(str(path))
+        assert meta == {"answer": 42} and list(loaded) == list(arrays)
+        for name, array in arrays.items():
+            assert loaded[name].dtype == array.dtype and np.array_equal(loaded[name], array)
+            assert not loaded[name].flags.writeable
+        
+        joblib_model = PurrPalTabularModel(backend="native", cache_size=0, lookup_table_path="", bundle_path="")
+        bundle_path = Path(tmp) / "model.bundle"
+        compiled = model_bundle.compile_bundle("models", str(bundle_path), model_version="test")
+        assert compiled['fingerprint'] == joblib_model.fingerprint()
+        
+        model = PurrPalTabularModel(backend="native", cache_size=0, lookup_table_path="",
+                                    bundle_path=str(bundle_path))
+        assert model.bundle_meta['model_version'] == "test" and model.model is None
+        assert model.fingerprint() == joblib_model.fingerprint()
+        items = [({"age": age, "gender": gender}, {'cough': age % 2 == 0, 'fever': age % 3 == 0})
+                 for age in range(12) for gender in ("male", "female")]
+        for expected, result in zip(joblib_model.predict_batch(items), model.predict_batch(items)):
+            assert result == expected
         
-        print("✅ Test data prepared!")
+        # A bundle compiled from other model files, or not a bundle at all, loads the joblib files instead
+        meta, loaded = model_bundle.read_bundle(str(bundle_path))
+        stale_path = Path(tmp) / "stale.bundle"
+        model_bundle.write_bundle(str(stale_path), loaded, {**meta, 'fingerprint': 'stale'})
+        broken_path = Path(tmp) / "broken.bundle"
+        broken_path.write_bytes(b"not a bundle")
+        for fallback_path in (stale_path, broken_path, Path(tmp) / "missing.bundle"):
+            fallback = PurrPalTabularModel(backend="native", cache_size=0, lookup_table_path="",
+                                           bundle_path=str(fallback_path))
+            assert fallback.bundle_meta is None and fallback.model is not None
+            assert fallback.predict_batch(items[:4]) == joblib_model.predict_batch(items[:4])
+    
+    print(f"✅ Bundle {compiled['model_version']} matches the joblib model")
+
+def test_inference_executor():
+    """Calls beyond workers + queue are rejected, slow calls time out and queued ones are dropped"""
+    
+    print("🧪 Testing inference executor...")
+    
+    class SlowModel:
+        def __init__(self):
+            self.started = threading.Event()
+            self.release = threading.Event()
+            self.calls = []
         
-        # Test preprocessing
-        print("\n3. Testing preprocessing...")
-        X = model.preprocess_input(cat_data, questionnaire_data)
-        print(f"✅ Preprocessing successful! Shape: {X.shape}")
+        def wait(self, value):
+            self.calls.append(value)
+            self.started.set()
+            assert self.release.wait(5)
+            return value
         
-        # Test model transformation
-        print("\n4. Testing model transformation...")
-        X_processed = model.preprocessor.transform(X)
-        print(f"✅ Model transformation successful! Shape: {X_processed.shape}")
+        def fail(self):
+            raise ValueError("boom")
+    
+    async def scenario(executor, model):
+        first = asyncio.ensure_future(executor.call("wait", 1))
+        assert await asyncio.to_thread(model.started.wait, 5)
+        queued = asyncio.ensure_future(executor.call("wait", 2, timeout=0.05))
+        await asyncio.sleep(0)
+        assert executor.stats()['queue_depth'] == 1
+        
+        try:
+            await executor.call("wait", 3)
+        except ExecutorOverloaded:
+            pass
+        else:
+            raise AssertionError("Third call should be rejected")
+        
+        try:
+            await queued
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("Queued call should time out")
+        await asyncio.sleep(0.01)  # Let the cancellation reach the pool future
+        
+        third = asyncio.ensure_future(executor.call("wait", 3))
+        model.release.set()
+        assert await first == 1 and await third == 3
+        try:
+            await executor.call("fail")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Model errors should propagate")
+    
+    model = SlowModel()
+    executor = InferenceExecutor(model=model, workers=1, max_queue=1, timeout=5)
+    try:
+        asyncio.run(scenario(executor, model))
+    finally:
+        executor.shutdown()
+    
+    stats = executor.stats()
+    assert model.calls == [1, 3], "The timed-out call should never start"
+    assert (stats['submitted'], stats['completed'], stats['failed']) == (4, 2, 1)
+    assert (stats['rejected'], stats['timed_out'], stats['cancelled']) == (1, 1, 1)
+    assert stats['in_flight'] == 0 and stats['max_queue_depth'] == 1
+    
+    print("✅ Inference executor rejects, times out and cancels correctly")
+
+def test_prediction_cache():
+    """Cached predictions must equal uncached ones and respect the size bound"""
+    
+    print("🧪 Testing prediction cache...")
+    
+    cached_model = PurrPalTabularModel(cache_size=2)
+    plain_model = PurrPalTabularModel(cache_size=0)
+    cat_data = {"name": "Mochi", "age": 3.0, "gender": "female"}
+    
+    first = cached_model.predict(cat_data, {'phlegmGreen': True})
+    # Different name and an aliased questionnaire key vectorize to the same row
+    second = cached_model.predict({**cat_data, "name": "Luna"}, {'yellowPhlegm': True})
+    expected = plain_model.predict(cat_data, {'phlegmGreen': True})
+    assert first['all_probabilities'] == second['all_probabilities'] == expected['all_probabilities']
+    assert cached_model.cache.hits == 1 and cached_model.cache.misses == 1
+    
+    # By default vitals are keyed and scored exactly as sent
+    vitals = {**cat_data, "weight": 4.237, "body_temperature": 39.148, "heart_rate": 131.6}
+    assert cached_model.cache.decimals is None
+    assert (cached_model.predict(vitals, {'cough': True})['all_probabilities']
+            == plain_model.predict(vitals, {'cough': True})['all_probabilities'])
+    block = np.array([[4.237, -0.0]])
+    assert cached_model.cache.canonicalize(block.copy()).tolist() == [[4.237, 0.0]]
+    assert PredictionCache(decimals=2).canonicalize(block.copy()).tolist() == [[4.24, 0.0]]
+    
+    for question_id in ['fever', 'vomiting']:
+        cached_model.predict(cat_data, {question_id: True})
+    assert len(cached_model.cache) == 2 and cached_model.cache.evictions == 2
+    
+    cached_model.load_models()
+    assert len(cached_model.cache) == 0 and cached_model.cache.invalidations == 1
+    
+    print("✅ Prediction cache behaves correctly")
+
+def test_feature_codecs():
+    """Feature blocks must score exactly like questionnaire inputs"""
+    
+    print("🧪 Testing feature block ingestion...")
+    
+    model = PurrPalTabularModel()
+    schema = model.feature_schema
+    cat_data = {"name": "Mochi", "age": 3.0, "gender": "male", "weight": 4.2,
+                "body_temperature": 39.1, "duration_days": 4, "heart_rate": 130}
+    questionnaire_data = {'cough': True, 'fever': True, 'nasalDischarge': True}
+    expected = model.predict(cat_data, questionnaire_data)
+    
+    # Missing columns take the vectorize defaults; integer vitals are truncated
+    columns = {'Age': [3], 'Weight': [4.2], 'Body_Temperature': [39.1], 'Duration_days': [4],
+               'Heart_Rate': [130.9], 'Coughing': [1], 'Fever': [1], 'Nasal_Discharge': [1], 'Gender_Male': [1]}
+    block = feature_codecs.decode_block(json.dumps(columns).encode(), feature_codecs.JSON, schema)
+    assert block.tobytes() == schema.vectorize_many([(cat_data, questionnaire_data)]).tobytes()
+    
+    buffer = io.BytesIO()
+    np.save(buffer, block)
+    assert feature_codecs.decode_block(buffer.getvalue(), feature_codecs.NPY, schema).tobytes() == block.tobytes()
+    
+    _, probabilities = model.predict_block(block)
+    body = json.loads(feature_codecs.encode_predictions(feature_codecs.JSON, probabilities, model.class_keys))
+    assert body['probabilities'][0] == list(expected['all_probabilities'].values())
+    assert body['confidence'][0] == expected['confidence']
+    assert body['predicted_disease'][0] == expected['predicted_disease']
+    
+    npy = feature_codecs.encode_predictions(feature_codecs.NPY, probabilities, model.class_keys)
+    assert (np.load(io.BytesIO(npy)) == np.array(body['probabilities'])).all()
+    
+    for invalid in ({'Fever': [0.5]}, {'Unknown': [1]}, {'Age': [1, 2], 'Fever': [1]}, {'Age': [float('nan')]}):
+        try:
+            schema.block_from_columns(invalid)
+        except ValueError:
+            continue
+        raise AssertionError(f"Accepted invalid columns {invalid}")
+    
+    assert feature_codecs.negotiate(None, feature_codecs.NPY) == feature_codecs.NPY
+    assert feature_codecs.negotiate("*/*", feature_codecs.JSON) == feature_codecs.JSON
+    assert feature_codecs.negotiate("text/html, application/x-npy;q=0.5", feature_codecs.JSON) == feature_codecs.NPY
+    try:
+        feature_codecs.negotiate("text/html", feature_codecs.JSON)
+        raise AssertionError("Negotiated an unsupported type")
+    except feature_codecs.NotAcceptable:
+        pass
+    
+    print("✅ Feature blocks match the questionnaire path")
+
+def test_bulk_stream_reader():
+    """Uploads split into the same lines whatever the chunk boundaries"""
+    
+    print("🧪 Testing streaming upload reader...")
+    
+    body = b"\xef\xbb\xbfid,name,cough\r\n\n" + b"r1,Mochi,true\r\n" + b"x" * 100 + b"\nr2,Luna,0"
+    expected = [(1, b"id,name,cough"), (3, b"r1,Mochi,true"), (4, None), (5, b"r2,Luna,0")]
+    
+    async def read(chunk_size, content_type="text/csv"):
+        async def chunks():
+            for start in range(0, len(body), chunk_size):
+                yield body[start:start + chunk_size]
+        reader = UploadReader(content_type, max_line_bytes=64)
+        lines = [line async for line in reader.lines(chunks())]
+        return reader.format, lines
+    
+    for chunk_size in (1, 7, 64, len(body)):
+        assert asyncio.run(read(chunk_size)) == ("csv", expected), chunk_size
+    
+    # Multipart uploads yield the file part only
+    boundary = b"testboundary"
+    multipart = (
+        b"--" + boundary + b"\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nignored\r\n"
+        b"--" + boundary + b"\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.csv\"\r\n\r\n"
+        + body + b"\r\n--" + boundary + b"--\r\n"
+    )
+    body = multipart
+    for chunk_size in (5, len(body)):
+        assert asyncio.run(read(chunk_size, "multipart/form-data; boundary=testboundary")) == ("csv", expected)
+    
+    decoder = CsvDecoder(["name", "age"], ["cough"])
+    assert decoder.decode(b"id,name,cough,extra") is None
+    assert decoder.decode(b'r1,"Mochi, Jr.",true,x') == {
+        "cat_info": {"name": "Mochi, Jr."}, "questionnaire": {"cough": "true"}, "id": "r1"
+    }
+    assert decoder.ignored_columns == ["extra"]
+    
+    print("✅ Upload lines, multipart parts and CSV rows decode correctly")
+
+def test_batch_score():
+    """Dataset columns map onto the same features as the questionnaire, chunk by chunk"""
+    
+    print("🧪 Testing offline batch scoring...")
+    
+    model = PurrPalTabularModel()
+    schema = model.feature_schema
+    cat_data = {"name": "Mochi", "age": 3.0, "gender": "male", "weight": 4.2,
+                "body_temperature": 39.1, "duration_days": 14, "heart_rate": 130}
+    questionnaire_data = {'cough': True, 'fever': True, 'nasalDischarge': True}
+    
+    # Columns as in cleaned_animal_disease_prediction.csv
+    frame = pd.DataFrame({
+        'Animal_Type': ['Cat', 'Cat', 'Dog'], 'Age': [3, 3, 5], 'Gender': ['Male', 'Male', 'Female'],
+        'Weight': [4.2, 4.2, 20.0], 'Symptom_1': ['Fever', 'Fever', 'No'], 'Symptom_2': ['No', 'No', 'No'],
+        'Duration': ['2 weeks', '2 weeks', '3 days'], 'Coughing': ['Yes', 'Yes', 'No'],
+        'Nasal_Discharge': ['Yes', 'Yes', 'No'], 'Body_Temperature': ['39.1°C', '39.1°C', 'hot'],
+        'Heart_Rate': [130, 130, 90],
+    })
+    block, errors = batch_score.map_dataset(frame, schema)
+    assert errors == [None, None, "Invalid values for Body_Temperature"]
+    assert block[:1].tobytes() == schema.vectorize_many([(cat_data, questionnaire_data)]).tobytes()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        # Line-aligned chunks cover every row once
+        path = Path(tmp) / "cats.csv"
+        frame.iloc[[0, 2, 1] * 5].to_csv(path, index=False)
+        header, chunks = batch_score.plan_csv(path, 40)
+        assert header == list(frame.columns) and len(chunks) > 1
+        assert [chunk.first_row for chunk in chunks] == list(np.cumsum([0] + [c.rows for c in chunks[:-1]]))
+        assert sum(chunk.rows for chunk in chunks) == 15
         
-        # Test prediction
-        print("\n5. Testing full prediction...")
-        result = model.predict(cat_data, questionnaire_data)
-        print("✅ Prediction successful!")
-        print(f"   Predicted disease: {result['predicted_disease']}")
-        print(f"   Confidence: {result['confidence']}%")
-        print(f"   Active symptoms: {result['feature_summary']}")
+        expected = model.predict(cat_data, questionnaire_data)
+        output = Path(tmp) / "predictions.csv"
+        args = [str(path), "--output", str(output), "--workers", "1", "--chunk-mb", str(100 / 2 ** 20),
+                "--filter", "Animal_Type=Cat", "--keep-parts"]
+        summary = batch_score.run(batch_score.build_parser().parse_args(args))
+        assert (summary["scored"], summary["failed"]) == (10, 0)
+        result = pd.read_csv(output)
+        assert result["row"].tolist() == [0, 2, 3, 5, 6, 8, 9, 11, 12, 14]
+        assert (result["predicted_disease"] == expected['predicted_disease']).all()
+        assert result.iloc[0][model.class_keys].tolist() == list(expected['all_probabilities'].values())
         
-        print("\n" + "=" * 50)
-        print("🎉 ALL TESTS PASSED! Model is working correctly.")
-        return True
+        # Finished chunks are not scored again
+        summary = batch_score.run(batch_score.build_parser().parse_args(args))
+        assert summary["resumed_rows"] == 15 and summary["scored"] == 0
+        assert pd.read_csv(output).equals(result)
+    
+    print("✅ Batch scoring maps, chunks and resumes correctly")
+
+def test_model_registry():
+    """Versions load once on first use, the coldest is evicted over budget and swaps replace models"""
+    
+    print("🧪 Testing model registry...")
+    
+    loads = []
+    
+    def loader(name, spec):
+        loads.append(name)
+        return {"name": name, "path": spec["path"]}
+    
+    versions = {name: {"path": f"models/{name}"} for name in ("v1", "v2", "v3")}
+    registry = ModelRegistry(loader, versions, "v1", memory_budget_bytes=250, size_of=lambda model: 100)
+    
+    assert loads == [] and registry.get(None, load=False) is None
+    assert registry.get()["name"] == "v1" and registry.get("v1") is registry.get()
+    assert registry.get("v2")["name"] == "v2" and loads == ["v1", "v2"]
+    
+    # Over budget: v2 is the coldest version that is not the default
+    registry.get("v3")
+    stats = registry.stats()
+    assert stats["loaded"] == ["v3", "v1"] and stats["resident_bytes"] == 200
+    assert stats["versions"]["v2"]["evictions"] == 1 and not stats["versions"]["v2"]["loaded"]
+    
+    registry.get("v2")
+    assert loads == ["v1", "v2", "v3", "v2"] and registry.get("v3", load=False) is None
+    
+    old = registry.get("v2")
+    registry.swap("v2", {"path": "models/v2-retrained"})
+    assert registry.get("v2") is not old and registry.get("v2")["path"] == "models/v2-retrained"
+    assert old["path"] == "models/v2"  # Calls holding the old model are unaffected
+    
+    for name in ("nope", "v4"):
+        try:
+            registry.get(name)
+        except UnknownModelVersion:
+            pass
+        else:
+            raise AssertionError(f"{name} should be unknown")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "registry.json"
+        source.write_text(json.dumps({"default": "a", "versions": {"a": "models/a", "b": "models/b"}}))
+        registry = ModelRegistry(loader, {"a": {"path": "models/a"}, "b": {"path": "models/b"}}, "a",
+                                 source=str(source))
+        registry.get("b")
+        source.write_text(json.dumps({"default": "c", "versions": {"b": "models/b2", "c": "models/c"}}))
+        summary = registry.reload()
+        assert summary == {"default": "c", "added": ["c"], "removed": ["a"], "swapped": ["b"]}
+        assert registry.get()["name"] == "c" and registry.get("b")["path"] == "models/b2"
+    
+    print("✅ Model registry behaves correctly")
+
+def test_micro_batcher():
+    """Concurrent submissions are scored together and routed back in order"""
+    
+    print("🧪 Testing micro-batcher...")
+    
+    model = PurrPalTabularModel(cache_size=0)
+    calls = []
+    
+    async def run_batch(items):
+        calls.append(len(items))
+        return model.predict_batch(items)
+    
+    async def submit_all(batcher, items):
+        return await asyncio.gather(*[batcher.submit(item) for item in items])
+    
+    items = [({"age": age, "gender": "male"}, {'cough': age % 2 == 0}) for age in range(10)]
+    batcher = MicroBatcher(run_batch, max_wait_ms=50, max_batch=4)
+    results = asyncio.run(submit_all(batcher, items))
+    
+    assert calls == [4, 4, 2]
+    for (cat_data, questionnaire), result in zip(items, results):
+        assert result['all_probabilities'] == model.predict(cat_data, questionnaire)['all_probabilities']
+    assert batcher.stats()['items'] == 10 and batcher.stats()['batches'] == 3
+    
+    # Batches run outside the submitting request's context
+    request_id = contextvars.ContextVar("request_id", default=None)
+    seen = []
+    
+    async def record_context(items):
+        seen.append(request_id.get())
+        return items
+    
+    async def submit_in_request(batcher, item):
+        request_id.set("request-1")
+        return await batcher.submit(item)
+    
+    assert asyncio.run(submit_in_request(MicroBatcher(record_context, max_wait_ms=1), "a")) == "a"
+    assert seen == [None]
+    
+    # A batch that cannot be started fails its requests instead of leaving them waiting
+    async def submit_without_tasks(batcher, items):
+        submissions = [asyncio.ensure_future(batcher.submit(item)) for item in items]
+        await asyncio.sleep(0)
+        loop = asyncio.get_running_loop()
+        def refuse(coroutine):
+            raise RuntimeError("no tasks")
+        loop.create_task = refuse
+        try:
+            return await asyncio.wait_for(asyncio.gather(*submissions, return_exceptions=True), 5)
+        finally:
+            del loop.create_task
+    
+    batcher = MicroBatcher(record_context, max_wait_ms=1)
+    errors = asyncio.run(submit_without_tasks(batcher, ["a", "b"]))
+    assert [str(error) for error in errors] == ["no tasks", "no tasks"]
+    assert batcher.stats()['failed_batches'] == 1
+    
+    print("✅ Micro-batcher behaves correctly")
+
+def test_diagnosis_catalog():
+    """Precompiled texts pick the right tier and fall back for unknown diseases"""
+    
+    print("🧪 Testing diagnosis catalog...")
+    
+    model = PurrPalTabularModel(cache_size=0)
+    catalog = DiagnosisCatalog(list(model.class_names))
+    
+    diagnosis, recommendations = catalog.render('Feline Herpesvirus', 85.04, ['Batuk', 'Demam'])
+    assert '<strong>Feline Herpesvirus (FHV-1)</strong>' in diagnosis
+    assert diagnosis.endswith('85.0% (tinggi)') and 'Batuk, Demam' in diagnosis
+    assert recommendations.startswith('• Gunakan humidifier') and 'Penting' in recommendations
+    assert catalog.render('Feline Herpesvirus', 59.9, [])[0].endswith('59.9% (rendah)')
+    
+    diagnosis, recommendations = catalog.render('Unknown Disease', 70.0, [])
+    assert '<strong>Unknown Disease</strong>' in diagnosis and diagnosis.endswith('(sedang)')
+    
+    assert catalog.disease_id(model.class_names[2]) == 2 and catalog.disease_id('Unknown Disease') == -1
+    assert catalog.etag == DiagnosisCatalog(list(model.class_names)).etag
+    assert catalog.etag != DiagnosisCatalog(list(model.class_names)[:-1]).etag
+    
+    print("✅ Diagnosis catalog behaves correctly")
+
+def test_structured_logging():
+    """Queued JSON records carry the request id and stages; unsampled info logs are dropped"""
+    
+    print("🧪 Testing structured logging...")
+    
+    stream = io.StringIO()
+    structured_logging.setup_logging("test", stream=stream)
+    test_logger = logging.getLogger("purrpal.test")
+    try:
+        context, token = structured_logging.begin_request("req-1", rate=1.0)
+        with structured_logging.stage("score"):
+            pass
+        test_logger.info("kept %s", "info", extra={"stages": context.stages})
+        structured_logging.end_request(token)
         
-    except Exception as e:
-        print(f"\n❌ TEST FAILED: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        context, token = structured_logging.begin_request("req-2", rate=0.0)
+        assert not structured_logging.sampled()
+        test_logger.info("dropped info")
+        test_logger.warning("kept warning")
+        structured_logging.end_request(token)
+    finally:
+        structured_logging.shutdown_logging()
+    
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record["message"] for record in records] == ["kept info", "kept warning"]
+    assert records[0]["request_id"] == "req-1" and "score" in records[0]["stages"]
+    assert records[1]["request_id"] == "req-2" and records[1]["level"] == "WARNING"
+    
+    print("✅ Structured logging behaves correctly")
+
+def test_service_metrics():
+    """Histograms export cumulative buckets and counters group status codes by class"""
+    
+    print("🧪 Testing service metrics...")
+    
+    registry = service_metrics.Registry()
+    latency = service_metrics.Histogram("test_seconds", "Test latency", ["stage"],
+                                        buckets=(0.01, 0.1), registry=registry)
+    requests = service_metrics.Counter("test_total", "Test requests", ["status"], registry=registry)
+    for value in (0.005, 0.05, 0.05, 5.0):
+        latency.labels("score").observe(value)
+    requests.labels("2xx").inc()
+    requests.labels("2xx").inc()
+    
+    lines = registry.exposition().splitlines()
+    assert '# TYPE test_seconds histogram' in lines
+    assert 'test_seconds_bucket{stage="score",le="0.01"} 1.0' in lines
+    assert 'test_seconds_bucket{stage="score",le="0.1"} 3.0' in lines
+    assert 'test_seconds_bucket{stage="score",le="+Inf"} 4.0' in lines
+    assert 'test_seconds_count{stage="score"} 4.0' in lines
+    assert 'test_total{status="2xx"} 2.0' in lines
+    
+    # The process-wide registry also counts the requests of earlier tests
+    def samples():
+        return dict(line.rsplit(" ", 1) for line in service_metrics.REGISTRY.exposition().splitlines()
+                    if not line.startswith("#"))
+    
+    requests_sample = 'purrpal_http_requests_total{route="/test",method="GET",status="5xx"}'
+    stage_sample = 'purrpal_stage_duration_seconds_bucket{stage="score",le="0.0025"}'
+    before = samples()
+    service_metrics.observe_request("/test", "GET", 503, 0.2, {"score": 1.5})
+    after = samples()
+    assert after[requests_sample] == '1.0' and requests_sample not in before
+    assert float(after[stage_sample]) == float(before.get(stage_sample, 0)) + 1
+    
+    print("✅ Service metrics behave correctly")
 
 if __name__ == "__main__":
-    success = test_preprocessing()
-    if not success:
-        exit(1)
\ No newline at end of file
+    test_predict_batch()
+    test_predict_batch_endpoint()
+    test_feature_schema_equivalence()
+    test_native_forest_matches_sklearn()
+    test_early_exit_voting()
+    test_feature_attributions()
+    test_lookup_table()
+    test_model_bundle()
+    test_inference_executor()
+    test_prediction_cache()
+    test_feature_codecs()
+    test_bulk_stream_reader()
+    test_batch_score()
+    test_model_registry()
+    test_micro_batcher()
+    test_diagnosis_catalog()
+    test_structured_logging()
+    test_service_metrics()
+    test_preprocessing()
\ No newline at end of file
@@ -1,43 +1,226 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
+from PIL import UnidentifiedImageError
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
+import json
+import time
 import logging
-from model_handler import ModelHandler
+from purrpal_common.structured_logging import setup_logging, begin_request, end_request, sampled, stage, logging_stats
+from purrpal_common import service_metrics
+from purrpal_common.service_metrics import IN_FLIGHT, MODEL_LOAD_SECONDS, PREDICTIONS
+from model_handler import ModelHandler, MAX_BATCH_IMAGES
+from image_decoder import ImageTooLarge
+from purrpal_common.model_registry import ModelRegistry, UnknownModelVersion, MODEL_HEADER, MODEL_QUERY_PARAM
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (queued, structured; see purrpal_common/structured_logging.py)
+setup_logging("vision")
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("purrpal.access")
 
 app = Flask(__name__)
 CORS(app)
 
+
+@app.before_request
+def start_request_context():
+    """Give the request an id (X-Request-ID header or a new one) and a stage timer."""
+    request_id = request.headers.get('X-Request-ID')
+    g.log_context, g.log_token = begin_request(request_id[:64] if request_id else None)
+    IN_FLIGHT.inc()
+
+
+@app.after_request
+def log_request(response):
+    """Log one structured line per request, record its metrics and echo the request id."""
+    context = g.log_context
+    response.headers['X-Request-ID'] = context.request_id
+    status = response.status_code
+    service_metrics.observe_request(
+        request.url_rule.rule if request.url_rule is not None else "other", request.method, status,
+        time.perf_counter() - context.started, context.stages
+    )
+    if sampled() or status >= 500:
+        access_logger.log(
+            logging.ERROR if status >= 500 else logging.INFO,
+            "%s %s %d", request.method, request.path, status,
+            extra={"status": status, "duration_ms": context.elapsed_ms(), "stages": context.stages}
+        )
+    return response
+
+
+@app.teardown_request
+def end_request_context(exc):
+    token = g.pop('log_token', None)
+    if token is not None:
+        IN_FLIGHT.dec()
+        end_request(token)
+
 # Configuration
 MODEL_PATH = os.getenv('MODEL_PATH', 'models/cat_disease.h5')
 CLASS_MAP_PATH = os.getenv('CLASS_MAP_PATH', 'models/class_map.json')
 CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', '0.5'))
+# Largest /predict/upload body; the pixel limit is MAX_IMAGE_PIXELS (image_decoder.py)
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 20 * 1024 * 1024))
+# Largest /predict/batch multipart body (images per request: MAX_BATCH_IMAGES, model_handler.py)
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv('MAX_BATCH_UPLOAD_BYTES', 100 * 1024 * 1024))
+
+# Model versions, loaded on first use (configured by MODEL_* env variables, see purrpal_common/model_registry.py)
+model_registry = None
+
+# Default model version
+model_handler = None
+
+
+def load_model_version(name, spec):
+    """ModelRegistry loader: spec "path" is the .h5 model, "class_map" its class map (default CLASS_MAP_PATH)."""
+    logger.info("Loading model version %s from %s", name, spec["path"])
+    return ModelHandler(spec["path"], spec.get("class_map", CLASS_MAP_PATH))
+
+
+def load_model_handler():
+    """Load the default model version once per process."""
+    global model_handler, model_registry
+    if model_handler is None:
+        try:
+            load_started = time.perf_counter()
+            if model_registry is None:
+                model_registry = ModelRegistry.from_env(
+                    load_model_version, {"path": MODEL_PATH, "class_map": CLASS_MAP_PATH}, ModelHandler.memory_bytes
+                )
+            model_handler = model_registry.get()
+            MODEL_LOAD_SECONDS.set(time.perf_counter() - load_started)
+            model_registry.watch()
+            logger.info("Model handler initialized successfully")
+        except Exception as e:
+            logger.exception("Failed to initialize model handler: %s", e)
+            raise
+    return model_handler
+
+
+def request_model():
+    """(version, handler) named by the X-Model-Version header or ?model=, else the default version."""
+    version = model_registry.resolve(request.headers.get(MODEL_HEADER) or request.args.get(MODEL_QUERY_PARAM))
+    with stage("model_load"):
+        return version, model_registry.get(version)
+
 
-# Initialize model handler
-try:
-    model_handler = ModelHandler(MODEL_PATH, CLASS_MAP_PATH)
-    logger.info("Model handler initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize model handler: {e}")
-    raise
+# Initialize model handler. gunicorn.conf.py turns this off and loads the model in each
+# worker after the fork instead: TensorFlow hangs in a child forked after it has run.
+if os.getenv('LOAD_MODEL_ON_IMPORT', '1') == '1':
+    load_model_handler()
+
+def with_notes(message, e):
+    """Error message followed by the notes on the exception (e.g. which image of a batch failed)."""
+    notes = getattr(e, '__notes__', None)
+    return f"{message} ({'; '.join(notes)})" if notes else message
+
+@app.errorhandler(UnknownModelVersion)
+def unknown_model_version(e):
+    return jsonify({"success": False, "error": str(e)}), 404
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit = request.max_content_length or MAX_UPLOAD_BYTES
+    return jsonify({"success": False, "error": f"Upload too large (max {limit:,} bytes)"}), 413
+
+@app.errorhandler(ImageTooLarge)
+def image_too_large(e):
+    return jsonify({"success": False, "error": with_notes(str(e), e)}), 413
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint."""
+    """Health check endpoint (default model version, see /models for all); 503 until it is warmed up."""
+    handler = model_registry.get(load=False) if model_registry is not None else None
+    if handler is None or handler.warmup_seconds is None:
+        return jsonify({"status": "warming_up", "model_loaded": False}), 503
     return jsonify({
         "status": "healthy",
-        "model_loaded": model_handler.model is not None,
-        "class_map_loaded": len(model_handler.class_map) > 0
+        "model_loaded": handler.model is not None,
+        "model_version": model_registry.default,
+        "class_map_loaded": len(handler.class_map) > 0,
+        "warmup_seconds": round(handler.warmup_seconds, 3),
+        "xla": handler.xla,
+        "batching": handler.scheduler.stats() if handler.scheduler is not None else None,
+        "logging": logging_stats()
     })
 
+@app.route('/catalog', methods=['GET'])
+def catalog():
+    """Diagnosis texts per class, versioned with an ETag for client-side caching."""
+    version, handler = request_model()
+    response = jsonify(handler.catalog_payload())
+    response.headers[MODEL_HEADER] = version
+    response.set_etag(handler.catalog_etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    # Answers 304 Not Modified when If-None-Match matches
+    return response.make_conditional(request)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of request, stage and prediction metrics."""
+    if not service_metrics.METRICS_ENABLED:
+        return jsonify({"error": "Metrics disabled"}), 404
+    return service_metrics.REGISTRY.exposition(), 200, {"Content-Type": service_metrics.CONTENT_TYPE}
+
+@app.route('/models', methods=['GET'])
+def models():
+    """Model versions with their load time, resident size and usage in this worker."""
+    return jsonify(model_registry.stats())
+
+@app.route('/models/reload', methods=['POST'])
+def reload_models():
+    """Re-read the model registry and swap changed versions (or ?version=) in without a restart."""
+    global model_handler
+    try:
+        with stage("model_load"):
+            summary = model_registry.reload(request.args.get('version'))
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid model registry: {e}"}), 400
+    except UnknownModelVersion:
+        raise
+    except Exception as e:
+        logger.exception("Model reload failed: %s", e)
+        return jsonify({"success": False, "error": f"Reload failed, previous models still serving: {e}"}), 500
+    model_handler = model_registry.get()
+    return jsonify({"success": True, **summary, "models": model_registry.stats()})
+
+def count_prediction(handler, prediction, compact):
+    """Count a prediction result by disease in the predictions metric."""
+    if compact:
+        PREDICTIONS.labels(handler.class_map.get(prediction["disease_id"], "No confident prediction")).inc()
+    else:
+        PREDICTIONS.labels(prediction["predicted_disease"]).inc()
+
+def prediction_response(version, handler, image_data, cat_info):
+    """Run the prediction and render the /predict response (?format=compact returns codes only)."""
+    compact = request.args.get('format') == 'compact'
+    prediction = handler.predict(
+        image_data,
+        confidence_threshold=CONFIDENCE_THRESHOLD,
+        compact=compact
+    )
+    count_prediction(handler, prediction, compact)
+
+    # Add cat info to response
+    if not compact:
+        prediction['cat_info'] = cat_info
+
+    with stage("render"):
+        response = jsonify({
+            "success": True,
+            "data": prediction
+        })
+        response.headers[MODEL_HEADER] = version
+        return response
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """Endpoint for making predictions from images."""
     try:
-        data = request.get_json()
+        with stage("parse"):
+            data = request.get_json()
         
         if not data or 'image' not in data:
             return jsonify({
@@ -45,26 +228,139 @@ def predict():
                 "error": "No image data provided"
             }), 400
 
-        # Get image data and cat info
-        image_data = data['image']
-        cat_info = data.get('cat_info', {})
+        version, handler = request_model()
 
-        # Make prediction
-        prediction = model_handler.predict(
-            image_data,
-            confidence_threshold=CONFIDENCE_THRESHOLD
-        )
+        # Get image data and cat info, then predict (texts come from /catalog with ?format=compact)
+        return prediction_response(version, handler, data['image'], data.get('cat_info', {}))
 
-        # Add cat info to response
-        prediction['cat_info'] = cat_info
+    except (UnknownModelVersion, ImageTooLarge):
+        raise
+    except Exception as e:
+        logger.exception("Error processing prediction request: %s", e)
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+def form_cat_info():
+    """cat_info JSON field of a multipart form ({} if absent)."""
+    return json.loads(request.form['cat_info']) if request.form.get('cat_info') else {}
+
+@app.route('/predict/upload', methods=['POST'])
+def predict_upload():
+    """
+    Predict from a binary image, without the base64 and JSON overhead of /predict.
+
+    Accepts multipart/form-data (file field "image", optional "cat_info" JSON
+    field) or a raw image/* body, which is decoded from the bytes as received,
+    without a base64 string or JSON parsing. Bodies above MAX_UPLOAD_BYTES and images above MAX_IMAGE_PIXELS are
+    refused with 413 before they are decoded. Responses are the same as /predict.
+    """
+    # Checked against Content-Length before the body is read, and while streaming without one
+    request.max_content_length = MAX_UPLOAD_BYTES
+    try:
+        cat_info = {}
+        with stage("parse"):
+            if request.mimetype == 'multipart/form-data':
+                upload = request.files.get('image') or next(iter(request.files.values()), None)
+                if upload is None:
+                    return jsonify({"success": False, "error": "No image file in the form (field 'image')"}), 400
+                image_stream = upload.stream
+                cat_info = form_cat_info()
+            elif request.mimetype.startswith('image/'):
+                # Limited to max_content_length: reading past it raises RequestEntityTooLarge
+                image_stream = request.stream
+            else:
+                return jsonify({
+                    "success": False,
+                    "error": "Send multipart/form-data or an image/* body (JSON data URLs go to /predict)"
+                }), 415
+
+        version, handler = request_model()
+        return prediction_response(version, handler, image_stream, cat_info)
 
+    except (UnknownModelVersion, ImageTooLarge, RequestEntityTooLarge):
+        raise
+    except json.JSONDecodeError as e:
+        return jsonify({"success": False, "error": f"Invalid cat_info JSON: {e}"}), 400
+    except UnidentifiedImageError:
+        return jsonify({"success": False, "error": "Unsupported or corrupt image"}), 400
+    except Exception as e:
+        logger.exception("Error processing upload prediction request: %s", e)
         return jsonify({
-            "success": True,
-            "data": prediction
-        })
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict several images of the same cat in one forward pass.
+
+    Accepts JSON {"images": [data URLs], "cat_info": {...}} or
+    multipart/form-data with one "images" file field per image (and an
+    optional "cat_info" JSON field), up to MAX_BATCH_IMAGES images. Images are
+    decoded in parallel and stacked into a single batch. Returns one result
+    per image, in order, and with ?aggregate=true a verdict for the whole
+    set from the mean class probabilities. ?format=compact as for /predict.
+    """
+    request.max_content_length = MAX_BATCH_UPLOAD_BYTES
+    try:
+        compact = request.args.get('format') == 'compact'
+        aggregate = request.args.get('aggregate', '').lower() in ('1', 'true', 'yes')
+        with stage("parse"):
+            if request.mimetype == 'multipart/form-data':
+                images = [upload.stream for upload in request.files.getlist('images') or request.files.getlist('image')]
+                cat_info = form_cat_info()
+            else:
+                data = request.get_json(silent=True) or {}
+                if not isinstance(data, dict):
+                    return jsonify({"success": False, "error": "Request body must be a JSON object"}), 400
+                images = data.get('images')
+                cat_info = data.get('cat_info', {})
+
+        if not isinstance(cat_info, dict):
+            return jsonify({"success": False, "error": "cat_info must be a JSON object"}), 400
+        if not images or not isinstance(images, list):
+            return jsonify({"success": False, "error": "No images provided (a list of data URLs in 'images')"}), 400
+        if len(images) > MAX_BATCH_IMAGES:
+            return jsonify({
+                "success": False,
+                "error": f"Too many images: {len(images)} (max {MAX_BATCH_IMAGES} per batch)"
+            }), 400
+        for i, image_data in enumerate(images):
+            if not hasattr(image_data, 'read') and not (
+                    isinstance(image_data, str) and image_data.startswith('data:image')):
+                return jsonify({"success": False, "error": f"Image {i} of the batch is not an image data URL"}), 400
+
+        version, handler = request_model()
+        result = handler.predict_batch(
+            images,
+            confidence_threshold=CONFIDENCE_THRESHOLD,
+            compact=compact,
+            aggregate=aggregate
+        )
+        for prediction in result["predictions"]:
+            count_prediction(handler, prediction, compact)
+        if not compact:
+            result['cat_info'] = cat_info
+
+        with stage("render"):
+            response = jsonify({
+                "success": True,
+                "data": result
+            })
+            response.headers[MODEL_HEADER] = version
+            return response
 
+    except (UnknownModelVersion, ImageTooLarge, RequestEntityTooLarge):
+        raise
+    except json.JSONDecodeError as e:
+        return jsonify({"success": False, "error": f"Invalid cat_info JSON: {e}"}), 400
+    except UnidentifiedImageError as e:
+        return jsonify({"success": False, "error": with_notes("Unsupported or corrupt image", e)}), 400
     except Exception as e:
-        logger.error(f"Error processing prediction request: {e}")
+        logger.exception("Error processing batch prediction request: %s", e)
         return jsonify({
             "success": False,
             "error": str(e)
@@ -0,0 +1,183 @@
+"""
+Dynamic batching of concurrent single-image forward passes.
+
+A forward pass over one 128x128 image leaves most of the CPU idle, and its
+fixed per-call cost is most of the latency. Request threads hand their
+preprocessed input to BatchScheduler.submit and block. One inference thread
+takes up to max_batch queued inputs, waiting at most the current window
+after the first one arrived, runs one batched forward pass and routes each
+output row back to its request.
+
+The window adapts to the load. It starts at 0: a lone request is run at
+once, so single-request latency stays as before. When requests arrive while
+a forward pass is running, there is concurrency to batch, and the window
+doubles up to max_wait_ms. Each batch of one with no request arriving
+during its pass halves it again, down to 0. The window never exceeds the
+average duration of a forward pass: waiting longer for company costs more
+than running the pass it would save.
+
+Configuration (environment variables):
+    VISION_BATCH_MAX_WAIT_MS  Longest wait for company (default 5, 0 = no batching)
+    VISION_BATCH_MAX_SIZE     Images per forward pass (default 16)
+"""
+
+import bisect
+import collections
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from purrpal_common.service_metrics import Histogram
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# Weight of the latest batch in the average forward-pass duration
+DURATION_SMOOTHING = 0.2
+
+# The inference thread exits after this long without requests and restarts on the
+# next one, so an evicted model version is not kept alive by its thread
+IDLE_SECONDS = 60.0
+
+BATCH_SIZE = Histogram(
+    "purrpal_inference_batch_size", "Images per dynamically batched forward pass", buckets=BATCH_SIZE_BUCKETS
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "purrpal_inference_queue_wait_seconds", "Time an image waited for its batched forward pass"
+)
+
+
+class BatchScheduler:
+    """Coalesces concurrent submit() calls into batched run_batch calls on one inference thread."""
+
+    def __init__(self, run_batch, max_wait_ms=5.0, max_batch=16):
+        """
+        Args:
+            run_batch: Function of an (n, ...) input array returning n output rows in order
+            max_wait_ms: Longest time the first input of a batch waits for company
+            max_batch: Inputs per batch at most
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.run_batch = run_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+        self.window = 0.0
+        self.batch_seconds = None  # Moving average of run_batch durations
+
+        self._pending = collections.deque()  # (input, future, enqueued_at)
+        self._condition = threading.Condition()
+        self._thread = None
+
+        self.batches = 0
+        self.items = 0
+        self.failed_batches = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    @classmethod
+    def from_env(cls, run_batch):
+        """Create a scheduler from the VISION_BATCH_* env variables, or None when disabled (max wait 0)."""
+        max_wait_ms = float(os.environ.get("VISION_BATCH_MAX_WAIT_MS", 5))
+        if max_wait_ms <= 0:
+            return None
+        return cls(run_batch, max_wait_ms=max_wait_ms, max_batch=int(os.environ.get("VISION_BATCH_MAX_SIZE", 16)))
+
+    def submit(self, inputs):
+        """Queue one (1, ...) input and wait for its output row."""
+        future = Future()
+        with self._condition:
+            self._pending.append((inputs, future, time.perf_counter()))
+            if self._thread is None:
+                # Started on first use, so it is created in the gunicorn worker, not the master
+                self._thread = threading.Thread(target=self._serve, name="batch-scheduler", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future.result()
+
+    def _next_batch(self):
+        """Up to max_batch queued entries once the window closes, or None after IDLE_SECONDS idle."""
+        with self._condition:
+            while not self._pending:
+                if not self._condition.wait(IDLE_SECONDS) and not self._pending:
+                    self._thread = None
+                    return None
+            deadline = self._pending[0][2] + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch))]
+
+    def _serve(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._record(batch)
+            self._run(batch)
+            self._adapt(len(batch))
+
+    def _record(self, batch):
+        now = time.perf_counter()
+        for _, _, enqueued_at in batch:
+            wait = now - enqueued_at
+            self.queue_wait_total += wait
+            self.queue_wait_max = max(self.queue_wait_max, wait)
+            QUEUE_WAIT_SECONDS.observe(wait)
+        self.batches += 1
+        self.items += len(batch)
+        self.batch_size_counts[bisect.bisect_left(BATCH_SIZE_BUCKETS, len(batch))] += 1
+        BATCH_SIZE.observe(len(batch))
+
+    def _run(self, batch):
+        try:
+            inputs = batch[0][0] if len(batch) == 1 else np.concatenate([entry[0] for entry in batch])
+            started = time.perf_counter()
+            outputs = self.run_batch(inputs)
+            seconds = time.perf_counter() - started
+            self.batch_seconds = seconds if self.batch_seconds is None else (
+                self.batch_seconds + DURATION_SMOOTHING * (seconds - self.batch_seconds))
+        except Exception as e:
+            self.failed_batches += 1
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), output in zip(batch, outputs):
+            future.set_result(output)
+
+    def _adapt(self, size):
+        """Widen the window when requests overlap, narrow it when they come one at a time."""
+        with self._condition:
+            arrived_meanwhile = bool(self._pending)
+        if size > 1 or arrived_meanwhile:
+            limit = min(self.max_wait, self.batch_seconds or self.max_wait)
+            self.window = min(limit, max(self.window * 2, limit / 8))
+        elif self.window > self.max_wait / 32:
+            self.window /= 2
+        else:
+            self.window = 0.0
+
+    def stats(self):
+        """Batch-size distribution, added queueing latency and the current window for /health."""
+        labels = [f"<={bound}" for bound in BATCH_SIZE_BUCKETS] + [f">{BATCH_SIZE_BUCKETS[-1]}"]
+        return {
+            'max_wait_ms': self.max_wait * 1000,
+            'window_ms': round(self.window * 1000, 3),
+            'avg_batch_ms': round(self.batch_seconds * 1000, 3) if self.batch_seconds is not None else None,
+            'max_batch': self.max_batch,
+            'pending': len(self._pending),
+            'batches': self.batches,
+            'items': self.items,
+            'failed_batches': self.failed_batches,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'batch_size_histogram': dict(zip(labels, self.batch_size_counts)),
+            'avg_queue_wait_ms': round(self.queue_wait_total / self.items * 1000, 3) if self.items else 0.0,
+            'max_queue_wait_ms': round(self.queue_wait_max * 1000, 3)
+        }
@@ -0,0 +1,69 @@
+"""
+Gunicorn settings for production serving of the vision service.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is imported once in the master process (TensorFlow, OpenCV, Flask
+and the diagnosis catalog) and the workers are forked from it, sharing
+those pages copy-on-write. The Keras model itself is loaded in each worker
+after the fork: TensorFlow hangs in a child forked from a process whose
+runtime has already run. Workers and TensorFlow threads per worker follow
+the container's CPU quota (see purrpal_common/worker_sizing.py), and workers are
+recycled gracefully after MAX_REQUESTS requests.
+
+Configuration (environment variables):
+    PORT                  Listen port (default 8080)
+    WEB_CONCURRENCY       Worker processes (default: one per available CPU)
+    WORKER_THREADS        TensorFlow intra-op threads per worker (default: CPUs / workers)
+    REQUEST_THREADS       Request threads per worker (default 2, decode overlaps inference)
+    MAX_REQUESTS          Requests before a worker is replaced (default 5000, 0 = never)
+    GRACEFUL_TIMEOUT      Seconds a stopping worker may finish requests (default 30)
+    PRELOAD_APP           0 imports the app in every worker instead (no sharing)
+"""
+
+import gc
+import os
+
+from purrpal_common.worker_sizing import limit_native_threads, worker_plan
+
+workers, worker_threads = worker_plan()
+
+# Before the app (and TensorFlow) is imported by preload_app
+limit_native_threads(worker_threads)
+os.environ["LOAD_MODEL_ON_IMPORT"] = "0"
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+worker_class = "gthread"
+threads = int(os.environ.get("REQUEST_THREADS", 2))
+preload_app = os.environ.get("PRELOAD_APP", "1") == "1"
+
+# Recycle workers (staggered by the jitter) to bound TensorFlow's slow memory growth
+max_requests = int(os.environ.get("MAX_REQUESTS", 5000))
+max_requests_jitter = max_requests // 10
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+# Workers load the model before they start answering heartbeats
+timeout = 120
+keepalive = 5
+
+# Logging goes through structured_logging; keep gunicorn's own messages on stderr
+accesslog = None
+errorlog = "-"
+
+
+def on_starting(server):
+    if preload_app:
+        # model_handler imports TensorFlow on first model load; import it here so workers share it
+        import tensorflow  # noqa: F401
+    # Objects that exist now are never collected; keeps the GC from writing to shared pages
+    gc.collect()
+    gc.freeze()
+    server.log.info("App preloaded, forking %d workers with %d TensorFlow threads each", workers, worker_threads)
+
+
+def post_fork(server, worker):
+    """Restart the log writer thread (it does not survive the fork), then load the model"""
+    from purrpal_common.structured_logging import setup_logging
+    import app
+
+    setup_logging("vision")
+    app.load_model_handler()
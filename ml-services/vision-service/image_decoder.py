@@ -0,0 +1,194 @@
+"""
+Image decoding for the vision model input (see ModelHandler._preprocess_image).
+
+Phone photos are often 12 MP, but the model only sees 128x128 pixels. The
+scaled path (the default) never decodes or holds the full-resolution image
+when it can avoid it:
+
+- JPEGs are decoded with libjpeg's DCT scaling (PIL ``Image.draft``) at the
+  smallest 1/2, 1/4 or 1/8 scale that still covers the target size, so a
+  4032x3024 photo is decoded as 504x378.
+- Other formats (PNG, WebP, ...) have no scaled decode. They are decoded in
+  full and box-reduced by an integer factor right away (``Image.reduce``).
+- The last shrink, from under twice the target size, is a cv2 INTER_AREA
+  resize into a per-thread uint8 buffer, and the 1/255 scaling writes into
+  a per-thread float32 input buffer that is reused across requests.
+
+Data URLs are base64-decoded from the payload after the comma (a str slice
+is one copy of the payload text, bytes are sliced through a memoryview), and
+PIL reads the decoded bytes in place. Binary uploads (POST /predict/upload) are
+read straight from the request stream: multipart files from their spooled
+file, raw bodies in chunks into one buffer, since PIL needs to seek.
+
+Images above MAX_IMAGE_PIXELS (50 MP) are refused from their header,
+before any pixel is decoded.
+
+Both paths apply the EXIF orientation and flatten transparency (RGBA, LA,
+palette or RGB images with a transparent color) onto white. Palette,
+grayscale and CMYK images are converted to RGB. VISION_SCALED_DECODE=0
+decodes at full resolution and resizes with INTER_LINEAR, like the original
+pipeline, for comparisons.
+"""
+
+import binascii
+import io
+import os
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+SCALED_DECODE = os.getenv("VISION_SCALED_DECODE", "1") == "1"
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 50_000_000))
+
+# Bytes per read from a stream that cannot seek
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Transparent pixels are composited onto this color
+BACKGROUND = (255, 255, 255)
+
+EXIF_ORIENTATION = 0x0112
+
+# EXIF orientation -> transpose that makes the image upright (as PIL.ImageOps.exif_transpose)
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+class ImageTooLarge(ValueError):
+    """The image has more pixels than the decoder accepts."""
+
+
+def payload_from_data_url(data_url):
+    """Decoded bytes of a base64 data URL ("data:image/...;base64,<payload>")."""
+    if isinstance(data_url, str):
+        comma = data_url.find(",")
+        payload = data_url[comma + 1:]
+    else:
+        comma = data_url.find(b",")
+        payload = memoryview(data_url)[comma + 1:]
+    if comma < 0:
+        raise ValueError("Invalid data URL: no ',' before the payload")
+    return binascii.a2b_base64(payload)
+
+
+def read_stream(stream):
+    """
+    All bytes of a binary stream, read in STREAM_CHUNK_BYTES chunks. A
+    size-limited request stream raises when a read goes past its limit,
+    where a single read() would stop quietly and truncate the image.
+    """
+    buffer = io.BytesIO()
+    while chunk := stream.read(STREAM_CHUNK_BYTES):
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+
+class ImageDecoder:
+    """Turns encoded images into the model's (height, width, 3) float32 input in [0, 1]."""
+
+    def __init__(self, width, height, scaled=None, max_pixels=None):
+        self.width = width
+        self.height = height
+        self.scaled = SCALED_DECODE if scaled is None else scaled
+        self.max_pixels = MAX_IMAGE_PIXELS if max_pixels is None else max_pixels
+        self._local = threading.local()
+
+    def _buffers(self):
+        """(uint8 resize target, (1, height, width, 3) float32 input) owned by the calling thread."""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = (
+                np.empty((self.height, self.width, 3), dtype=np.uint8),
+                np.empty((1, self.height, self.width, 3), dtype=np.float32),
+            )
+            self._local.buffers = buffers
+        return buffers
+
+    def decode_data_url(self, data_url, out=None):
+        """Model input for a base64 image data URL (see decode)."""
+        return self.decode(payload_from_data_url(data_url), out)
+
+    def decode(self, payload, out=None):
+        """
+        Model input for an encoded image: a bytes-like payload (bytes are read
+        without a copy) or a binary file object (see read_stream if it cannot seek).
+
+        Writes into out, a (height, width, 3) float32 array, and returns it.
+        Without out, returns the calling thread's (1, height, width, 3) input
+        buffer, which is overwritten by the thread's next decode.
+
+        Raises:
+            ImageTooLarge: If the image has more than max_pixels pixels
+            PIL.UnidentifiedImageError: If the payload is not a supported image
+        """
+        if not hasattr(payload, "read"):
+            payload = io.BytesIO(payload)
+        elif not payload.seekable():
+            payload = read_stream(payload)
+        image = Image.open(payload)
+        width, height = image.size
+        if self.max_pixels and width * height > self.max_pixels:
+            raise ImageTooLarge(f"Image is {width}x{height} pixels, the limit is {self.max_pixels:,}")
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        if self.scaled:
+            # Square request: covers the target whichever way the EXIF orientation turns the image
+            side = max(self.width, self.height)
+            image.draft("RGB", (side, side))
+
+        image = self._rgb_or_rgba(image)
+        if self.scaled:
+            factor = min(image.size) // max(self.width, self.height)
+            if factor >= 2:
+                image = image.reduce(factor)
+        if orientation in ORIENTATION_TRANSPOSE:
+            image = image.transpose(ORIENTATION_TRANSPOSE[orientation])
+        if image.mode == "RGBA":
+            flat = Image.new("RGB", image.size, BACKGROUND)
+            flat.paste(image, mask=image.getchannel("A"))
+            image = flat
+        # Scaled images are now under twice the target size, where INTER_AREA is cheap
+        return self.normalize(np.asarray(image), out, area=self.scaled)
+
+    @staticmethod
+    def _rgb_or_rgba(image):
+        """Image converted to RGBA if it has any transparency, else to RGB."""
+        transparent = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        mode = "RGBA" if transparent else "RGB"
+        if image.mode in ("I", "I;16", "I;16B", "F"):
+            # 16-bit and float grayscale: scale to 8 bits first, RGB conversion would clip
+            pixels = np.asarray(image, dtype=np.float64)
+            image = Image.fromarray((pixels * (255.0 / max(pixels.max(), 1.0))).astype(np.uint8))
+        return image if image.mode == mode else image.convert(mode)
+
+    def normalize(self, pixels, out=None, area=False):
+        """
+        Resize an RGB uint8 array (grayscale and RGBA arrays are converted) and
+        scale it to [0, 1] into out or the thread's input buffer (see decode).
+        Shrinks with INTER_AREA if area is set, else with INTER_LINEAR.
+        """
+        if pixels.ndim == 2:
+            pixels = cv2.cvtColor(pixels, cv2.COLOR_GRAY2RGB)
+        elif pixels.shape[2] == 4:
+            pixels = cv2.cvtColor(pixels, cv2.COLOR_RGBA2RGB)
+
+        resized, batch = self._buffers()
+        height, width = pixels.shape[:2]
+        if (width, height) == (self.width, self.height):
+            np.copyto(resized, pixels)
+        else:
+            shrinking = width >= self.width and height >= self.height
+            interpolation = cv2.INTER_AREA if area and shrinking else cv2.INTER_LINEAR
+            cv2.resize(pixels, (self.width, self.height), dst=resized, interpolation=interpolation)
+
+        target = batch[0] if out is None else out
+        np.divide(resized, np.float32(255.0), out=target)
+        return batch if out is None else out
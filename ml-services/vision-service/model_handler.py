@@ -1,35 +1,113 @@
-import tensorflow as tf
 import numpy as np
-import cv2
-import os
-import base64
 import json
+import hashlib
 import logging
-from PIL import Image
-import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from batch_scheduler import BatchScheduler
+from image_decoder import ImageDecoder
+from purrpal_common.structured_logging import stage
+from purrpal_common.worker_sizing import available_cpus
+
+# tensorflow is imported when a model is loaded: decoding and batching do not need it
 
 logger = logging.getLogger(__name__)
 
+# Threads decoding the images of a predict_batch call (PIL and cv2 release the GIL)
+DECODE_THREADS = int(os.getenv("DECODE_THREADS") or available_cpus())
+
+# Images per predict_batch call (POST /predict/batch); warm-up covers batches up to this size
+MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", 32))
+
+# Compile the inference function with XLA. It then compiles once per batch size, so
+# batches are padded to a power of two (see _forward)
+XLA_JIT = os.getenv("VISION_XLA", "0") == "1"
+
+_decode_pool = None
+_decode_pool_lock = threading.Lock()
+
+
+def decode_pool():
+    """Thread pool shared by all model versions, created on first use (after gunicorn forks)."""
+    global _decode_pool
+    with _decode_pool_lock:
+        if _decode_pool is None:
+            _decode_pool = ThreadPoolExecutor(max_workers=max(1, DECODE_THREADS), thread_name_prefix="decode")
+        return _decode_pool
+
+
 class ModelHandler:
     def __init__(self, model_path, class_map_path):
         self.IMG_WIDTH = 128
         self.IMG_HEIGHT = 128
+        self.decoder = ImageDecoder(self.IMG_WIDTH, self.IMG_HEIGHT)
         self.model_path = model_path
         self.class_map_path = class_map_path
         self.model = None
+        self.xla = XLA_JIT
+        self.warmup_seconds = None
         self.class_map = {}
+        self.catalog = {}
+        self.catalog_etag = None
         self._load_model()
+        self._infer = self._build_inference_function()
         self._load_class_map()
+        self._build_catalog()
+        # Coalesces concurrent predict() calls into one forward pass (None when disabled)
+        self.scheduler = BatchScheduler.from_env(self._forward)
+        self._warm_up()
 
     def _load_model(self):
         """Load the TensorFlow model."""
+        import tensorflow as tf
+
         try:
             self.model = tf.keras.models.load_model(self.model_path, compile=False)
-            logger.info(f"Model loaded successfully from {self.model_path}")
-        except Exception as e:
-            logger.error(f"Failed to load model: {e}")
+            logger.info("Model loaded successfully from %s", self.model_path)
+        except Exception:
+            logger.exception("Failed to load model from %s", self.model_path)
             raise
 
+    def _build_inference_function(self):
+        """
+        Graph-compiled forward pass for any (n, 128, 128, 3) batch, returning class probabilities.
+        Called directly instead of model.predict, which sets up a data pipeline and predict loop per call.
+        """
+        import tensorflow as tf
+
+        model = self.model
+
+        @tf.function(
+            input_signature=[tf.TensorSpec((None, self.IMG_HEIGHT, self.IMG_WIDTH, 3), tf.float32)],
+            jit_compile=self.xla
+        )
+        def infer(images):
+            class_probs, _ = model(images, training=False)
+            return class_probs
+
+        return infer
+
+    def _warm_up(self):
+        """Trace (and with XLA compile) the inference function on dummy batches before serving."""
+        started = time.perf_counter()
+        max_batch = self.scheduler.max_batch if self.scheduler is not None else 1
+        if self.xla:
+            largest = max(max_batch, MAX_BATCH_IMAGES)
+            sizes = [1 << i for i in range((largest - 1).bit_length() + 1)]
+        else:
+            sizes = sorted({1, max_batch, MAX_BATCH_IMAGES})
+        for size in sizes:
+            self._forward(np.zeros((size, self.IMG_HEIGHT, self.IMG_WIDTH, 3), dtype=np.float32))
+        self.warmup_seconds = time.perf_counter() - started
+        logger.info("Inference function warmed up in %.2fs (batch sizes %s, XLA %s)",
+                    self.warmup_seconds, sizes, "on" if self.xla else "off")
+
+    def memory_bytes(self):
+        """Size of the model weights in bytes (the bulk of a loaded model's memory)."""
+        return sum(int(np.prod(weight.shape)) * np.dtype(weight.dtype).itemsize for weight in self.model.weights)
+
     def _load_class_map(self):
         """Load class mapping from JSON file."""
         try:
@@ -37,101 +115,205 @@ class ModelHandler:
                 loaded_class_map = json.load(f)
                 # Swap keys and values and convert class IDs to integers
                 self.class_map = {v: k for k, v in loaded_class_map.items()}
-            logger.info(f"Class map loaded successfully from {self.class_map_path}")
-            logger.info(f"Mapped classes: {self.class_map}")
+            logger.info("Class map loaded successfully from %s (%d classes)", self.class_map_path, len(self.class_map))
+            logger.debug("Mapped classes: %s", self.class_map)
         except FileNotFoundError:
-            logger.error(f"Class map file not found: {self.class_map_path}")
+            logger.error("Class map file not found: %s", self.class_map_path)
             raise
         except json.JSONDecodeError:
-            logger.error(f"Invalid JSON format in class map file: {self.class_map_path}")
+            logger.error("Invalid JSON format in class map file: %s", self.class_map_path)
             raise
 
-    def _preprocess_image(self, image_data):
-        """Preprocess image for model input."""
+    def _build_catalog(self):
+        """Render the diagnosis and recommendation texts of every class once."""
+        self.catalog = {
+            disease: {
+                "diagnosis": self._render_diagnosis(disease),
+                "recommendations": self._render_recommendations(disease)
+            }
+            for disease in self.class_map.values()
+        }
+        content = json.dumps(self.catalog_payload(include_version=False), sort_keys=True)
+        self.catalog_etag = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+    def catalog_payload(self, include_version=True):
+        """Class order and texts served by /catalog to clients of compact responses."""
+        payload = {
+            "classes": [self.class_map[i] for i in sorted(self.class_map)],
+            "diseases": self.catalog
+        }
+        if include_version:
+            payload["version"] = self.catalog_etag
+        return payload
+
+    def _preprocess_image(self, image_data, out=None):
+        """
+        Preprocess image for model input (see image_decoder.py).
+        Returns the calling thread's reused (1, 128, 128, 3) input buffer,
+        or out, a (128, 128, 3) slot of a batch, filled in.
+        """
         try:
-            # Convert base64 to image if needed
             if isinstance(image_data, str) and image_data.startswith('data:image'):
-                # Remove data URL prefix if present
-                image_data = image_data.split(',')[1]
-                image_bytes = base64.b64decode(image_data)
-                image = Image.open(io.BytesIO(image_bytes))
-                image = np.array(image)
-                if len(image.shape) == 2:  # Convert grayscale to RGB
-                    image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
-            else:
-                image = image_data
-
-            # Resize and normalize
-            image = cv2.resize(image, (self.IMG_WIDTH, self.IMG_HEIGHT))
-            image = image.astype("float32") / 255.0
-            return np.expand_dims(image, axis=0)
+                with stage("decode"):
+                    return self.decoder.decode_data_url(image_data, out)
+            if isinstance(image_data, (bytes, bytearray, memoryview)) or hasattr(image_data, 'read'):
+                with stage("decode"):
+                    return self.decoder.decode(image_data, out)
+
+            # Already decoded pixels: resize and normalize
+            with stage("resize"):
+                return self.decoder.normalize(np.asarray(image_data), out)
 
         except Exception as e:
-            logger.error(f"Error preprocessing image: {e}")
+            logger.error("Error preprocessing image: %s", e)
             raise
 
-    def predict(self, image_data, confidence_threshold=0.5):
+    def _preprocess_batch(self, images):
+        """
+        Decode images in parallel on the decode pool, each straight into its
+        slot of one (n, 128, 128, 3) batch. The first failure is raised, with
+        the index of the image added as a note.
+        """
+        batch = np.empty((len(images), self.IMG_HEIGHT, self.IMG_WIDTH, 3), dtype=np.float32)
+        if len(images) == 1:
+            self._preprocess_image(images[0], batch[0])
+            return batch
+        # Pool threads run outside the request context, so the stage is timed here
+        with stage("decode"):
+            futures = [
+                decode_pool().submit(self._preprocess_image, image_data, batch[i])
+                for i, image_data in enumerate(images)
+            ]
+            for i, future in enumerate(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    for pending in futures:
+                        pending.cancel()
+                    e.add_note(f"Image {i} of the batch")
+                    raise
+        return batch
+
+    def _forward(self, image_batch):
+        """Class probabilities for an (n, 128, 128, 3) batch in one forward pass."""
+        count = len(image_batch)
+        if self.xla and count & (count - 1):
+            padding = np.zeros(((1 << count.bit_length()) - count,) + image_batch.shape[1:], dtype=np.float32)
+            image_batch = np.concatenate([image_batch, padding])
+        return np.asarray(self._infer(image_batch))[:count]
+
+    def predict(self, image_data, confidence_threshold=0.5, compact=False):
         """
         Predict disease from image data.
         Returns prediction results including disease, confidence, and recommendations.
+        With compact=True only codes are returned (texts come from /catalog).
         """
         try:
             # Preprocess image
             image_batch = self._preprocess_image(image_data)
 
-            # Get model prediction
-            pred_class_probs, _ = self.model.predict(image_batch, verbose=0)
-            class_id = np.argmax(pred_class_probs[0])
-            confidence = float(pred_class_probs[0][class_id])
-
-            # Get prediction details
-            if confidence < confidence_threshold:
-                return {
-                    "predicted_disease": "No confident prediction",
-                    "confidence": confidence * 100,
-                    "diagnosis": "Confidence level too low for reliable prediction",
-                    "recommendations": "Please try again with a clearer image or consult a veterinarian",
-                    "accuracy": "N/A",
-                    "active_symptoms": [],
-                    "all_probabilities": {
-                        self.class_map.get(i, f"class_{i}"): float(prob) * 100
-                        for i, prob in enumerate(pred_class_probs[0])
-                    }
-                }
+            # Get model prediction (batched with concurrent requests by the scheduler)
+            with stage("inference"):
+                if self.scheduler is not None:
+                    class_probs = self.scheduler.submit(image_batch)
+                else:
+                    class_probs = self._forward(image_batch)[0]
+            return self._build_result(class_probs, confidence_threshold, compact)
+
+        except Exception as e:
+            logger.exception("Error during prediction: %s", e)
+            raise
+
+    def predict_batch(self, images, confidence_threshold=0.5, compact=False, aggregate=False):
+        """
+        Predict several images (e.g. photos of the same lesion) in one forward pass.
+        Returns one result per image, in order, as predict() does, and with
+        aggregate=True a verdict for the whole set from the mean probabilities:
+        {"predictions": [...], "aggregate": {...} or None}.
+        """
+        try:
+            image_batch = self._preprocess_batch(images)
+
+            with stage("inference"):
+                pred_class_probs = self._forward(image_batch)
+            result = {
+                "predictions": [self._build_result(probs, confidence_threshold, compact) for probs in pred_class_probs],
+                "aggregate": None
+            }
+            if aggregate:
+                result["aggregate"] = self._build_result(pred_class_probs.mean(axis=0), confidence_threshold, compact)
+                result["aggregate"]["image_count"] = len(images)
+            return result
+
+        except Exception as e:
+            logger.exception("Error during batch prediction: %s", e)
+            raise
 
-            predicted_class = self.class_map.get(class_id, "Unknown")
-            
-            # Prepare diagnosis and recommendations based on the predicted disease
-            diagnosis = self._get_diagnosis(predicted_class)
-            recommendations = self._get_recommendations(predicted_class)
+    def _build_result(self, class_probs, confidence_threshold=0.5, compact=False):
+        """Build the prediction result from one row of class probabilities."""
+        class_id = np.argmax(class_probs)
+        confidence = float(class_probs[class_id])
 
+        if compact:
             return {
-                "predicted_disease": predicted_class,
+                "disease_id": int(class_id) if confidence >= confidence_threshold else -1,
                 "confidence": confidence * 100,
-                "diagnosis": diagnosis,
-                "recommendations": recommendations,
-                "accuracy": "85",  # Based on model validation
-                "active_symptoms": [predicted_class],  # Main symptom/disease detected
+                "probabilities": [float(prob) * 100 for prob in class_probs],
+                "catalog_version": self.catalog_etag
+            }
+
+        # Get prediction details
+        if confidence < confidence_threshold:
+            return {
+                "predicted_disease": "No confident prediction",
+                "confidence": confidence * 100,
+                "diagnosis": "Confidence level too low for reliable prediction",
+                "recommendations": "Please try again with a clearer image or consult a veterinarian",
+                "accuracy": "N/A",
+                "active_symptoms": [],
                 "all_probabilities": {
                     self.class_map.get(i, f"class_{i}"): float(prob) * 100
-                    for i, prob in enumerate(pred_class_probs[0])
+                    for i, prob in enumerate(class_probs)
                 }
             }
 
-        except Exception as e:
-            logger.error(f"Error during prediction: {e}")
-            raise
+        predicted_class = self.class_map.get(class_id, "Unknown")
+        
+        # Prepare diagnosis and recommendations based on the predicted disease
+        diagnosis = self._get_diagnosis(predicted_class)
+        recommendations = self._get_recommendations(predicted_class)
+
+        return {
+            "predicted_disease": predicted_class,
+            "confidence": confidence * 100,
+            "diagnosis": diagnosis,
+            "recommendations": recommendations,
+            "accuracy": "85",  # Based on model validation
+            "active_symptoms": [predicted_class],  # Main symptom/disease detected
+            "all_probabilities": {
+                self.class_map.get(i, f"class_{i}"): float(prob) * 100
+                for i, prob in enumerate(class_probs)
+            }
+        }
 
     def _get_diagnosis(self, disease):
         """Get diagnosis text for the predicted disease."""
+        entry = self.catalog.get(disease)
+        return entry["diagnosis"] if entry else self._render_diagnosis(disease)
+
+    def _get_recommendations(self, disease):
+        """Get recommendations for the predicted disease."""
+        entry = self.catalog.get(disease)
+        return entry["recommendations"] if entry else self._render_recommendations(disease)
+
+    def _render_diagnosis(self, disease):
         # This could be expanded with a proper database of diagnoses
         return f"""
         <p>Berdasarkan analisis gambar, kucing Anda menunjukkan tanda-tanda <strong>{disease}</strong>.</p>
         <p>Diagnosis ini didasarkan pada pola visual yang terdeteksi dalam gambar yang diunggah.</p>
         """
 
-    def _get_recommendations(self, disease):
-        """Get recommendations for the predicted disease."""
+    def _render_recommendations(self, disease):
         # This could be expanded with a proper database of recommendations
         return f"""
         <p>Untuk penanganan <strong>{disease}</strong>, berikut beberapa rekomendasi:</p>
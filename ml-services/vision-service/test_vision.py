@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Tests of the vision service's decoding, batching and endpoints.
+
+They run without TensorFlow: a seeded NumPy model stands in for the Keras
+model, and the handler code around it is the service's own.
+"""
+
+import base64
+import io
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+os.environ["LOAD_MODEL_ON_IMPORT"] = "0"
+
+import model_handler
+from batch_scheduler import BatchScheduler
+from image_decoder import ImageDecoder, ImageTooLarge
+
+CLASS_MAP_PATH = Path(__file__).resolve().parent / "models" / "class_map.json"
+
+
+class LinearModel:
+    """Softmax over the mean color of each image, seeded; stands in for the Keras model"""
+
+    def __init__(self, num_classes, seed=0):
+        rng = np.random.default_rng(seed)
+        self.weights = [rng.normal(scale=8.0, size=(3, num_classes)).astype(np.float32)]
+
+    def __call__(self, images):
+        logits = images.mean(axis=(1, 2)) @ self.weights[0]
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+class NumpyModelHandler(model_handler.ModelHandler):
+    """ModelHandler serving LinearModel instead of a TensorFlow model"""
+
+    def _load_model(self):
+        with open(self.class_map_path) as f:
+            self.model = LinearModel(len(json.load(f)))
+
+    def _build_inference_function(self):
+        return self.model
+
+
+def encode(image, fmt="JPEG", **params):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+
+def photo(width, height, seed=0):
+    """Smooth random RGB image (a 12x9 grid of colors blended together)"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (9, 12, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize((width, height), Image.Resampling.BILINEAR)
+
+
+def data_url(payload, mime="image/jpeg"):
+    return f"data:{mime};base64," + base64.b64encode(payload).decode("ascii")
+
+
+def serving_app(handler_class=NumpyModelHandler, load=True):
+    """The Flask app serving handler_class for every model version, with the default one loaded if load"""
+    import app as service
+
+    service.model_registry = None
+    service.model_handler = None
+    service.load_model_version = lambda name, spec: handler_class(spec["path"], str(CLASS_MAP_PATH))
+    if load:
+        service.load_model_handler()
+    return service
+
+
+def test_image_decoder():
+    """Scaled decodes shrink early, stay upright, flatten transparency and refuse huge headers"""
+
+    print("🧪 Testing image decoder...")
+
+    class RecordingDecoder(ImageDecoder):
+        def normalize(self, pixels, out=None, area=False):
+            self.decoded_shape = pixels.shape
+            return super().normalize(pixels, out, area)
+
+    decoder = RecordingDecoder(128, 128, scaled=True)
+    full = RecordingDecoder(128, 128, scaled=False)
+
+    # JPEG: decoded by libjpeg at 1/8 (504x378), then halved. PNG: decoded in full, then reduced by 9.
+    # Either way the final resize starts from under twice the target size.
+    for payload, decoded_shape in ((encode(photo(4032, 3024)), (189, 252, 3)),
+                                   (encode(photo(1600, 1200), "PNG"), (134, 178, 3))):
+        scaled = decoder.decode(payload).copy()
+        assert scaled.shape == (1, 128, 128, 3) and scaled.dtype == np.float32
+        assert decoder.decoded_shape == decoded_shape
+        assert np.abs(scaled - full.decode(payload)).mean() < 0.02
+    assert full.decoded_shape[:2] == (1200, 1600)
+
+    # Left half red, right half blue; orientation 6 is upright after turning 90 degrees clockwise
+    image = Image.new("RGB", (256, 128), (255, 0, 0))
+    image.paste((0, 0, 255), (128, 0, 256, 128))
+    upright = decoder.decode(encode(image, quality=95))[0]
+    assert upright[64, 10, 0] > 0.9 and upright[64, -10, 2] > 0.9
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    rotated = decoder.decode(encode(image, quality=95, exif=exif))[0]
+    assert rotated[10, 64, 0] > 0.9 and rotated[-10, 64, 2] > 0.9
+
+    # Transparent pixels become white, opaque ones keep their color
+    rgba = Image.new("RGBA", (128, 128), (255, 0, 0, 0))
+    rgba.paste((0, 0, 255, 255), (0, 64, 128, 128))
+    palette = Image.new("P", (128, 128), 1)
+    palette.putpalette([0, 255, 0] + [0, 0, 0] * 255)
+    palette.paste(0, (0, 64, 128, 128))
+    for payload in (encode(rgba, "PNG"), encode(palette, "PNG", transparency=1)):
+        flat = decoder.decode(payload)[0]
+        assert np.allclose(flat[:60], 1.0)
+        assert flat[70:].max(axis=(0, 1)).min() < 1.0 and flat[70:].min(axis=(0, 1)).max() == 1.0
+
+    # The header alone is enough to refuse an image
+    huge = encode(Image.new("L", (9000, 6000)), "PNG")
+    for payload in (huge, huge[:64], io.BytesIO(huge[:64])):
+        try:
+            ImageDecoder(128, 128, max_pixels=50_000_000).decode(payload)
+        except ImageTooLarge as e:
+            assert "9000x6000" in str(e)
+        else:
+            raise AssertionError("Image above max_pixels should be refused")
+
+    print("✅ Image decoder behaves correctly")
+
+
+def test_batch_scheduler():
+    """Each caller gets its own row, batches respect max_batch and the window, errors reach their batch"""
+
+    print("🧪 Testing batch scheduler...")
+
+    sizes = []
+    windows = []
+    gate = threading.Event()
+    gate.set()
+
+    def run_batch(inputs):
+        sizes.append(len(inputs))
+        windows.append(scheduler.window)
+        assert gate.wait(5)
+        if (inputs[:, 0] < 0).any():
+            raise RuntimeError("negative input")
+        return inputs[:, 0] * 2
+
+    scheduler = BatchScheduler(run_batch, max_wait_ms=20, max_batch=4)
+    results = {}
+
+    def submit(value):
+        try:
+            results[value] = scheduler.submit(np.array([[value, 0.0]]))
+        except RuntimeError as e:
+            results[value] = e
+
+    def submit_all(values):
+        threads = [threading.Thread(target=submit, args=(value,)) for value in values]
+        threads[0].start()
+        while not sizes:
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while scheduler.stats()['pending'] < len(values) - 1:
+            time.sleep(0.001)
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+    # The first input runs alone (the window starts at 0) while nine queue behind it
+    gate.clear()
+    submit_all(range(10))
+    assert sizes == [1, 4, 4, 1]
+    assert all(results[value] == 2 * value for value in range(10))
+    stats = scheduler.stats()
+    assert (stats['batches'], stats['items'], stats['failed_batches']) == (4, 10, 0)
+    # Overlapping requests opened the window, never beyond max_wait_ms
+    assert windows[0] == 0.0 and 0 < max(windows) <= scheduler.max_wait
+
+    # A failing batch fails every caller in it, and the scheduler keeps serving
+    sizes.clear()
+    gate.clear()
+    submit_all([5.0, -1.0, 6.0])
+    assert sizes == [1, 2]
+    assert results[5.0] == 10.0 and all(isinstance(results[value], RuntimeError) for value in (-1.0, 6.0))
+    assert scheduler.stats()['failed_batches'] == 1
+
+    # A lone request waits at most the window, which closes again when requests come one at a time
+    scheduler.window = scheduler.max_wait
+    started = time.perf_counter()
+    assert scheduler.submit(np.array([[1.0, 0.0]])) == 2.0
+    assert scheduler.max_wait <= time.perf_counter() - started < scheduler.max_wait + 0.5
+    for _ in range(10):
+        scheduler.submit(np.array([[1.0, 0.0]]))
+    assert scheduler.stats()['window_ms'] == 0.0
+
+    print("✅ Batch scheduler behaves correctly")
+
+
+def test_health_waits_for_warm_up():
+    """/health answers 503 until the default model version is loaded and warmed up"""
+
+    print("🧪 Testing /health readiness...")
+
+    warming = threading.Event()
+    warm_up_done = threading.Event()
+
+    class SlowWarmUpHandler(NumpyModelHandler):
+        def _warm_up(self):
+            warming.set()
+            assert warm_up_done.wait(5)
+            super()._warm_up()
+
+    service = serving_app(SlowWarmUpHandler, load=False)
+    client = service.app.test_client()
+    assert client.get('/health').status_code == 503
+
+    loading = threading.Thread(target=service.load_model_handler)
+    loading.start()
+    assert warming.wait(5)
+    response = client.get('/health')
+    assert response.status_code == 503 and response.get_json() == {"status": "warming_up", "model_loaded": False}
+
+    warm_up_done.set()
+    loading.join()
+    response = client.get('/health')
+    body = response.get_json()
+    assert response.status_code == 200 and body["status"] == "healthy"
+    assert body["warmup_seconds"] >= 0 and body["batching"]["max_batch"] == 16
+
+    print("✅ /health waits for the warm-up")
+
+
+def test_predict_upload():
+    """Binary uploads predict like data URLs; oversized and broken uploads get 413 and 400"""
+
+    print("🧪 Testing /predict/upload...")
+
+    service = serving_app()
+    client = service.app.test_client()
+    jpeg = encode(photo(640, 480))
+    expected = client.post('/predict', json={"image": data_url(jpeg)}).get_json()["data"]["all_probabilities"]
+
+    chunked = {"headers": {"Transfer-Encoding": "chunked"}, "environ_overrides": {"wsgi.input_terminated": True}}
+    uploads = {
+        "raw": lambda: client.post('/predict/upload', data=jpeg, content_type="image/jpeg"),
+        "chunked": lambda: client.post('/predict/upload', input_stream=io.BytesIO(jpeg),
+                                       content_type="image/jpeg", **chunked),
+        "form": lambda: client.post('/predict/upload', data={"image": (io.BytesIO(jpeg), "cat.jpg"),
+                                                             "cat_info": json.dumps({"name": "Milo"})},
+                                    content_type="multipart/form-data"),
+    }
+    for name, upload in uploads.items():
+        response = upload()
+        assert response.status_code == 200, name
+        assert response.get_json()["data"]["all_probabilities"] == expected, name
+
+    # Over MAX_UPLOAD_BYTES, with or without a Content-Length
+    max_upload_bytes = service.MAX_UPLOAD_BYTES
+    service.MAX_UPLOAD_BYTES = len(jpeg) // 2
+    try:
+        for name, upload in uploads.items():
+            response = upload()
+            assert response.status_code == 413, name
+            assert f"max {len(jpeg) // 2:,} bytes" in response.get_json()["error"]
+    finally:
+        service.MAX_UPLOAD_BYTES = max_upload_bytes
+
+    huge = encode(Image.new("L", (9000, 6000)), "PNG")
+    response = client.post('/predict/upload', data=huge, content_type="image/png")
+    assert response.status_code == 413 and "9000x6000" in response.get_json()["error"]
+
+    broken = [
+        client.post('/predict/upload', data=b"not an image", content_type="image/jpeg"),
+        client.post('/predict/upload', data={"other": "1"}, content_type="multipart/form-data"),
+        client.post('/predict/upload', data={"image": (io.BytesIO(jpeg), "cat.jpg"), "cat_info": "{bad"},
+                    content_type="multipart/form-data"),
+    ]
+    assert [response.status_code for response in broken] == [400, 400, 400]
+    assert client.post('/predict/upload', json={"image": data_url(jpeg)}).status_code == 415
+
+    print("✅ /predict/upload behaves correctly")
+
+
+def test_predict_batch():
+    """Batches answer per image in order with a mean-probability verdict; a bad item names its index"""
+
+    print("🧪 Testing /predict/batch...")
+
+    service = serving_app()
+    client = service.app.test_client()
+    images = [encode(photo(320, 240, seed=seed)) for seed in range(4)]
+    urls = [data_url(image) for image in images]
+    singles = [client.post('/predict', json={"image": url}).get_json()["data"] for url in urls]
+
+    response = client.post('/predict/batch?aggregate=true', json={"images": urls, "cat_info": {"name": "Milo"}})
+    assert response.status_code == 200
+    data = response.get_json()["data"]
+    assert data["cat_info"] == {"name": "Milo"} and len(data["predictions"]) == len(urls)
+    for single, prediction in zip(singles, data["predictions"]):
+        assert prediction["predicted_disease"] == single["predicted_disease"]
+        assert np.allclose(list(prediction["all_probabilities"].values()),
+                           list(single["all_probabilities"].values()), atol=1e-4)
+    aggregate = data["aggregate"]
+    mean = np.mean([list(single["all_probabilities"].values()) for single in singles], axis=0)
+    assert aggregate["image_count"] == len(urls)
+    assert np.allclose(list(aggregate["all_probabilities"].values()), mean, atol=1e-4)
+
+    form = {"images": [(io.BytesIO(image), f"{i}.jpg") for i, image in enumerate(images)]}
+    response = client.post('/predict/batch?format=compact', data=form, content_type="multipart/form-data")
+    data = response.get_json()["data"]
+    assert response.status_code == 200 and data["aggregate"] is None and "cat_info" not in data
+    assert np.allclose(data["predictions"][2]["probabilities"], list(singles[2]["all_probabilities"].values()),
+                       atol=1e-4)
+
+    rejected = {
+        "Image 2 of the batch": [urls[0], urls[1], data_url(b"not an image")],
+        "Image 1 of the batch is not an image data URL": [urls[0], 5],
+        "Image 0 of the batch is not an image data URL": ["https://example.com/cat.jpg"],
+        "Too many images": urls * 9,
+        "No images provided": [],
+    }
+    for error, batch in rejected.items():
+        response = client.post('/predict/batch', json={"images": batch})
+        assert response.status_code == 400 and error in response.get_json()["error"], error
+
+    malformed = {
+        "Request body must be a JSON object": [urls, "images"],
+        "cat_info must be a JSON object": [{"images": urls, "cat_info": "Milo"}],
+    }
+    for error, bodies in malformed.items():
+        for body in bodies:
+            response = client.post('/predict/batch', json=body)
+            assert response.status_code == 400 and error in response.get_json()["error"], body
+    form = {"images": (io.BytesIO(images[0]), "0.jpg"), "cat_info": "[1, 2]"}
+    response = client.post('/predict/batch', data=form, content_type="multipart/form-data")
+    assert response.status_code == 400 and "cat_info must be a JSON object" in response.get_json()["error"]
+
+    assert "tensorflow" not in sys.modules
+
+    print("✅ /predict/batch behaves correctly")
+
+
+if __name__ == "__main__":
+    test_image_decoder()
+    test_batch_scheduler()
+    test_health_waits_for_warm_up()
+    test_predict_upload()
+    test_predict_batch()